@@ -1,20 +1,115 @@
-from fastapi import FastAPI, Query
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-import httpx, trafilatura, spacy, time, os, traceback
+from fastapi.responses import PlainTextResponse, StreamingResponse
+import asyncio, httpx, json, spacy, threading, time, os, traceback
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import urlparse
-from rank_bm25 import BM25Okapi
-from sentence_transformers import SentenceTransformer, util, CrossEncoder
+from sentence_transformers import SentenceTransformer, CrossEncoder
 from transformers import AutoModelForSequenceClassification, AutoTokenizer
+import numpy as np
 import torch
 
+from batcher import MicroBatcher
+from budget import Budget, current_budget, merge_degradations, parse_degrade_at, release_budget, use_budget
+from claim_cache import ClaimCache, claim_key
+from embed_cache import EmbeddingCache
+from evidence_index import EvidenceIndex
+from extract_pool import ExtractPool, ExtractTimeout, HtmlTooLarge, split_paragraphs
+from metrics import REGISTRY, stage_timer
+from onnx_backend import load_backend, softmax
+from page_cache import PageCache, normalize_url, parse_domain_ttls
+from passages import PAIR_SPECIAL_TOKENS, Page, pack_window
+from recall import BM25Corpus, cosine_scores, hybrid_scores, select_top, tokenize
+from score_cache import ScoreCache
+from search_client import SearchClient
+
 # ===== Config =====
 SEARX_URL = os.getenv("SEARX_URL", "http://127.0.0.1:8080/search")
 SEARX_TIMEOUT_S = float(os.getenv("SEARX_TIMEOUT_S", "15"))
+SEARX_MAX_CONNECTIONS = int(os.getenv("SEARX_MAX_CONNECTIONS", "10"))  # = outgoing.max_connections in settings.yml
+SEARX_RATE_PER_S = float(os.getenv("SEARX_RATE_PER_S", "10"))          # token bucket refill; 0 = unlimited
+SEARX_RETRIES = int(os.getenv("SEARX_RETRIES", "2"))
+SEARX_BACKOFF_S = float(os.getenv("SEARX_BACKOFF_S", "0.5"))            # base of the jittered exponential backoff
+SEARX_CACHE_TTL_S = float(os.getenv("SEARX_CACHE_TTL_S", "3600"))
+SEARX_CACHE_EMPTY_TTL_S = float(os.getenv("SEARX_CACHE_EMPTY_TTL_S", "300"))  # queries with no results
+SEARX_CACHE_ITEMS = int(os.getenv("SEARX_CACHE_ITEMS", "10000"))
+
+# Page fetching (shared pooled client; global + per-host concurrency caps)
+FETCH_TIMEOUT_S = float(os.getenv("FETCH_TIMEOUT_S", "10"))
+FETCH_MAX_CONCURRENCY = int(os.getenv("FETCH_MAX_CONCURRENCY", "32"))
+FETCH_PER_HOST_CONCURRENCY = int(os.getenv("FETCH_PER_HOST_CONCURRENCY", "4"))
+FETCH_USER_AGENT = os.getenv("FETCH_USER_AGENT", "Mozilla/5.0 (compatible; llm-checker/1.0)")
+FETCH_ROUTE_URL = os.getenv("FETCH_ROUTE_URL", "")  # benchmarks only: serve every download from bench/servers.py
+
+# HTML -> paragraphs (trafilatura) in a process pool, off the event loop and the GIL
+EXTRACT_WORKERS = int(os.getenv("EXTRACT_WORKERS", "2"))            # per serving process; 0 = in a thread
+EXTRACT_TIMEOUT_S = float(os.getenv("EXTRACT_TIMEOUT_S", "5"))      # per document, enforced in the worker
+EXTRACT_MAX_HTML_MB = float(os.getenv("EXTRACT_MAX_HTML_MB", "5"))  # larger pages are not downloaded in full
+EXTRACT_MAX_TASKS_PER_CHILD = int(os.getenv("EXTRACT_MAX_TASKS_PER_CHILD", "200"))
+
+# Extracted page-text cache (in-memory LRU + SQLite); empty PAGE_CACHE_PATH disables the disk tier
+PAGE_CACHE_PATH = os.getenv("PAGE_CACHE_PATH", os.path.join(os.path.dirname(__file__), ".cache", "pages.sqlite"))
+PAGE_CACHE_MEM_ITEMS = int(os.getenv("PAGE_CACHE_MEM_ITEMS", "512"))
+PAGE_CACHE_MAX_MB = float(os.getenv("PAGE_CACHE_MAX_MB", "512"))
+PAGE_CACHE_TTL_S = float(os.getenv("PAGE_CACHE_TTL_S", "86400"))
+PAGE_CACHE_NEGATIVE_TTL_S = float(os.getenv("PAGE_CACHE_NEGATIVE_TTL_S", "3600"))
+PAGE_CACHE_DOMAIN_TTLS = parse_domain_ttls(os.getenv(
+    "PAGE_CACHE_DOMAIN_TTLS", "wikipedia.org=604800,britannica.com=604800"))
+BLOCKED_STATUS = {401, 403, 406, 429, 451}  # treated as "site blocks scraping"
+
+# Paragraph embedding cache (float16 rows in a memory-mapped file); empty path keeps it in RAM
+EMBED_CACHE_PATH = os.getenv("EMBED_CACHE_PATH", os.path.join(os.path.dirname(__file__), ".cache", "embeddings"))
+EMBED_CACHE_ITEMS = int(os.getenv("EMBED_CACHE_ITEMS", "200000"))
+
+# Memoized reranker scores / NLI labels per (sub-claim, passage); empty path keeps it in RAM
+SCORE_CACHE_PATH = os.getenv("SCORE_CACHE_PATH", os.path.join(os.path.dirname(__file__), ".cache", "scores.sqlite"))
+SCORE_CACHE_MAX_MB = float(os.getenv("SCORE_CACHE_MAX_MB", "64"))
+SCORE_CACHE_DISK_ROWS = int(os.getenv("SCORE_CACHE_DISK_ROWS", "1000000"))  # SQLite rows kept; 0 = unbounded
+
+# Final per-sub-claim results; concurrent requests for the same sub-claim share one computation
+CLAIM_CACHE_TTL_S = float(os.getenv("CLAIM_CACHE_TTL_S", "3600"))  # 0 = coalesce only, never reuse
+CLAIM_CACHE_ITEMS = int(os.getenv("CLAIM_CACHE_ITEMS", "10000"))
+
+# Batch checking (/check/batch and scripts/check_batch.py)
+BATCH_DOC_CONCURRENCY = int(os.getenv("BATCH_DOC_CONCURRENCY", "16"))  # documents in flight
+BATCH_DEDUP_ITEMS = int(os.getenv("BATCH_DEDUP_ITEMS", "100000"))     # sub-claims remembered per batch
+
+# Local evidence index (scripts/build_evidence_index.py), searched before the web; empty = off
+EVIDENCE_INDEX_DIR = os.getenv("EVIDENCE_INDEX_DIR", "")
+LOCAL_CANDIDATES = int(os.getenv("LOCAL_CANDIDATES", "100"))  # BM25 and ANN hits merged per sub-claim
+LOCAL_TOP_K = int(os.getenv("LOCAL_TOP_K", "20"))             # hybrid top-k passed to the reranker
+LOCAL_NLI_WINDOWS = int(os.getenv("LOCAL_NLI_WINDOWS", "5"))  # reranked passages checked with NLI
+
+# Claim segmentation (spaCy)
+SPACY_EXCLUDE = [c.strip() for c in os.getenv("SPACY_EXCLUDE", "lemmatizer").split(",") if c.strip()]  # unused components
+SPACY_BATCH_SIZE = int(os.getenv("SPACY_BATCH_SIZE", "32"))   # documents per nlp.pipe batch
+SPACY_PIPE_CHUNK = int(os.getenv("SPACY_PIPE_CHUNK", "256"))  # batch-API records parsed ahead per nlp.pipe call
+SPACY_N_PROCESS = int(os.getenv("SPACY_N_PROCESS", "1"))      # >1: nlp.pipe worker processes (batch API only)
 
 # Retrieval / ranking
 PARA_MIN_WORDS = 8
-RECALL_TOP_PARAS = 10        # candidates passed to the reranker
+RECALL_TOP_K = int(os.getenv("RECALL_TOP_K", "40"))          # candidates per sub-claim passed to the reranker
+RECALL_PER_PAGE = int(os.getenv("RECALL_PER_PAGE", "10"))    # ...of which at most this many from one page
 TOP_PARAS_PER_PAGE = 3       # NLI checks per page after rerank
+NLI_BATCH_SIZE = int(os.getenv("NLI_BATCH_SIZE", "16"))  # max pairs per NLI forward pass
+NLI_MAX_TOKENS = int(os.getenv("NLI_MAX_TOKENS", "512"))  # claim + window, special tokens included
+NLI_WINDOW_RADIUS = int(os.getenv("NLI_WINDOW_RADIUS", "1"))  # neighbours on each side, if they fit
+
+# Inference backend: "torch" (eager fp32) or "onnx" (ONNX Runtime; falls back to torch per model)
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "torch").lower()
+ONNX_DIR = os.getenv("ONNX_DIR", os.path.join(os.path.dirname(__file__), ".cache", "onnx"))
+ONNX_QUANTIZE = os.getenv("ONNX_QUANTIZE", "1") == "1"  # dynamic int8 weights
+ONNX_THREADS = int(os.getenv("ONNX_THREADS", "0"))       # 0 = onnxruntime default
+
+# Model lifecycle: models load in parallel in the background at startup
+MODEL_WARMUP = os.getenv("MODEL_WARMUP", "1") == "1"  # run a dummy batch through each model once loaded
+# Load weights at import so gunicorn's preloading master shares them copy-on-write (gunicorn.conf.py)
+PRELOAD_MODELS = os.getenv("PRELOAD_MODELS", "0") == "1"
+
+# Cross-request micro-batching: flush a model's queue at this size or after this wait
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "32"))
+BATCH_MAX_WAIT_MS = float(os.getenv("BATCH_MAX_WAIT_MS", "10"))
 
 # Decision thresholds
 SUPPORT_THRESHOLD = 0.60
@@ -22,6 +117,21 @@ CONTRA_THRESHOLD  = 0.60
 MARGIN = 0.08
 MIN_SOURCES = 1
 
+# Adaptive early termination: stop retrieving once the votes settle a sub-claim's verdict
+EARLY_STOP = os.getenv("EARLY_STOP", "1") == "1"
+EARLY_STOP_CONF = float(os.getenv("EARLY_STOP_CONF", "0.85"))      # trust-weighted conf of the winning vote
+EARLY_STOP_MARGIN = float(os.getenv("EARLY_STOP_MARGIN", "0.30"))  # ...over the best opposing vote
+EARLY_STOP_SOURCES = int(os.getenv("EARLY_STOP_SOURCES", "2"))     # distinct domains that agree
+EARLY_STOP_WAVE = int(os.getenv("EARLY_STOP_WAVE", "4"))           # pages scored and checked per wave
+
+# Per-request deadline and work budget (defaults; /check callers may pass their own "budget"); 0 = unlimited
+REQUEST_DEADLINE_S = float(os.getenv("REQUEST_DEADLINE_S", "45"))
+REQUEST_DEADLINE_MAX_S = float(os.getenv("REQUEST_DEADLINE_MAX_S", "120"))  # cap on per-call deadlines
+REQUEST_MAX_URLS = int(os.getenv("REQUEST_MAX_URLS", "150"))             # pages downloaded per document
+REQUEST_MAX_NLI_PAIRS = int(os.getenv("REQUEST_MAX_NLI_PAIRS", "300"))   # NLI pairs per document
+# Budget pressure at which to skip the Wikipedia pass / go snippet-only / check 1 paragraph per page
+BUDGET_DEGRADE_AT = parse_degrade_at(os.getenv("BUDGET_DEGRADE_AT", "0.5,0.7,0.85"))
+
 TRUST_BONUS_DOMAINS = (
     ".wikipedia.org", ".britannica.com", ".gov", ".edu",
     "reuters.com", "apnews.com", "bbc.com", "nytimes.com", "nature.com",
@@ -37,22 +147,197 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# ===== NLP / Models =====
-nlp = spacy.load("en_core_web_sm")
+# ===== Metrics (exposed on /metrics) =====
+REQUESTS = REGISTRY.counter("llm_checker_requests_total", "API requests served", ["endpoint"])
+REQUEST_SECONDS = REGISTRY.histogram("llm_checker_request_seconds", "End-to-end latency per document", ["endpoint"])
+SEARX_QUERIES = REGISTRY.counter("llm_checker_searx_queries_total", "SearXNG queries by outcome", ["status"])
+PAGE_FETCHES = REGISTRY.counter("llm_checker_page_fetches_total", "fetch_paragraphs outcomes", ["result"])
+PARAGRAPHS_SCORED = REGISTRY.counter("llm_checker_paragraphs_scored_total", "Paragraphs through hybrid recall")
+NLI_PAIRS = REGISTRY.counter("llm_checker_nli_pairs_total", "NLI pairs by source (model or cache)", ["source"])
+VERDICTS = REGISTRY.counter("llm_checker_verdicts_total", "Sub-claim verdicts", ["verdict"])
+DEGRADED = REGISTRY.counter("llm_checker_degradations_total", "Budget degradations applied to sub-claims", ["kind"])
+MODEL_BATCH_SIZE = REGISTRY.histogram("llm_checker_model_batch_size", "Items per micro-batch", ["model"],
+                                      buckets=(1, 2, 4, 8, 16, 32, 64, 128))
+MODEL_BATCH_SECONDS = REGISTRY.histogram("llm_checker_model_batch_seconds", "Forward time per micro-batch", ["model"])
 
-# Dual-encoder for semantic recall
-embedder = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
-
-# Cross-encoder reranker for precision
-RERANKER_ID = "cross-encoder/ms-marco-MiniLM-L-6-v2"
-reranker = CrossEncoder(RERANKER_ID)
-
-# NLI for final entailment/contradiction
-MODEL_ID = "MoritzLaurer/deberta-v3-base-mnli-fever-anli"
-tok = AutoTokenizer.from_pretrained(MODEL_ID)
-nli = AutoModelForSequenceClassification.from_pretrained(MODEL_ID)
+# ===== NLP / Models =====
+# Populated by load_models() in a background thread at startup; /readyz reports progress.
+EMBEDDER_ID = "sentence-transformers/all-MiniLM-L6-v2"         # dual-encoder for semantic recall
+# Cross-encoder reranker for precision; a hub id or a local dir such as models/reranker
+# (compare candidates with scripts/eval_reranker.py)
+RERANKER_ID = os.getenv("RERANKER_ID", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+MODEL_ID = "MoritzLaurer/deberta-v3-base-mnli-fever-anli"      # NLI for final entailment/contradiction
 label_map = {0: "contradicted", 1: "unclear", 2: "supported"}
 
+nlp = None
+embedder = reranker = None
+tok = nli = nli_onnx = None
+embed_cache = score_cache = None
+evidence_index = None
+backends = {}  # stage -> "torch" | ONNX_TAG actually in use
+model_status = {"spacy": "pending", "embed": "pending", "rerank": "pending", "nli": "pending"}
+models_ready = threading.Event()
+_model_loader = None
+WORKER_SLOT = None  # set by after_fork() in multi-worker mode
+
+ONNX_TAG = "onnx-int8" if ONNX_QUANTIZE else "onnx"
+
+def load_onnx(kind: str, model_id: str):
+    """ONNX model for `kind` when INFERENCE_BACKEND=onnx, else None (use torch)."""
+    if INFERENCE_BACKEND != "onnx":
+        return None
+    return load_backend(kind, model_id, ONNX_DIR, quantize=ONNX_QUANTIZE, intra_op_threads=ONNX_THREADS)
+
+def _load_spacy():
+    global nlp
+    # Claim extraction needs POS, the parser and NER; lemmas are never read
+    nlp = spacy.load("en_core_web_sm", exclude=SPACY_EXCLUDE)
+
+def _load_embedder():
+    global embedder
+    model = load_onnx("embed", EMBEDDER_ID)
+    backends["embed"] = ONNX_TAG if model is not None else "torch"
+    embedder = model if model is not None else SentenceTransformer(EMBEDDER_ID)
+
+def _load_reranker():
+    global reranker
+    model = load_onnx("rerank", RERANKER_ID)
+    backends["rerank"] = ONNX_TAG if model is not None else "torch"
+    reranker = model if model is not None else CrossEncoder(RERANKER_ID)
+
+def _load_nli():
+    global tok, nli, nli_onnx
+    nli_onnx = load_onnx("nli", MODEL_ID)
+    backends["nli"] = ONNX_TAG if nli_onnx is not None else "torch"
+    if nli_onnx is not None:
+        tok, nli = nli_onnx.tokenizer, None
+    else:
+        tok = AutoTokenizer.from_pretrained(MODEL_ID)
+        nli = AutoModelForSequenceClassification.from_pretrained(MODEL_ID)
+
+_loaders = {"spacy": _load_spacy, "embed": _load_embedder, "rerank": _load_reranker, "nli": _load_nli}
+_warmups = {
+    "spacy": lambda: nlp("The Eiffel Tower was completed in Paris in 1889."),
+    "embed": lambda: embedder.encode(["warm-up sentence"], convert_to_numpy=True),
+    "rerank": lambda: reranker.predict([("warm-up query", "warm-up passage")]),
+    "nli": lambda: nli_batch([("warm-up claim", "warm-up passage")]),
+}
+
+def load_models(fork_safe_only: bool = False):
+    """Load every model not loaded yet, in parallel; sets `models_ready` once all are usable.
+
+    With `fork_safe_only` (gunicorn preload, see gunicorn.conf.py) only torch/spaCy
+    weights are loaded and nothing is run: ONNX Runtime sessions, warm-up passes
+    and the on-disk caches must be created in each worker after the fork.
+    """
+    global embed_cache, score_cache
+    t0 = time.time()
+    names = [n for n in _loaders if model_status[n] != "ready"]
+    if fork_safe_only and INFERENCE_BACKEND == "onnx":
+        names = [n for n in names if n == "spacy"]
+
+    def run(name):
+        model_status[name] = "loading"
+        t = time.time()
+        try:
+            _loaders[name]()
+        except Exception as e:
+            model_status[name] = f"error: {e}"
+            print(f"[models] {name} failed to load")
+            traceback.print_exc()
+            return
+        model_status[name] = "ready"
+        print(f"[models] {name} loaded in {time.time() - t:.1f}s")
+
+    with ThreadPoolExecutor(max_workers=max(1, len(names)), thread_name_prefix="model-load") as ex:
+        list(ex.map(run, names))
+    if fork_safe_only:
+        return
+    if any(st != "ready" for st in model_status.values()):
+        print(f"[models] not ready: {model_status}")
+        return
+
+    if MODEL_WARMUP:
+        with ThreadPoolExecutor(max_workers=len(_warmups), thread_name_prefix="model-warmup") as ex:
+            list(ex.map(lambda fn: fn(), _warmups.values()))
+
+    suffix = f"-w{WORKER_SLOT}" if WORKER_SLOT is not None else ""
+    embed_cache = EmbeddingCache(
+        dim=embedder.get_sentence_embedding_dimension(),
+        capacity=EMBED_CACHE_ITEMS,
+        # One cache file per model, backend and worker: vectors from different
+        # embedders never mix, and forked workers never write the same rows
+        path=(f"{EMBED_CACHE_PATH}-{EMBEDDER_ID.replace('/', '__')}-{backends['embed']}{suffix}"
+              if EMBED_CACHE_PATH else None),
+    )
+    # Keyed by model id, so changing MODEL_ID / RERANKER_ID invalidates persisted entries
+    score_cache = ScoreCache(
+        model_ids={"rerank": f"{RERANKER_ID}@{backends['rerank']}", "nli": f"{MODEL_ID}@{backends['nli']}"},
+        max_bytes=int(SCORE_CACHE_MAX_MB * 1024 * 1024),
+        path=SCORE_CACHE_PATH or None,
+        max_disk_rows=SCORE_CACHE_DISK_ROWS,
+    )
+    open_evidence_index()
+    models_ready.set()
+    print(f"[models] all ready in {time.time() - t0:.1f}s backends={backends}")
+
+def open_evidence_index():
+    global evidence_index
+    if not EVIDENCE_INDEX_DIR or evidence_index is not None:
+        return
+    try:
+        index = EvidenceIndex(EVIDENCE_INDEX_DIR)
+    except Exception as e:
+        print(f"[index] {EVIDENCE_INDEX_DIR} unavailable, using web search only: {e}")
+        return
+    if index.meta.get("embedder") != EMBEDDER_ID:
+        print(f"[index] built with {index.meta.get('embedder')}, not {EMBEDDER_ID}; ignoring it")
+        return
+    evidence_index = index
+    print(f"[index] {len(index)} paragraphs from {EVIDENCE_INDEX_DIR} (ann={index.ann_kind})")
+
+def start_model_loading():
+    global _model_loader
+    if models_ready.is_set() or (_model_loader is not None and _model_loader.is_alive()):
+        return
+    _model_loader = threading.Thread(target=load_models, name="model-loader", daemon=True)
+    _model_loader.start()
+
+if PRELOAD_MODELS:
+    load_models(fork_safe_only=True)
+
+@app.on_event("startup")
+async def begin_model_loading():
+    # Returns immediately so uvicorn starts serving /healthz, /readyz and /debug/searx
+    start_model_loading()
+
+def threads_per_worker(workers: int) -> int:
+    return max(1, (os.cpu_count() or 1) // max(1, workers))
+
+def after_fork(slot: int, workers: int):
+    """Per-worker setup after gunicorn forks a preloaded master (see gunicorn.conf.py).
+
+    Splits the cores between workers for torch / ONNX Runtime intra-op threads and
+    reopens SQLite connections, which must not be shared across processes.
+    """
+    global WORKER_SLOT, ONNX_THREADS
+    WORKER_SLOT = slot
+    n = threads_per_worker(workers)
+    torch.set_num_threads(n)
+    if ONNX_THREADS <= 0:
+        ONNX_THREADS = n
+    page_cache.reopen()
+    print(f"[worker {slot}] pid={os.getpid()} threads={n}")
+
+async def wait_until_ready(timeout: float | None = None) -> bool:
+    start_model_loading()
+    return await asyncio.to_thread(models_ready.wait, timeout)
+
+def require_ready():
+    if not models_ready.is_set():
+        raise HTTPException(status_code=503, detail={"status": "loading", "models": model_status},
+                            headers={"Retry-After": "5"})
+
 # ===== Utilities =====
 def domain_weight(url: str) -> float:
     try:
@@ -102,8 +387,9 @@ def decision_from_votes(votes, support_threshold=SUPPORT_THRESHOLD, contra_thres
     best = best_sup if (best_sup and (not best_con or best_sup["conf"] >= best_con["conf"])) else best_con
     return "unclear", best
 
-def extract_claims(text: str, cap: int = 8):
-    doc = nlp(text or "")
+def claim_spans(doc, cap: int = 8):
+    """[(claim, sentence span)] picked from a parsed document; the span is None for the
+    whole-text fallback. Sub-claims are split from the spans without parsing again."""
     out = []
 
     def has_verb(span): 
@@ -119,27 +405,33 @@ def extract_claims(text: str, cap: int = 8):
 
     for s in doc.sents:
         if has_verb(s) and (has_salient_ner(s) or has_num_or_date(s)):
-            out.append(s.text.strip())
+            out.append((s.text.strip(), s))
 
     if not out:
         for s in doc.sents:
             st = s.text.strip()
             if has_verb(s) and len(st.split()) >= 3:
-                out.append(st)
+                out.append((st, s))
 
     if not out:
-        whole = (text or "").strip()
+        whole = doc.text.strip()
         if whole:
-            out = [whole if len(whole) <= 500 else whole[:500]]
+            out = [(whole if len(whole) <= 500 else whole[:500], None)]
 
-    out = [c.replace("\n", " ").strip(" .") for c in out]
-    out = list(dict.fromkeys([c for c in out if len(c.split()) >= 3]))
-    return out[:cap]
+    claims, seen = [], set()
+    for c, span in out:
+        c = c.replace("\n", " ").strip(" .")
+        if len(c.split()) >= 3 and c not in seen:
+            seen.add(c)
+            claims.append((c, span))
+    return claims[:cap]
 
-def decompose_claim(claim: str):
-    doc = nlp(claim)
+def extract_claims(text: str, cap: int = 8):
+    return [c for c, _ in claim_spans(nlp(text or ""), cap)]
+
+def split_sub_claims(tokens, claim: str):
     chunks, cur = [], []
-    for tok in doc:
+    for tok in tokens:
         cur.append(tok.text)
         if tok.dep_ in {"cc"} or tok.text in {",", ";", "and", "but"}:
             s = " ".join(cur).strip(" ,;")
@@ -152,35 +444,391 @@ def decompose_claim(claim: str):
             chunks.append(s)
     return chunks or [claim]
 
+def decompose_claim(claim: str):
+    return split_sub_claims(nlp(claim), claim)
+
+def decompose_span(claim: str, span):
+    """decompose_claim() for a claim from claim_spans(), reusing its parse when there is one."""
+    if span is None:
+        return decompose_claim(claim)
+    # Same tokens decompose_claim(claim) sees: no newlines, no sentence-final period
+    tokens = [t for t in span if not t.is_space]
+    while tokens and tokens[-1].text == ".":
+        tokens.pop()
+    return split_sub_claims(tokens, claim)
+
 # ===== Retrieval helpers =====
+search_client = SearchClient(
+    SEARX_URL,
+    timeout=SEARX_TIMEOUT_S,
+    max_connections=SEARX_MAX_CONNECTIONS,
+    rate_per_s=SEARX_RATE_PER_S,
+    retries=SEARX_RETRIES,
+    backoff_s=SEARX_BACKOFF_S,
+    cache_ttl_s=SEARX_CACHE_TTL_S,
+    empty_ttl_s=SEARX_CACHE_EMPTY_TTL_S,
+    cache_items=SEARX_CACHE_ITEMS,
+    on_result=lambda status: SEARX_QUERIES.inc(status=status),
+)
+
 async def searx(query: str):
-    params = {"q": query, "format": "json", "language": "en"}
+    return await search_client.search(query)
+
+@app.on_event("shutdown")
+async def close_search_client():
+    await search_client.close()
+
+# Shared pooled client for page downloads; created lazily inside the running loop
+_http_client = None
+_fetch_sem = asyncio.Semaphore(FETCH_MAX_CONCURRENCY)
+_host_sems = defaultdict(lambda: asyncio.Semaphore(FETCH_PER_HOST_CONCURRENCY))
+
+class RouteTransport(httpx.AsyncBaseTransport):
+    """Sends every request to `route_url`/fetch?url=<original URL> (FETCH_ROUTE_URL).
+
+    The client still sees the real URL and Host, so per-host limits and
+    domain-based ranking behave as in production.
+    """
+
+    def __init__(self, route_url: str, limits: httpx.Limits):
+        self.route_url = route_url.rstrip("/") + "/fetch"
+        self._inner = httpx.AsyncHTTPTransport(limits=limits)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        routed = httpx.Request(request.method, httpx.URL(self.route_url, params={"url": str(request.url)}),
+                               headers=request.headers, stream=request.stream, extensions=request.extensions)
+        return await self._inner.handle_async_request(routed)
+
+    async def aclose(self) -> None:
+        await self._inner.aclose()
+
+def http_client() -> httpx.AsyncClient:
+    global _http_client
+    if _http_client is None:
+        limits = httpx.Limits(max_connections=FETCH_MAX_CONCURRENCY,
+                              max_keepalive_connections=FETCH_MAX_CONCURRENCY)
+        _http_client = httpx.AsyncClient(
+            timeout=FETCH_TIMEOUT_S,
+            follow_redirects=True,
+            headers={"User-Agent": FETCH_USER_AGENT},
+            limits=limits,
+            transport=RouteTransport(FETCH_ROUTE_URL, limits) if FETCH_ROUTE_URL else None,
+        )
+    return _http_client
+
+@app.on_event("shutdown")
+async def close_http_client():
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+page_cache = PageCache(
+    path=PAGE_CACHE_PATH or None,
+    mem_items=PAGE_CACHE_MEM_ITEMS,
+    max_bytes=int(PAGE_CACHE_MAX_MB * 1024 * 1024),
+    default_ttl=PAGE_CACHE_TTL_S,
+    negative_ttl=PAGE_CACHE_NEGATIVE_TTL_S,
+    domain_ttls=PAGE_CACHE_DOMAIN_TTLS,
+)
+extract_pool = ExtractPool(
+    workers=EXTRACT_WORKERS,
+    timeout_s=EXTRACT_TIMEOUT_S,
+    max_html_bytes=int(EXTRACT_MAX_HTML_MB * 1024 * 1024),
+    min_words=PARA_MIN_WORDS,
+    max_tasks_per_child=EXTRACT_MAX_TASKS_PER_CHILD,
+)
+
+REGISTRY.gauge("llm_checker_extract_pool", "HTML extraction pool counters",
+               lambda: {(k,): v for k, v in extract_pool.snapshot().items()}, ["field"])
+
+@app.on_event("shutdown")
+async def close_extract_pool():
+    extract_pool.shutdown()
+
+_pages = OrderedDict()  # normalized url -> (page text, Page), so token counts outlive one sub-claim
+
+def page_for(url: str, text: str, paras=None):
+    """The Page for `text` at `url`; the same object while the cached text is unchanged."""
+    key = normalize_url(url)
+    item = _pages.get(key)
+    if item is not None and item[0] == text:  # usually the very same string from the page cache
+        _pages.move_to_end(key)
+        return item[1]
+    page = Page(url, paras if paras is not None else split_paragraphs(text, PARA_MIN_WORDS))
+    _pages[key] = (text, page)
+    while len(_pages) > PAGE_CACHE_MEM_ITEMS:
+        _pages.popitem(last=False)
+    return page
+
+_fetch_inflight = {}  # normalized url -> Task, so concurrent sub-claims share one download
+_fetch_waiters = {}   # normalized url -> callers awaiting that Task
+
+def _fetch_done(key: str, task: asyncio.Task):
+    if _fetch_inflight.get(key) is task:
+        del _fetch_inflight[key]
+        _fetch_waiters.pop(key, None)
+
+async def fetch_paragraphs(url: str):
+    """The page at `url` as a Page of its paragraphs (>= PARA_MIN_WORDS words), or None if unavailable.
+
+    Cancelling the last caller waiting on a URL cancels its download, and its
+    extraction if that has not reached a pool worker yet.
+    """
+    key = normalize_url(url)
+    task = _fetch_inflight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(_fetch_paragraphs(url))
+        _fetch_inflight[key] = task
+        task.add_done_callback(lambda t: _fetch_done(key, t))
+    # shield: one caller going away must not cancel a download others wait on (as in ClaimCache._wait)
+    _fetch_waiters[key] = _fetch_waiters.get(key, 0) + 1
+    try:
+        return await asyncio.shield(task)
+    except asyncio.CancelledError:
+        left = _fetch_waiters.get(key, 1) - 1
+        _fetch_waiters[key] = left
+        if left <= 0 and not task.done():
+            task.cancel()
+            _fetch_done(key, task)  # new callers start a fresh fetch instead of joining this one
+        raise
+
+async def download(url: str, headers):
+    """(response, body) where body is None when it exceeds the extraction size guard.
+
+    The body is streamed so oversized pages are abandoned without being read in full.
+    """
+    limit = extract_pool.max_html_bytes
+    async with http_client().stream("GET", url, headers=headers) as r:
+        if not r.is_success:
+            return r, b""
+        declared = r.headers.get("content-length", "")
+        if limit and declared.isdigit() and int(declared) > limit:
+            return r, None
+        body = bytearray()
+        async for chunk in r.aiter_bytes():
+            body += chunk
+            if limit and len(body) > limit:
+                return r, None
+        return r, bytes(body)
+
+async def page_cache_io(fn, *args, **kwargs):
+    """Call a page_cache method that may touch SQLite, in a thread when the disk tier is on."""
+    if page_cache.on_disk:
+        return await asyncio.to_thread(fn, *args, **kwargs)
+    return fn(*args, **kwargs)
+
+async def _fetch_paragraphs(url: str):
+    # Memory hits are answered inline; only the SQLite tier goes to a thread
+    entry = page_cache.get(url, disk=False) or await page_cache_io(page_cache.get, url)
+    if entry is not None and entry.fresh:
+        PAGE_FETCHES.inc(result="cache_negative" if entry.negative else "cache_hit")
+        return page_for(url, entry.text) if entry.text else None
+
+    headers = {}
+    if entry is not None and not entry.negative:
+        if entry.etag:
+            headers["If-None-Match"] = entry.etag
+        if entry.last_modified:
+            headers["If-Modified-Since"] = entry.last_modified
+
+    host = urlparse(url).netloc.lower()
     try:
-        async with httpx.AsyncClient(timeout=SEARX_TIMEOUT_S) as client:
-            r = await client.get(SEARX_URL, params=params)
-            r.raise_for_status()
-            results = r.json().get("results", [])[:10]
-            print(f"[searx] '{query}' -> {len(results)} results")
-            return results
+        async with _fetch_sem, _host_sems[host]:
+            with stage_timer("download"):
+                r, body = await download(url, headers)
+        if r.status_code == 304 and headers:
+            PAGE_FETCHES.inc(result="revalidated")
+            text = (await page_cache_io(page_cache.refresh, entry)).text
+            return page_for(url, text) if text else None
+        if r.status_code in BLOCKED_STATUS:
+            PAGE_FETCHES.inc(result="blocked")
+            await page_cache_io(page_cache.put, url, None, negative=True)
+            return None
+        r.raise_for_status()
     except Exception as e:
-        print(f"[searx] query='{query}' error={e}")
-        return []
-
-def fetch_text(url: str):
+        print(f"[fetch] url={url} error={e}")
+        PAGE_FETCHES.inc(result="error")
+        return None
+    if not body:
+        PAGE_FETCHES.inc(result="empty" if body is not None else "too_large")
+        if body is None:
+            await page_cache_io(page_cache.put, url, None, negative=True)
+        return None
     try:
-        downloaded = trafilatura.fetch_url(url)
-        return trafilatura.extract(downloaded) if downloaded else None
+        with stage_timer("extract"):
+            paras = await extract_pool.extract(body, url)
+    except (HtmlTooLarge, ExtractTimeout) as e:
+        # Same page, same outcome next time: cache negatively
+        print(f"[fetch] url={url} extract skipped: {type(e).__name__} {e}")
+        PAGE_FETCHES.inc(result="too_large" if isinstance(e, HtmlTooLarge) else "extract_timeout")
+        await page_cache_io(page_cache.put, url, None, negative=True)
+        return None
     except Exception as e:
-        print(f"[fetch_text] url={url} error={e}")
+        print(f"[fetch] url={url} extract error={e}")
+        PAGE_FETCHES.inc(result="error")
         return None
+    PAGE_FETCHES.inc(result="fetched" if paras else "empty")
+    # Only the kept paragraphs are cached. Nothing extractable (paywall, JS-only
+    # shell, bot wall) is cached negatively too.
+    entry = await page_cache_io(page_cache.put, url, "\n".join(paras) or None, etag=r.headers.get("etag"),
+                                last_modified=r.headers.get("last-modified"), negative=not paras)
+    return page_for(url, entry.text, paras) if paras else None
+
+def nli_batch(pairs, batch_size: int = NLI_BATCH_SIZE):
+    """Label (claim, passage) pairs; returns [(label, conf) | None] in input order.
+
+    Pairs are tokenized once, sorted by token length and padded per batch so
+    each forward pass wastes as little compute on padding as possible.
+    """
+    out = [None] * len(pairs)
+    if not pairs:
+        return out
+    enc = tok([c for c, _ in pairs], [p for _, p in pairs], truncation=True, max_length=NLI_MAX_TOKENS)
+    order = sorted(range(len(pairs)), key=lambda i: len(enc["input_ids"][i]))
+    for start in range(0, len(order), batch_size):
+        idx = order[start:start + batch_size]
+        try:
+            feats = [{k: enc[k][i] for k in enc.keys()} for i in idx]
+            if nli_onnx is not None:
+                probs = softmax(nli_onnx.logits(tok.pad(feats, return_tensors="np")))
+            else:
+                with torch.no_grad():
+                    logits = nli(**tok.pad(feats, return_tensors="pt")).logits
+                probs = torch.softmax(logits, dim=-1).numpy()
+            arg = probs.argmax(axis=-1)
+            conf = probs.max(axis=-1)
+        except Exception:
+            print(f"[nli] batch error size={len(idx)}")
+            traceback.print_exc()
+            continue
+        for j, i in enumerate(idx):
+            out[i] = (label_map[int(arg[j])], float(conf[j]))
+    return out
 
 def nli_label(claim: str, passage: str):
-    inputs = tok(claim, passage, return_tensors="pt", truncation=True, max_length=512)
-    with torch.no_grad():
-        logits = nli(**inputs).logits[0]
-    probs = torch.softmax(logits, dim=-1)
-    idx = int(torch.argmax(probs))
-    return label_map[idx], float(probs[idx])
+    return nli_batch([(claim, passage)])[0]
+
+def nli_token_counts(texts):
+    """Token counts of `texts` under the NLI tokenizer, without special tokens."""
+    return [len(ids) for ids in tok(texts, add_special_tokens=False)["input_ids"]]
+
+def nli_token_cut(text: str, max_tokens: int) -> int:
+    """Character offset where the first `max_tokens` NLI tokens of `text` end."""
+    if not getattr(tok, "is_fast", False):
+        return len(text)  # slow tokenizers have no offsets; nli_batch truncates instead
+    offsets = tok(text, add_special_tokens=False, truncation=True, max_length=max_tokens,
+                  return_offsets_mapping=True)["offset_mapping"]
+    return offsets[-1][1] if offsets else 0
+
+def window_budget(subc: str) -> int:
+    """Tokens left for the evidence window once the sub-claim is in the NLI input."""
+    return max(16, NLI_MAX_TOKENS - PAIR_SPECIAL_TOKENS - nli_token_counts([subc])[0])
+
+# ===== Cross-request inference scheduler =====
+# All requests queue model work here; one worker thread runs it in shared batches.
+def observe_batch(name: str, size: int, seconds: float):
+    MODEL_BATCH_SIZE.observe(size, model=name)
+    MODEL_BATCH_SECONDS.observe(seconds, model=name)
+
+batcher = MicroBatcher(max_batch=BATCH_MAX_SIZE, max_wait_s=BATCH_MAX_WAIT_MS / 1000.0, on_flush=observe_batch)
+batcher.register("embed", lambda texts: list(embedder.encode(texts, convert_to_numpy=True)))
+batcher.register("rerank", lambda pairs: np.asarray(reranker.predict(pairs)).tolist())
+batcher.register("nli", nli_batch)
+
+@app.on_event("shutdown")
+async def stop_batcher():
+    batcher.stop()
+
+@app.on_event("shutdown")
+async def close_caches():
+    page_cache.close()
+    if embed_cache is not None:
+        embed_cache.flush()
+    if score_cache is not None:
+        score_cache.close()
+
+claim_cache = ClaimCache(ttl_s=CLAIM_CACHE_TTL_S, max_items=CLAIM_CACHE_ITEMS)
+
+def cache_events():
+    out = {}
+    snaps = [("pages", page_cache.snapshot()), ("claims", claim_cache.snapshot()),
+             ("search", search_client.snapshot())]
+    if embed_cache is not None:
+        snaps.append(("embeddings", embed_cache.snapshot()))
+    for name, snap in snaps:
+        for k, v in snap.items():
+            if isinstance(v, (int, float)) and not isinstance(v, bool):
+                out[(name, k)] = v
+    if score_cache is not None:
+        for stage, st in score_cache.snapshot()["stages"].items():
+            for k, v in st.items():
+                out[(f"scores_{stage}", k)] = v
+    return out
+
+REGISTRY.gauge("llm_checker_cache", "Cache counters and sizes (from the cache snapshots)",
+               cache_events, ["cache", "field"])
+
+def count_cache(stats, stage: str, hits: int, lookups: int):
+    """Accumulate per-stage cache hits into a debug dict (no-op when stats is None)."""
+    if stats is None:
+        return
+    st = stats.setdefault(stage, {"hits": 0, "lookups": 0})
+    st["hits"] += hits
+    st["lookups"] += lookups
+
+async def embed_texts(texts, stats=None):
+    """Embeddings for `texts`; only text not already in `embed_cache` goes through the model."""
+    vecs = embed_cache.get_many(texts)
+    missing = [i for i, v in enumerate(vecs) if v is None]
+    count_cache(stats, "embed", len(texts) - len(missing), len(texts))
+    if missing:
+        # Identical paragraphs inside one call are encoded once
+        todo = list(dict.fromkeys(texts[i] for i in missing))
+        encoded = dict(zip(todo, await batcher.submit("embed", todo)))
+        embed_cache.put_many(todo, [encoded[t] for t in todo])
+        for i in missing:
+            vecs[i] = np.asarray(encoded[texts[i]], dtype=np.float32)
+    return np.stack(vecs)
+
+async def score_cache_io(fn, *args):
+    """Call a score_cache method that may touch SQLite, in a thread when the disk tier is on."""
+    if score_cache.on_disk:
+        return await asyncio.to_thread(fn, *args)
+    return fn(*args)
+
+async def cached_scores(stage: str, pairs):
+    """Reranker / NLI outputs for (claim, passage) pairs, memoized in `score_cache`.
+
+    Returns (results, hit_mask); results are None where the model failed.
+    """
+    got = await score_cache_io(score_cache.get_many, stage, pairs)
+    hit_mask = [v is not None for v in got]
+    missing = [i for i, hit in enumerate(hit_mask) if not hit]
+    if missing:
+        todo = list(dict.fromkeys(pairs[i] for i in missing))
+        fresh = dict(zip(todo, await batcher.submit(stage, todo)))
+        await score_cache_io(score_cache.put_many, stage, todo, [fresh[p] for p in todo])
+        for i in missing:
+            got[i] = fresh[pairs[i]]
+    return got, hit_mask
+
+# ===== Health =====
+@app.get("/healthz")
+async def healthz():
+    """Liveness: the process is up and serving (models may still be loading)."""
+    return {"status": "ok"}
+
+@app.get("/readyz")
+async def readyz():
+    """Readiness: 200 once every model is loaded (and warmed up), 503 before."""
+    body = {"status": "ready" if models_ready.is_set() else "loading",
+            "models": model_status, "backends": backends,
+            "evidence_index": ({"paragraphs": len(evidence_index), "ann": evidence_index.ann_kind}
+                               if evidence_index is not None else None)}
+    if not models_ready.is_set():
+        raise HTTPException(status_code=503, detail=body)
+    return body
 
 # ===== Debug endpoint to inspect SearXNG =====
 @app.get("/debug/searx")
@@ -198,219 +846,761 @@ async def debug_searx(q: str = Query(..., description="search query")):
     ]
     return {"count": len(slim), "results": slim}
 
-# ===== Main API =====
-@app.post("/check")
-async def check(payload: dict):
-    t0 = time.time()
-    llm_output = (payload or {}).get("llm_output", "") or ""
-    want_debug = bool((payload or {}).get("debug", False))
-    claims = extract_claims(llm_output)
-
-    print(f"[check] text_len={len(llm_output)} claims={claims}")
-    results = []
-    debug_out = []  # collected only if want_debug
-
-    for c in claims:
-        sub_claims = decompose_claim(c)
-        q_short = c[:128]
-
-        for subc in sub_claims:
-            queries = [
-                f"\"{subc}\"",
-                subc[:128],
-                q_short.replace(" is ", " was "),
-                q_short.replace(" was ", " is "),
-            ]
-
-            candidates = []
-            seen_urls = set()
-            debug_claim = {
-                "sub_claim": subc,
-                "queries": [],
-                "hits_by_query": [],
-                "urls_used": [],
-                "candidates": 0,
-                "notes": []
-            }
-
-            # Pass 1: general search
-            for q in queries:
-                hits = await searx(q)
-                debug_claim["queries"].append(q)
-                debug_claim["hits_by_query"].append(
-                    [{"url": h.get("url"), "engine": h.get("engine")} for h in hits]
-                )
-
-                for res in hits:
-                    url = res.get("url")
-                    if not url or url in seen_urls:
-                        continue
-                    seen_urls.add(url)
-
-                    # Try full-text extraction
-                    text = fetch_text(url)
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/debug/cache")
+async def debug_cache():
+    return {"pages": page_cache.snapshot(),
+            "embeddings": embed_cache.snapshot() if embed_cache is not None else None,
+            "scores": score_cache.snapshot() if score_cache is not None else None,
+            "claims": claim_cache.snapshot(),
+            "search": search_client.snapshot()}
+
+# ===== Pipeline =====
+async def score_pages(subc: str, pages, debug_claim=None):
+    """Hybrid recall over the paragraphs of all `pages` at once -> cross-encoder rerank.
+
+    `pages` is [Page]. Returns the NLI windows to check, at most
+    TOP_PARAS_PER_PAGE per page; NLI itself is batched per request.
+    """
+    if not pages:
+        return []
+    stats = debug_claim["cache"] if debug_claim is not None else None
+    timings = debug_claim["timings"] if debug_claim is not None else None
+    paras = [p for page in pages for p in page.paras]
+    sizes = [len(page) for page in pages]
+    page_of = np.repeat(np.arange(len(pages)), sizes)
+    first = np.concatenate(([0], np.cumsum(sizes)))
+    PARAGRAPHS_SCORED.inc(len(paras))
+
+    # Stage 1: BM25 + cosine (recall), one corpus and one claim embedding for every page
+    with stage_timer("bm25", timings):
+        bm = BM25Corpus([tokenize(p) for p in paras]).scores(tokenize(subc))
+    with stage_timer("embed", timings):
+        emb = await embed_texts([subc] + paras, stats)
+    hybrid = hybrid_scores(bm, cosine_scores(emb[0], emb[1:]))
+    top = select_top(hybrid, page_of, RECALL_TOP_K, RECALL_PER_PAGE)
+
+    # Stage 2: cross-encoder rerank (precision)
+    pairs = [(subc, paras[i]) for i in top]
+    try:
+        with stage_timer("rerank", timings):
+            rerank_scores, hit_mask = await cached_scores("rerank", pairs)
+        count_cache(stats, "rerank", sum(hit_mask), len(pairs))
+        rerank_scores = np.array([-np.inf if s is None else s for s in rerank_scores], dtype=np.float64)
+    except Exception:
+        print("[reranker] fallback to hybrid")
+        rerank_scores = hybrid[top]
+
+    keep = top[select_top(rerank_scores, page_of[top], len(top), paras_per_page(debug_claim))]
+    keep = keep[np.argsort(page_of[keep], kind="stable")]  # page order, best first within a page
+
+    # NLI on the paragraph plus as many neighbours (±NLI_WINDOW_RADIUS) as fit the model's input
+    with stage_timer("windows", timings):
+        budget = window_budget(subc)
+        windows = []
+        for i in keep:
+            page = pages[page_of[i]]
+            lo, hi, passage = pack_window(page, int(i - first[page_of[i]]), budget, NLI_WINDOW_RADIUS,
+                                          nli_token_counts, nli_token_cut)
+            windows.append({"url": page.url, "passage": passage, "paras": (lo, hi), "span": page.span(lo, hi, passage)})
+    return windows
+
+def record_hits(debug_claim, query: str, hits):
+    debug_claim["queries"].append(query)
+    debug_claim["hits_by_query"].append(
+        [{"url": h.get("url"), "engine": h.get("engine")} for h in hits]
+    )
+
+async def search_all(queries, debug_claim):
+    """Run every query concurrently; returns hit lists in query order."""
+    hit_lists = await asyncio.gather(*(searx(q) for q in queries))
+    for q, hits in zip(queries, hit_lists):
+        record_hits(debug_claim, q, hits)
+    return hit_lists
+
+def web_queries(subc: str, q_short: str):
+    """Search queries for a sub-claim, without duplicates (the is/was swaps are often no-ops)."""
+    queries = [
+        f"\"{subc}\"",
+        subc[:128],
+        q_short.replace(" is ", " was "),
+        q_short.replace(" was ", " is "),
+    ]
+    unique = {}
+    for q in queries:
+        unique.setdefault(" ".join(q.split()).lower(), q)
+    return list(unique.values())
+
+def pages_from_hits(hits, fetched):
+    """[Page] for fetched search hits; the SearXNG snippet stands in for blocked pages."""
+    pages = []
+    for res, page in zip(hits, fetched):
+        # Fallback: use SearXNG summary snippet as a tiny passage if site blocks scraping
+        snippets = []
+        content_snip = (res.get("content") or "").strip()
+        if content_snip and len(content_snip.split()) >= PARA_MIN_WORDS:
+            snippets.append(content_snip)
+
+        if page is not None:
+            pages.append(page.with_extra(snippets) if snippets else page)
+        elif snippets:
+            pages.append(Page(res["url"], snippets))
+    return pages
+
+def new_debug_claim(subc: str):
+    return {
+        "sub_claim": subc,
+        "queries": [],
+        "hits_by_query": [],
+        "urls_used": [],
+        "candidates": 0,
+        "notes": [],
+        "degraded": [],
+        "cache": {},
+        "timings": {}
+    }
 
-                    # Fallback: use SearXNG summary snippet as a tiny passage if site blocks scraping
-                    snippets = []
-                    content_snip = (res.get("content") or "").strip()
-                    if content_snip and len(content_snip.split()) >= PARA_MIN_WORDS:
-                        snippets.append(content_snip)
+# ===== Budget checks (see budget.py) =====
+def degrade(debug_claim, kind: str):
+    if debug_claim is not None and kind not in debug_claim["degraded"]:
+        debug_claim["degraded"].append(kind)
+        DEGRADED.inc(kind=kind)
+
+def fetch_allowance(n: int, debug_claim) -> int:
+    """How many of `n` pages may be downloaded; the rest fall back to their search snippets."""
+    budget = current_budget()
+    if budget is None:
+        return n
+    granted = budget.take_urls(n) if budget.allows("snippets_only") else 0
+    if granted < n:
+        degrade(debug_claim, "snippets_only")
+    return granted
+
+def refund_fetches(n: int):
+    """Give back URL budget for `n` granted fetches that were cancelled before they finished."""
+    budget = current_budget()
+    if budget is not None and n > 0:
+        budget.refund_urls(n)
+
+async def fetch_pages(hits, debug_claim):
+    """fetch_paragraphs for each hit within the URL budget; None (snippet only) beyond it."""
+    k = fetch_allowance(len(hits), debug_claim)
+    fetched = await asyncio.gather(*(fetch_paragraphs(res["url"]) for res in hits[:k]))
+    return list(fetched) + [None] * (len(hits) - k)
+
+def wiki_fallback_allowed(debug_claim) -> bool:
+    budget = current_budget()
+    if budget is None or budget.allows("no_wiki_fallback"):
+        return True
+    degrade(debug_claim, "no_wiki_fallback")
+    return False
+
+def paras_per_page(debug_claim) -> int:
+    budget = current_budget()
+    if budget is None or budget.allows("fewer_paras_per_page"):
+        return TOP_PARAS_PER_PAGE
+    degrade(debug_claim, "fewer_paras_per_page")
+    return 1
+
+def nli_allowance(windows, debug_claim):
+    """The windows that fit the NLI-pair budget (the best-ranked ones come first per page)."""
+    budget = current_budget()
+    if budget is None:
+        return windows
+    granted = budget.take_nli(len(windows))
+    if granted < len(windows):
+        degrade(debug_claim, "nli_pairs_capped")
+    return windows[:granted]
+
+async def local_windows(subc: str, debug_claim):
+    """Hybrid search of the local evidence index -> rerank; returns the best NLI windows."""
+    stats, timings = debug_claim["cache"], debug_claim["timings"]
+    with stage_timer("embed", timings):
+        qvec = (await embed_texts([subc], stats))[0]
+    with stage_timer("local_search", timings):
+        hits = await asyncio.to_thread(evidence_index.search, subc, qvec, LOCAL_TOP_K, LOCAL_CANDIDATES)
+    if not hits:
+        return []
 
-                    if not text and not snippets:
+    order = list(range(len(hits)))  # already sorted by hybrid score
+    pairs = [(subc, h["text"]) for h in hits]
+    try:
+        with stage_timer("rerank", timings):
+            scores, hit_mask = await cached_scores("rerank", pairs)
+        count_cache(stats, "rerank", sum(hit_mask), len(pairs))
+        order.sort(key=lambda i: float("-inf") if scores[i] is None else scores[i], reverse=True)
+    except Exception:
+        print("[reranker] fallback to hybrid")
+
+    with stage_timer("windows", timings):
+        budget = window_budget(subc)
+        windows = []
+        for i in order[:LOCAL_NLI_WINDOWS]:
+            neighbours, center = evidence_index.neighbours(hits[i]["id"], NLI_WINDOW_RADIUS)
+            page = Page(hits[i]["url"], neighbours)
+            lo, hi, passage = pack_window(page, center, budget, NLI_WINDOW_RADIUS, nli_token_counts, nli_token_cut)
+            windows.append({"url": page.url, "passage": passage,
+                            "paras": (hits[i]["id"] - center + lo, hits[i]["id"] - center + hi)})
+            debug_claim["urls_used"].append(hits[i]["url"])
+    return windows
+
+async def gather_windows(subc: str, q_short: str, debug_claim):
+    """Retrieve and rerank web evidence for one sub-claim; returns the NLI windows."""
+    seen_urls = set()
+    timings = debug_claim["timings"]
+
+    # Pass 1: general search (all queries, then all pages, fetched concurrently)
+    with stage_timer("search", timings):
+        hit_lists = await search_all(web_queries(subc, q_short), debug_claim)
+    hits_to_fetch = []
+    for hits in hit_lists:
+        for res in hits:
+            url = res.get("url")
+            if not url or url in seen_urls:
+                continue
+            seen_urls.add(url)
+            hits_to_fetch.append(res)
+
+    with stage_timer("fetch", timings):
+        fetched = await fetch_pages(hits_to_fetch, debug_claim)
+    pages = pages_from_hits(hits_to_fetch, fetched)
+    windows = await score_pages(subc, pages, debug_claim)
+    debug_claim["urls_used"].extend(page.url for page in pages)
+
+    if not windows and wiki_fallback_allowed(debug_claim):
+        windows = await wikipedia_windows(subc, seen_urls, debug_claim)
+    return windows
+
+async def wikipedia_windows(subc: str, seen_urls, debug_claim):
+    """Pass 2: explicit Wikipedia fallback when the general search found nothing."""
+    timings = debug_claim["timings"]
+    wiki_queries = [f"site:wikipedia.org \"{subc}\"", f"site:wikipedia.org {subc[:128]}"]
+    with stage_timer("search", timings):
+        hit_lists = await search_all(wiki_queries, debug_claim)
+    wiki_urls = []
+    for hits in hit_lists:
+        for res in hits:
+            url = res.get("url")
+            if not url or url in seen_urls or "wikipedia.org" not in (url or ""):
+                continue
+            seen_urls.add(url)
+            wiki_urls.append(url)
+
+    wiki_urls = wiki_urls[:fetch_allowance(len(wiki_urls), debug_claim)]
+    with stage_timer("fetch", timings):
+        fetched = await asyncio.gather(*(fetch_paragraphs(u) for u in wiki_urls))
+    pages = [page for page in fetched if page is not None]
+
+    windows = await score_pages(subc, pages, debug_claim)
+    debug_claim["urls_used"].extend(page.url for page in pages)
+    return windows
+
+def verdict_settled(votes):
+    """True once further evidence is unlikely to flip decision_from_votes (EARLY_STOP_*)."""
+    verdict, best = decision_from_votes(votes)
+    if verdict == "unclear":
+        return False
+    if best["conf"] * domain_weight(best["url"]) < EARLY_STOP_CONF:
+        return False
+    threshold = SUPPORT_THRESHOLD if verdict == "supported" else CONTRA_THRESHOLD
+    agreeing = {urlparse(v["url"]).netloc for v in votes if v["label"] == verdict and v["conf"] >= threshold}
+    if len(agreeing) < max(MIN_SOURCES, EARLY_STOP_SOURCES):
+        return False
+    opposing = [v["conf"] for v in votes if v["label"] not in (verdict, "unclear")]
+    return best["conf"] - max(opposing, default=0.0) >= EARLY_STOP_MARGIN
+
+async def adaptive_candidates(subc: str, q_short: str, debug_claim, votes):
+    """Web evidence for a sub-claim, stopping once `votes` plus new ones settle the verdict.
+
+    All queries are sent at once and each page is fetched as soon as its query
+    returns, as in gather_windows. Pages join EARLY_STOP_WAVE at a time as their
+    fetches finish, most trusted domains first. After each wave, recall and
+    rerank run over every page so far (one corpus, as in score_pages), and only
+    windows not checked yet go to NLI; the votes are those of the current
+    windows. When every page has arrived, the result is the same as with
+    EARLY_STOP off. Once the verdict is settled, the searches and downloads
+    still outstanding are cancelled. Returns the new candidates; work that was
+    not done is counted in debug_claim["skipped"].
+    """
+    timings = debug_claim["timings"]
+    queries = web_queries(subc, q_short)
+    skipped = debug_claim["skipped"] = {"queries": 0, "urls": 0}
+    searches = {asyncio.ensure_future(searx(q)): q for q in queries}
+    fetches = {}  # Task -> search hit
+    ready = []    # (hit, Page or None) waiting for a wave
+    seen_urls = set()
+    pages = []    # every page so far, scored as one corpus
+    checked = {}  # (url, paras) -> NLI candidate, or None if NLI failed / was over budget
+    found = []
+    any_windows = False
+    try:
+        while searches or fetches or ready:
+            if (searches or fetches) and len(ready) < EARLY_STOP_WAVE:
+                with stage_timer("fetch" if fetches else "search", timings):
+                    done, _ = await asyncio.wait(list(searches) + list(fetches), return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task in fetches:
+                        ready.append((fetches.pop(task), task.result()))
                         continue
+                    query = searches.pop(task)
+                    hits = task.result()
+                    record_hits(debug_claim, query, hits)
+                    fresh = []
+                    for res in hits:
+                        url = res.get("url")
+                        if url and url not in seen_urls:
+                            seen_urls.add(url)
+                            fresh.append(res)
+                    fresh.sort(key=lambda r: domain_weight(r["url"]), reverse=True)
+                    allowed = fetch_allowance(len(fresh), debug_claim)
+                    for res in fresh[:allowed]:
+                        fetches[asyncio.ensure_future(fetch_paragraphs(res["url"]))] = res
+                    ready += [(res, None) for res in fresh[allowed:]]  # over the URL budget: snippet only
+                continue
+
+            ready.sort(key=lambda item: domain_weight(item[0]["url"]), reverse=True)
+            wave, ready = ready[:EARLY_STOP_WAVE], ready[EARLY_STOP_WAVE:]
+            new_pages = pages_from_hits([res for res, _ in wave], [page for _, page in wave])
+            debug_claim["urls_used"].extend(page.url for page in new_pages)
+            pages += new_pages
+            # Embeddings and rerank scores of earlier waves come from the caches
+            windows = await score_pages(subc, pages, debug_claim)
+            any_windows = any_windows or bool(windows)
+            new = [w for w in windows if (w["url"], w["paras"]) not in checked]
+            checked.update(((w["url"], w["paras"]), None) for w in new)
+            for cand in await nli_candidates(subc, new, debug_claim):
+                checked[(cand["url"], cand["paras"])] = cand
+            found = [checked[(w["url"], w["paras"])] for w in windows if checked[(w["url"], w["paras"])] is not None]
+            if verdict_settled(votes + found):
+                skipped["queries"] = len(searches)
+                skipped["urls"] = len(fetches) + len(ready)
+                debug_claim["notes"].append(f"early_stop:queries {len(queries) - len(searches)}/{len(queries)}")
+                return found
+    finally:
+        for task in searches:
+            task.cancel()
+        # Pages that were never downloaded do not count against the URL budget
+        refund_fetches(sum(task.cancel() for task in fetches))
+
+    if not any_windows and wiki_fallback_allowed(debug_claim):
+        found += await nli_candidates(subc, await wikipedia_windows(subc, seen_urls, debug_claim), debug_claim)
+    return found
+
+def decide(subc: str, candidates, debug_claim):
+    verdict, best = decision_from_votes(candidates)
+    debug_claim["candidates"] = len(candidates)
+    for st in debug_claim["cache"].values():
+        st["hit_ratio"] = round(st["hits"] / st["lookups"], 4) if st["lookups"] else 0.0
+    if best:
+        debug_claim["top_evidence"] = {
+            "label": best["label"], "conf": best["conf"], "url": best["url"],
+            "snippet": best["passage"][:240]
+        }
+    else:
+        debug_claim["top_evidence"] = None
 
-                    paras_all = []
-                    if text:
-                        paras_all.extend([p for p in text.split("\n") if len(p.split()) >= PARA_MIN_WORDS])
-                    paras_all.extend(snippets)
+    print(f"[check] sub-claim='{subc[:80]}' cand={len(candidates)} verdict={verdict} conf={(best or {}).get('conf')}")
+    VERDICTS.inc(verdict=verdict)
 
-                    if not paras_all:
-                        continue
+    return {
+        "text": subc,
+        "verdict": verdict,
+        "confidence": (best or {}).get("conf", 0.0),
+        "citation": ({"url": best["url"], "snippet": best["passage"][:350]} if best else None)
+    }
 
-                    # Stage 1: BM25 + cosine (recall)
-                    bm25 = BM25Okapi([p.split() for p in paras_all])
-                    bm = bm25.get_scores(subc.split())
-                    emb_c = embedder.encode([subc], convert_to_tensor=True)
-                    emb_p = embedder.encode(paras_all, convert_to_tensor=True)
-                    cos = util.cos_sim(emb_c, emb_p)[0].tolist()
-
-                    bm = bm = bm.tolist() if hasattr(bm, "tolist") else list(bm)
-                    if bm:  # now safe because it's a list
-                        mb = max(bm)
-                        maxbm = mb if mb > 0 else 1.0
-                    else:
-                        maxbm = 1.0
-
-                    hybrid = [0.6*(s/maxbm) + 0.4*cosv for s, cosv in zip(bm, cos)]
-                    top_idx = sorted(range(len(paras_all)), key=lambda i: hybrid[i], reverse=True)[:RECALL_TOP_PARAS]
-                    top_paras = [paras_all[i] for i in top_idx]
-
-                    # Stage 2: cross-encoder rerank (precision)
-                    pairs = [(subc, p) for p in top_paras]
-                    try:
-                        rerank_scores = reranker.predict(pairs).tolist()
-                    except Exception:
-                        print("[reranker] fallback to hybrid")
-                        rerank_scores = [hybrid[i] for i in top_idx]
-
-                    reranked = sorted(zip(top_paras, rerank_scores), key=lambda x: x[1], reverse=True)[:TOP_PARAS_PER_PAGE]
-
-                    # NLI with a small context window (±1 paragraph)
-                    for p, _score in reranked:
-                        try:
-                            try:
-                                pi = paras_all.index(p)
-                            except ValueError:
-                                pi = None
-                            if pi is not None:
-                                window = " ".join(paras_all[max(0, pi-1): min(len(paras_all), pi+2)])
-                            else:
-                                window = p
-                            window = " ".join(window.split()[:450])
-
-                            label, conf = nli_label(subc, window)
-                            candidates.append({"url": url, "passage": window, "label": label, "conf": conf})
-                        except Exception:
-                            print(f"[nli] error on url={url}")
-                            traceback.print_exc()
-
-                    debug_claim["urls_used"].append(url)
-
-            # Pass 2: explicit Wikipedia fallback if nothing found
-            if not candidates:
-                wiki_queries = [f"site:wikipedia.org \"{subc}\"", f"site:wikipedia.org {subc[:128]}"]
-                for q in wiki_queries:
-                    hits = await searx(q)
-                    debug_claim["queries"].append(q)
-                    debug_claim["hits_by_query"].append(
-                        [{"url": h.get("url"), "engine": h.get("engine")} for h in hits]
-                    )
-                    for res in hits:
-                        url = res.get("url")
-                        if not url or url in seen_urls or "wikipedia.org" not in (url or ""):
-                            continue
-                        seen_urls.add(url)
-
-                        text = fetch_text(url)
-                        if not text:
-                            continue
-
-                        paras_all = [p for p in text.split("\n") if len(p.split()) >= PARA_MIN_WORDS]
-                        if not paras_all:
-                            continue
-
-                        # Stage 1: BM25 + cosine (recall)
-                        bm25 = BM25Okapi([p.split() for p in paras_all])
-                        bm = bm25.get_scores(subc.split()).tolist()  # <-- convert ndarray -> list
-
-                        emb_c = embedder.encode([subc], convert_to_tensor=True)
-                        emb_p = embedder.encode(paras_all, convert_to_tensor=True)
-                        cos = util.cos_sim(emb_c, emb_p)[0].tolist()
-
-                        # Safe max handling (avoid "truth value of an array is ambiguous")
-                        if bm:
-                            mb = max(bm)
-                            maxbm = mb if mb > 0 else 1.0
-                        else:
-                            maxbm = 1.0
-
-                        hybrid = [0.6 * (s / maxbm) + 0.4 * cosv for s, cosv in zip(bm, cos)]
-                        top_idx = sorted(range(len(paras_all)), key=lambda i: hybrid[i], reverse=True)[:RECALL_TOP_PARAS]
-                        top_paras = [paras_all[i] for i in top_idx]
-
-                        # Stage 2: cross-encoder rerank (precision)
-                        pairs = [(subc, p) for p in top_paras]
-                        try:
-                            rerank_scores = reranker.predict(pairs).tolist()
-                        except Exception:
-                            rerank_scores = [hybrid[i] for i in top_idx]  # fallback to hybrid scores
-
-                        reranked = sorted(zip(top_paras, rerank_scores), key=lambda x: x[1], reverse=True)[:TOP_PARAS_PER_PAGE]
-
-                        for p, _score in reranked:
-                            try:
-                                try:
-                                    pi = paras_all.index(p)
-                                except ValueError:
-                                    pi = None
-                                if pi is not None:
-                                    window = " ".join(paras_all[max(0, pi-1): min(len(paras_all), pi+2)])
-                                else:
-                                    window = p
-                                window = " ".join(window.split()[:450])
-
-                                label, conf = nli_label(subc, window)
-                                candidates.append({"url": url, "passage": window, "label": label, "conf": conf})
-                            except Exception:
-                                traceback.print_exc()
-                        debug_claim["urls_used"].append(url)
-
-            verdict, best = decision_from_votes(candidates)
-            debug_claim["candidates"] = len(candidates)
-            if best:
-                debug_claim["top_evidence"] = {
-                    "label": best["label"], "conf": best["conf"], "url": best["url"],
-                    "snippet": best["passage"][:240]
-                }
-            else:
-                debug_claim["top_evidence"] = None
+async def nli_candidates(subc: str, windows, debug_claim):
+    """NLI votes for `windows`; all pairs go to the NLI queue at once.
+
+    The micro-batcher merges them with the other sub-claims (and requests) in flight.
+    """
+    windows = nli_allowance(windows, debug_claim)
+    with stage_timer("nli", debug_claim["timings"]):
+        labels, hit_mask = await cached_scores("nli", [(subc, w["passage"]) for w in windows])
+    count_cache(debug_claim["cache"], "nli", sum(hit_mask), len(windows))
+    NLI_PAIRS.inc(sum(hit_mask), source="cache")
+    NLI_PAIRS.inc(len(windows) - sum(hit_mask), source="model")
+
+    candidates = []
+    for w, lab in zip(windows, labels):
+        if lab is None:
+            print(f"[nli] error on url={w['url']}")
+            continue
+        candidates.append({**w, "label": lab[0], "conf": lab[1]})
+    return candidates
+
+async def check_sub_claim(subc: str, q_short: str):
+    """Full pipeline for one sub-claim; returns (result, debug_claim)."""
+    t0 = time.perf_counter()
+    debug_claim = new_debug_claim(subc)
+    candidates = []
+    decided = False
+    if evidence_index is not None:
+        # Local evidence first; the web is only searched when it does not settle the sub-claim
+        candidates = await nli_candidates(subc, await local_windows(subc, debug_claim), debug_claim)
+        decided = decision_from_votes(candidates)[0] != "unclear"
+        debug_claim["notes"].append(f"local_index:{'decided' if decided else 'weak'}")
+    if not decided and EARLY_STOP:
+        candidates += await adaptive_candidates(subc, q_short, debug_claim, candidates)
+    elif not decided:
+        windows = await gather_windows(subc, q_short, debug_claim)
+        candidates += await nli_candidates(subc, windows, debug_claim)
+    debug_claim["timings"]["total_s"] = round(time.perf_counter() - t0, 4)
+    return decide(subc, candidates, debug_claim), debug_claim
+
+def sub_claim_group() -> str:
+    """Who may share a sub-claim computation: only the current request if its budget has limits."""
+    budget = current_budget()
+    return budget.key if budget is not None and budget.limited else ""
+
+async def check_sub_claim_unbudgeted(subc: str, q_short: str):
+    """check_sub_claim outside any request budget, for computations shared between requests."""
+    token = use_budget(None)
+    try:
+        return await check_sub_claim(subc, q_short)
+    finally:
+        release_budget(token)
+
+async def cached_check_sub_claim(subc: str, q_short: str, use_cache: bool = True):
+    if not use_cache:
+        return await check_sub_claim(subc, q_short)
+    # A limited budget shapes the result (caps, degradations, cancellation), so
+    # that computation is shared only within the request; the request's deadline
+    # otherwise applies to its own waiting (within_deadline), never to the shared work.
+    group = sub_claim_group()
+    (result, debug_claim), source = await claim_cache.get_or_compute(
+        claim_key(subc),
+        (lambda: check_sub_claim(subc, q_short)) if group else (lambda: check_sub_claim_unbudgeted(subc, q_short)),
+        # An empty evidence set is usually a transient search/fetch failure, and a
+        # budget-degraded result reflects that request's limits; don't pin either
+        cacheable=lambda out: out[1]["candidates"] > 0 and not out[1]["degraded"],
+        group=group,
+    )
+    if source != "computed":
+        debug_claim["notes"].append(f"claim_cache:{source}")
+    return result, debug_claim
+
+def plan_sub_claims(spans):
+    """[(claim_index, sub_claim, q_short)] for every sub-claim of every claim_spans() entry, in order."""
+    plan = []
+    for ci, (c, span) in enumerate(spans):
+        q_short = c[:128]
+        for subc in decompose_span(c, span):
+            plan.append((ci, subc, q_short))
+    return plan
+
+def parse_claims(text: str, doc=None):
+    """(claims, plan) for an LLM output with a single spaCy parse; `doc` may be nlp(text) already."""
+    spans = claim_spans(doc if doc is not None else nlp(text or ""))
+    return [c for c, _ in spans], plan_sub_claims(spans)
+
+def parse_docs(texts):
+    """nlp.pipe over a chunk of batch documents (blocking; run it in a thread)."""
+    return list(nlp.pipe(texts, batch_size=SPACY_BATCH_SIZE, n_process=max(1, SPACY_N_PROCESS)))
+
+def shared_sub_claim(subc: str, q_short: str, use_cache: bool, shared):
+    """Task for one sub-claim, de-duplicated across the documents of a batch via `shared`.
+
+    Documents with limited budgets only share sub-claims with themselves (see sub_claim_group).
+    """
+    group = sub_claim_group()
+    key = f"{group}\0{claim_key(subc)}" if group else claim_key(subc)
+    task = shared.get(key)
+    if task is None:
+        task = asyncio.ensure_future(cached_check_sub_claim(subc, q_short, use_cache))
+        shared[key] = task
+        while len(shared) > BATCH_DEDUP_ITEMS:
+            shared.popitem(last=False)
+    else:
+        shared.move_to_end(key)
+    # shield: one document being cancelled must not cancel a sub-claim others wait on
+    return asyncio.shield(task)
+
+def make_budget(overrides=None, unlimited: bool = False):
+    """A fresh request Budget: REQUEST_* defaults, replaced by the caller's "budget" fields.
+
+    With `unlimited` (batch audits) every limit defaults to 0 and only the
+    fields the caller gives apply.
+    """
+    o = overrides or {}
+    if not isinstance(o, dict):
+        raise HTTPException(status_code=400, detail="budget must be an object")
+    try:
+        deadline_s = float(o.get("deadline_s", 0 if unlimited else REQUEST_DEADLINE_S) or 0)
+        max_urls = int(o.get("max_urls", 0 if unlimited else REQUEST_MAX_URLS) or 0)
+        max_nli_pairs = int(o.get("max_nli_pairs", 0 if unlimited else REQUEST_MAX_NLI_PAIRS) or 0)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="budget fields must be numbers")
+    if min(deadline_s, max_urls, max_nli_pairs) < 0:
+        raise HTTPException(status_code=400, detail="budget fields must be >= 0")
+    if REQUEST_DEADLINE_MAX_S > 0 and (deadline_s or not unlimited):
+        deadline_s = min(deadline_s or REQUEST_DEADLINE_MAX_S, REQUEST_DEADLINE_MAX_S)
+    return Budget(deadline_s, max_urls, max_nli_pairs, BUDGET_DEGRADE_AT)
+
+def deadline_outcome(subc: str):
+    """(result, debug_claim) for a sub-claim cancelled at the request deadline."""
+    debug_claim = new_debug_claim(subc)
+    debug_claim["notes"].append("deadline")
+    degrade(debug_claim, "deadline")
+    VERDICTS.inc(verdict="unclear")
+    return {"text": subc, "verdict": "unclear", "confidence": 0.0, "citation": None}, debug_claim
+
+async def within_deadline(budget, tasks, subcs):
+    """Outcomes of sub-claim `tasks` in order; those still running at the deadline are cancelled."""
+    if not tasks:
+        return []
+    timeout = budget.remaining_s()
+    done, pending = await asyncio.wait(tasks, timeout=None if timeout == float("inf") else timeout)
+    for task in pending:
+        task.cancel()
+    return [task.result() if task in done else deadline_outcome(subc) for task, subc in zip(tasks, subcs)]
+
+def stage_breakdown(debug_claims, timings=None):
+    """Per-request stage totals: summed over sub-claims (which run concurrently)."""
+    out = dict(timings or {})
+    for d in debug_claims:
+        for k, v in d.get("timings", {}).items():
+            if k != "total_s":
+                out[k] = round(out.get(k, 0.0) + v, 4)
+    return out
+
+async def check_document(llm_output: str, want_debug: bool = False, use_cache: bool = True, shared=None,
+                         endpoint: str = "check", doc=None, budget=None):
+    """The /check response for one LLM output; `shared` de-duplicates sub-claims across calls.
+
+    `doc` is the already parsed spaCy Doc when the caller parsed a batch with nlp.pipe.
+    `budget` bounds the work (make_budget() defaults when None); the degradations it
+    forced are listed in the response.
+    """
+    t0 = time.time()
+    REQUESTS.inc(endpoint=endpoint)
+    budget = budget or make_budget()
+    token = use_budget(budget)
+    try:
+        req_timings = {}
+        with stage_timer("extract_claims", req_timings):
+            claims, plan = parse_claims(llm_output, doc)
 
-            print(f"[check] sub-claim='{subc[:80]}' cand={len(candidates)} verdict={verdict} conf={(best or {}).get('conf')}")
-            if want_debug:
-                debug_out.append(debug_claim)
+        print(f"[check] text_len={len(llm_output)} claims={claims}")
 
-            results.append({
-                "text": subc,
-                "verdict": verdict,
-                "confidence": (best or {}).get("conf", 0.0),
-                "citation": ({"url": best["url"], "snippet": best["passage"][:350]} if best else None)
-            })
+        # Fan out every sub-claim of every claim; results keep claim order
+        if shared is None:
+            tasks = [asyncio.ensure_future(cached_check_sub_claim(subc, q_short, use_cache)) for _, subc, q_short in plan]
+        else:
+            tasks = [asyncio.ensure_future(shared_sub_claim(subc, q_short, use_cache, shared)) for _, subc, q_short in plan]
+        outcomes = await within_deadline(budget, tasks, [subc for _, subc, _ in plan])
+    finally:
+        release_budget(token)
 
     resp = {
         "checked_on": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
-        "claims": results,
+        "claims": [r for r, _ in outcomes],
+        "degradations": merge_degradations(d["degraded"] for _, d in outcomes),
         "latency_s": round(time.time() - t0, 2)
     }
+    REQUEST_SECONDS.observe(time.time() - t0, endpoint=endpoint)
     if want_debug:
-        resp["debug"] = debug_out
+        resp["debug"] = [d for _, d in outcomes]
+        resp["stages"] = stage_breakdown(resp["debug"], req_timings)
+        resp["budget"] = budget.snapshot()
     return resp
+
+def record_id(rec: dict, lineno: int):
+    for k in ("id", "request_id"):
+        if rec.get(k) is not None:
+            return rec[k]
+    return lineno
+
+async def check_records(records, want_debug: bool = False, use_cache: bool = True,
+                        concurrency: int = BATCH_DOC_CONCURRENCY, text_key: str = "llm_output",
+                        budget_overrides=None):
+    """Check an iterable of (id, record) pairs; yields one output dict per record as it finishes.
+
+    Up to `concurrency` documents are in flight so their searches and model work
+    share batches; identical sub-claims across documents are computed once.
+    Documents are parsed SPACY_PIPE_CHUNK at a time with nlp.pipe. Each document
+    gets its own budget, started when it is dispatched; it is unlimited except
+    for the fields given in `budget_overrides`.
+    """
+    shared = OrderedDict()
+
+    async def one(rid, rec, doc):
+        try:
+            out = await check_document(rec.get(text_key) or "", want_debug, use_cache, shared,
+                                       endpoint="batch", doc=doc,
+                                       budget=make_budget(budget_overrides, unlimited=True))
+            return {"id": rid, **out}
+        except Exception as e:
+            traceback.print_exc()
+            return {"id": rid, "error": str(e)}
+
+    def chunked():
+        chunk = []
+        for item in records:
+            chunk.append(item)
+            if len(chunk) >= SPACY_PIPE_CHUNK:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    pending = set()
+    try:
+        for chunk in chunked():
+            with stage_timer("extract_claims"):
+                docs = await asyncio.to_thread(parse_docs, [rec.get(text_key) or "" for _, rec in chunk])
+            for (rid, rec), doc in zip(chunk, docs):
+                pending.add(asyncio.ensure_future(one(rid, rec, doc)))
+                if len(pending) >= concurrency:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for d in done:
+                        yield d.result()
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for d in done:
+                yield d.result()
+    finally:
+        for task in list(pending) + list(shared.values()):
+            if not task.done():
+                task.cancel()
+
+def parse_batch_body(raw: bytes):
+    """Records from a JSON body ({"records": [...]} or [...]) or an NDJSON body."""
+    text = raw.decode("utf-8")
+    try:
+        body = json.loads(text)
+    except ValueError:
+        body = None
+    if isinstance(body, dict):
+        body = body.get("records")
+    if isinstance(body, list):
+        return [r for r in body if isinstance(r, dict)]
+    records = []
+    for ln in text.splitlines():
+        ln = ln.strip()
+        if not ln:
+            continue
+        try:
+            rec = json.loads(ln)
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"invalid JSON line: {ln[:80]}")
+        if isinstance(rec, dict):
+            records.append(rec)
+    return records
+
+# ===== Main API =====
+@app.post("/check")
+async def check(payload: dict):
+    require_ready()
+    llm_output = (payload or {}).get("llm_output", "") or ""
+    want_debug = bool((payload or {}).get("debug", False))
+    use_cache = not bool((payload or {}).get("no_cache", False))
+    budget = make_budget((payload or {}).get("budget"))
+    return await check_document(llm_output, want_debug, use_cache, budget=budget)
+
+@app.post("/check/stream")
+async def check_stream(payload: dict):
+    """NDJSON stream: a "claims" event, one "verdict" event per sub-claim as it
+    is decided (in completion order), then a "summary". Disconnecting cancels
+    the sub-claims still running; so does the request deadline, after which the
+    remaining sub-claims are reported as unclear."""
+    require_ready()
+    t0 = time.time()
+    llm_output = (payload or {}).get("llm_output", "") or ""
+    want_debug = bool((payload or {}).get("debug", False))
+    use_cache = not bool((payload or {}).get("no_cache", False))
+    budget = make_budget((payload or {}).get("budget"))
+    REQUESTS.inc(endpoint="stream")
+    with stage_timer("extract_claims"):
+        claims, plan = parse_claims(llm_output)
+
+    print(f"[check/stream] text_len={len(llm_output)} claims={claims}")
+
+    def line(obj):
+        return json.dumps(obj, ensure_ascii=False) + "\n"
+
+    async def indexed(i, coro):
+        use_budget(budget)  # this task's context; the sub-claim's own tasks inherit it
+        return i, await coro
+
+    async def events():
+        yield line({
+            "event": "claims",
+            "checked_on": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "claims": claims,
+            "sub_claims": [{"index": i, "claim_index": ci, "text": subc} for i, (ci, subc, _) in enumerate(plan)],
+        })
+        tasks = [asyncio.ensure_future(indexed(i, cached_check_sub_claim(subc, q_short, use_cache)))
+                 for i, (_, subc, q_short) in enumerate(plan)]
+        counts = {"supported": 0, "contradicted": 0, "unclear": 0}
+        degraded = []
+
+        def verdict_event(i, result, debug_claim):
+            counts[result["verdict"]] = counts.get(result["verdict"], 0) + 1
+            degraded.append(debug_claim["degraded"])
+            ev = {"event": "verdict", "index": i, "claim": result,
+                  "timings": debug_claim.get("timings"),
+                  "degradations": debug_claim["degraded"],
+                  "elapsed_s": round(time.time() - t0, 2)}
+            if want_debug:
+                ev["debug"] = debug_claim
+            return line(ev)
+
+        try:
+            pending = set(tasks)
+            while pending:
+                timeout = budget.remaining_s()
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED,
+                                                   timeout=None if timeout == float("inf") else timeout)
+                if not done:
+                    break  # deadline
+                for fut in done:
+                    i, (result, debug_claim) = fut.result()
+                    yield verdict_event(i, result, debug_claim)
+            for fut in sorted(pending, key=tasks.index):
+                fut.cancel()
+                i = tasks.index(fut)
+                yield verdict_event(i, *deadline_outcome(plan[i][1]))
+            REQUEST_SECONDS.observe(time.time() - t0, endpoint="stream")
+            summary = {"event": "summary", "count": len(plan), "verdicts": counts,
+                       "degradations": merge_degradations(degraded),
+                       "latency_s": round(time.time() - t0, 2)}
+            if want_debug:
+                summary["budget"] = budget.snapshot()
+            yield line(summary)
+        finally:
+            # Client went away (or we finished): stop whatever is still running
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+@app.post("/check/batch")
+async def check_batch(request: Request, debug: bool = False, no_cache: bool = False,
+                      text_key: str = "llm_output", deadline_s: float | None = None,
+                      max_urls: int | None = None, max_nli_pairs: int | None = None):
+    """Check many LLM outputs at once.
+
+    Body is NDJSON (one record per line) or JSON ({"records": [...]}); each record
+    carries `text_key` and optionally an "id". Results stream back as NDJSON in
+    completion order, each tagged with the record id. Documents run without a
+    budget unless `deadline_s`, `max_urls` or `max_nli_pairs` are given.
+    """
+    require_ready()
+    overrides = {k: v for k, v in (("deadline_s", deadline_s), ("max_urls", max_urls),
+                                   ("max_nli_pairs", max_nli_pairs)) if v is not None}
+    make_budget(overrides, unlimited=True)  # reject bad values before streaming starts
+    records = parse_batch_body(await request.body())
+    print(f"[check/batch] records={len(records)}")
+
+    async def lines():
+        numbered = ((record_id(rec, i), rec) for i, rec in enumerate(records))
+        async for out in check_records(numbered, debug, not no_cache, text_key=text_key,
+                                       budget_overrides=overrides):
+            yield json.dumps(out, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
@@ -0,0 +1,130 @@
+"""Cross-request micro-batching for the module-level models in app.py.
+
+Every in-flight request submits work items (texts to embed, pairs to rerank,
+pairs to label with NLI) to one shared `MicroBatcher`. A dedicated worker
+thread groups queued items per model and runs them as a single batch once
+`max_batch` items are waiting or the oldest item has waited `max_wait_s`.
+Results come back to the caller's event loop as awaitable futures.
+"""
+import asyncio
+import queue
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Sequence
+
+
+def _resolve(fut: asyncio.Future, result: Any = None, exc: BaseException | None = None) -> None:
+    # The awaiting request may have been cancelled while the batch ran
+    if fut.done():
+        return
+    if exc is not None:
+        fut.set_exception(exc)
+    else:
+        fut.set_result(result)
+
+
+def _post(loop: asyncio.AbstractEventLoop, fut: asyncio.Future, result: Any = None,
+          exc: BaseException | None = None) -> None:
+    # The submitting loop may already be closed (e.g. a finished asyncio.run in a
+    # script); nobody is left to wake, and the worker thread must keep going
+    try:
+        loop.call_soon_threadsafe(_resolve, fut, result, exc)
+    except RuntimeError:
+        pass
+
+
+class MicroBatcher:
+    def __init__(self, max_batch: int = 32, max_wait_s: float = 0.010,
+                 on_flush: Callable[[str, int, float], None] | None = None):
+        self.max_batch = max_batch
+        self.max_wait_s = max_wait_s
+        self.on_flush = on_flush  # (model name, batch size, seconds) hook for metrics
+        self._fns: Dict[str, Callable[[List[Any]], Sequence[Any]]] = {}
+        self._q: "queue.Queue" = queue.Queue()
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def register(self, name: str, fn: Callable[[List[Any]], Sequence[Any]]) -> None:
+        """Register a batch function: list of items in, one result per item out."""
+        self._fns[name] = fn
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    async def submit(self, name: str, items: Sequence[Any]) -> List[Any]:
+        """Queue `items` for model `name` and wait for their results (input order)."""
+        if name not in self._fns:
+            raise KeyError(f"no batch function registered for {name!r}")
+        if not items:
+            return []
+        self.start()
+        loop = asyncio.get_running_loop()
+        futs = [loop.create_future() for _ in items]
+        now = time.monotonic()
+        for item, fut in zip(items, futs):
+            self._q.put((name, item, fut, loop, now))
+        return list(await asyncio.gather(*futs))
+
+    # ----- worker thread -----
+    def _run(self) -> None:
+        pending: Dict[str, list] = defaultdict(list)
+        while not self._stop.is_set():
+            timeout = self._next_timeout(pending)
+            try:
+                entry = self._q.get(timeout=timeout)
+                pending[entry[0]].append(entry)
+                # Drain whatever else is already queued without blocking
+                while True:
+                    entry = self._q.get_nowait()
+                    pending[entry[0]].append(entry)
+            except queue.Empty:
+                pass
+
+            now = time.monotonic()
+            for name in list(pending):
+                entries = pending[name]
+                while len(entries) >= self.max_batch:
+                    batch, entries = entries[:self.max_batch], entries[self.max_batch:]
+                    self._flush(name, batch)
+                if entries and now - entries[0][4] >= self.max_wait_s:
+                    self._flush(name, entries)
+                    entries = []
+                if entries:
+                    pending[name] = entries
+                else:
+                    del pending[name]
+
+    def _next_timeout(self, pending: Dict[str, list]) -> float:
+        if not pending:
+            return 0.5  # idle; wake up periodically to notice stop()
+        oldest = min(entries[0][4] for entries in pending.values())
+        return max(0.0, oldest + self.max_wait_s - time.monotonic())
+
+    def _flush(self, name: str, batch: list) -> None:
+        t = time.perf_counter()
+        try:
+            results = self._fns[name]([e[1] for e in batch])
+            if len(results) != len(batch):
+                raise RuntimeError(f"{name}: got {len(results)} results for {len(batch)} items")
+            if self.on_flush is not None:
+                self.on_flush(name, len(batch), time.perf_counter() - t)
+        except Exception as e:
+            print(f"[batcher] {name} batch of {len(batch)} failed: {e}")
+            for _, _, fut, loop, _ in batch:
+                _post(loop, fut, None, e)
+            return
+        for (_, _, fut, loop, _), res in zip(batch, results):
+            _post(loop, fut, res)
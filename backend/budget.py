@@ -0,0 +1,118 @@
+"""Per-request deadline and work budget for /check (see `check_document` in app.py).
+
+A `Budget` is created per checked document and reached from every stage
+through a context variable, so sub-claim tasks spawned for the request see
+the same budget without threading it through each call. Stages ask it
+before doing expensive work:
+
+- `take_urls` / `take_nli` grant at most what is left of the URL and NLI-pair
+  allowances;
+- `allows(step)` turns false once the budget's pressure (the largest used
+  fraction of wall time, URLs or NLI pairs) passes that step's threshold.
+  Steps are ordered cheapest-to-give-up first: the Wikipedia fallback pass,
+  then page downloads (search snippets only), then the NLI windows per page.
+
+Once the deadline passes, sub-claims still running are cancelled and
+reported as unclear. A sub-claim computed under a limited budget is only
+shared within its own request (`Budget.key`); without limits it is computed
+with no budget at all and shared with every request asking for it.
+"""
+import contextvars
+import itertools
+import math
+import time
+from typing import Dict, Iterable, Optional, Sequence
+
+# Degradation steps, in the order they kick in
+DEGRADATIONS = ("no_wiki_fallback", "snippets_only", "fewer_paras_per_page")
+
+_current: "contextvars.ContextVar[Optional[Budget]]" = contextvars.ContextVar("request_budget", default=None)
+_ids = itertools.count(1)
+
+
+class Budget:
+    def __init__(self, deadline_s: float = 0.0, max_urls: int = 0, max_nli_pairs: int = 0,
+                 degrade_at: Sequence[float] = (0.5, 0.7, 0.85)):
+        # 0 = unlimited for each limit
+        self.deadline_s = deadline_s
+        self.max_urls = max_urls
+        self.max_nli_pairs = max_nli_pairs
+        self.degrade_at = dict(zip(DEGRADATIONS, degrade_at))
+        self.key = f"budget-{next(_ids)}"  # groups work that must not be shared with other requests
+        self.started = time.monotonic()
+        self.urls = 0
+        self.nli_pairs = 0
+
+    @property
+    def limited(self) -> bool:
+        return self.deadline_s > 0 or self.max_urls > 0 or self.max_nli_pairs > 0
+
+    def elapsed_s(self) -> float:
+        return time.monotonic() - self.started
+
+    def remaining_s(self) -> float:
+        return max(0.0, self.deadline_s - self.elapsed_s()) if self.deadline_s > 0 else math.inf
+
+    def expired(self) -> bool:
+        return self.remaining_s() <= 0
+
+    def pressure(self) -> float:
+        used = [0.0]
+        if self.deadline_s > 0:
+            used.append(self.elapsed_s() / self.deadline_s)
+        if self.max_urls > 0:
+            used.append(self.urls / self.max_urls)
+        if self.max_nli_pairs > 0:
+            used.append(self.nli_pairs / self.max_nli_pairs)
+        return max(used)
+
+    def allows(self, step: str) -> bool:
+        """False once `step` (one of DEGRADATIONS) should be applied."""
+        return self.pressure() < self.degrade_at.get(step, math.inf)
+
+    def _take(self, used: int, limit: int, n: int) -> int:
+        return n if limit <= 0 else max(0, min(n, limit - used))
+
+    def take_urls(self, n: int) -> int:
+        granted = self._take(self.urls, self.max_urls, n)
+        self.urls += granted
+        return granted
+
+    def refund_urls(self, n: int) -> None:
+        """Return `n` granted URLs whose downloads were cancelled before they finished."""
+        self.urls = max(0, self.urls - n)
+
+    def take_nli(self, n: int) -> int:
+        granted = self._take(self.nli_pairs, self.max_nli_pairs, n)
+        self.nli_pairs += granted
+        return granted
+
+    def snapshot(self) -> Dict[str, float]:
+        return {"deadline_s": self.deadline_s, "elapsed_s": round(self.elapsed_s(), 3),
+                "max_urls": self.max_urls, "urls": self.urls,
+                "max_nli_pairs": self.max_nli_pairs, "nli_pairs": self.nli_pairs}
+
+
+def parse_degrade_at(spec: str) -> Sequence[float]:
+    """Thresholds for DEGRADATIONS from "0.5,0.7,0.85"; missing entries never trigger."""
+    values = [float(x) for x in (spec or "").split(",") if x.strip()]
+    return values + [math.inf] * (len(DEGRADATIONS) - len(values))
+
+
+def current_budget() -> Optional[Budget]:
+    return _current.get()
+
+
+def use_budget(budget: Optional[Budget]) -> contextvars.Token:
+    """Make `budget` the current one for this task and the tasks it creates from now on (None: no limits)."""
+    return _current.set(budget)
+
+
+def release_budget(token: contextvars.Token) -> None:
+    _current.reset(token)
+
+
+def merge_degradations(lists: Iterable[Iterable[str]]) -> list:
+    """Union of applied degradations, in DEGRADATIONS order (others, e.g. "deadline", after)."""
+    seen = {d for names in lists for d in names}
+    return [d for d in DEGRADATIONS if d in seen] + sorted(seen - set(DEGRADATIONS))
@@ -0,0 +1,104 @@
+"""Claim-level result memoization with single-flight coalescing.
+
+`check()` keys finished sub-claim results by normalized sub-claim text. While
+a sub-claim is being computed, every other request asking for the same key
+awaits that one computation instead of running the pipeline again.
+"""
+import asyncio
+import copy
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+
+def claim_key(text: str) -> str:
+    return " ".join((text or "").lower().split())
+
+
+class ClaimCache:
+    def __init__(self, ttl_s: float = 3600.0, max_items: int = 10_000):
+        self.ttl_s = ttl_s
+        self.max_items = max_items
+        self._items: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._waiters: Dict[str, int] = {}
+        self.stats = {"hits": 0, "coalesced": 0, "computed": 0}
+
+    def get(self, key: str) -> Optional[Any]:
+        item = self._items.get(key)
+        if item is None:
+            return None
+        stored_at, value = item
+        if time.time() - stored_at > self.ttl_s:
+            del self._items[key]
+            return None
+        self._items.move_to_end(key)
+        return value
+
+    def put(self, key: str, value: Any) -> None:
+        if self.ttl_s <= 0:
+            return
+        self._items[key] = (time.time(), value)
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_items:
+            self._items.popitem(last=False)
+
+    async def get_or_compute(
+        self,
+        key: str,
+        compute: Callable[[], Awaitable[Any]],
+        cacheable: Callable[[Any], bool] = lambda _v: True,
+        group: str = "",
+    ) -> Tuple[Any, str]:
+        """Return (value, source) where source is "hit", "coalesced" or "computed".
+
+        Only callers passing the same `group` share an in-flight computation;
+        cached values are served to every group. Values are deep-copied on the
+        way out so callers can annotate them freely.
+        """
+        value = self.get(key)
+        if value is not None:
+            self.stats["hits"] += 1
+            return copy.deepcopy(value), "hit"
+
+        flight = f"{group}\0{key}" if group else key
+        fut = self._inflight.get(flight)
+        if fut is not None:
+            self.stats["coalesced"] += 1
+            return copy.deepcopy(await self._wait(flight, fut)), "coalesced"
+
+        fut = asyncio.ensure_future(compute())
+        self._inflight[flight] = fut
+
+        def _done(f: asyncio.Future) -> None:
+            # Runs even if the requester that started it went away
+            self._inflight.pop(flight, None)
+            self._waiters.pop(flight, None)
+            if f.cancelled() or f.exception() is not None:
+                return
+            self.stats["computed"] += 1
+            if cacheable(f.result()):
+                self.put(key, f.result())
+
+        fut.add_done_callback(_done)
+        return copy.deepcopy(await self._wait(flight, fut)), "computed"
+
+    async def _wait(self, key: str, fut: asyncio.Future) -> Any:
+        # shield: one waiter going away must not cancel the shared computation,
+        # but once the last waiter is gone there is nobody left to compute for.
+        self._waiters[key] = self._waiters.get(key, 0) + 1
+        try:
+            return await asyncio.shield(fut)
+        except asyncio.CancelledError:
+            left = self._waiters.get(key, 1) - 1
+            self._waiters[key] = left
+            if left <= 0 and not fut.done():
+                fut.cancel()
+            raise
+        finally:
+            if fut.done():
+                self._waiters.pop(key, None)
+
+    def snapshot(self) -> dict:
+        return {**self.stats, "items": len(self._items), "inflight": len(self._inflight),
+                "ttl_s": self.ttl_s}
@@ -0,0 +1,98 @@
+"""Content-addressed cache of paragraph embeddings.
+
+Vectors are stored as float16 rows of a memory-mapped array; each row's key
+is a 16-byte BLAKE2 digest of the whitespace-normalized text. An LRU index
+over the rows decides which slot to reuse once the cache is full. The key and
+last-use arrays are memory-mapped next to the vectors, so the cache (and its
+LRU order) survives restarts without a separate index file.
+"""
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+
+def text_key(text: str) -> bytes:
+    return hashlib.blake2b(" ".join(text.split()).encode("utf-8"), digest_size=16).digest()
+
+
+class EmbeddingCache:
+    def __init__(self, dim: int, capacity: int = 200_000, path: Optional[str] = None):
+        self.dim = dim
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            fresh = not all(os.path.exists(f"{path}.{ext}") for ext in ("vec", "keys", "used"))
+            if not fresh and os.path.getsize(f"{path}.vec") != capacity * dim * 2:
+                fresh = True  # dim or capacity changed: start over
+            mode = "w+" if fresh else "r+"
+            self._vecs = np.memmap(f"{path}.vec", dtype=np.float16, mode=mode, shape=(capacity, dim))
+            self._keys = np.memmap(f"{path}.keys", dtype=np.uint8, mode=mode, shape=(capacity, 16))
+            self._used = np.memmap(f"{path}.used", dtype=np.float64, mode=mode, shape=(capacity,))
+        else:
+            self._vecs = np.zeros((capacity, dim), dtype=np.float16)
+            self._keys = np.zeros((capacity, 16), dtype=np.uint8)
+            self._used = np.zeros((capacity,), dtype=np.float64)
+
+        # Rebuild the LRU index (oldest first) from the persisted slots
+        self._index: "OrderedDict[bytes, int]" = OrderedDict()
+        filled = np.nonzero(self._used > 0)[0]
+        for slot in filled[np.argsort(self._used[filled])]:
+            self._index[self._keys[slot].tobytes()] = int(slot)
+        self._free = [s for s in range(capacity - 1, -1, -1) if self._used[s] <= 0]
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def get_many(self, texts: Sequence[str]) -> List[Optional[np.ndarray]]:
+        """Cached float32 vectors for `texts`, None where the text has not been seen."""
+        out: List[Optional[np.ndarray]] = []
+        now = time.time()
+        with self._lock:
+            for t in texts:
+                key = text_key(t)
+                slot = self._index.get(key)
+                if slot is None:
+                    self.misses += 1
+                    out.append(None)
+                    continue
+                self._index.move_to_end(key)
+                self._used[slot] = now
+                self.hits += 1
+                out.append(self._vecs[slot].astype(np.float32))
+        return out
+
+    def put_many(self, texts: Sequence[str], vecs: Sequence[np.ndarray]) -> None:
+        now = time.time()
+        with self._lock:
+            for t, v in zip(texts, vecs):
+                key = text_key(t)
+                slot = self._index.get(key)
+                if slot is None:
+                    if self._free:
+                        slot = self._free.pop()
+                    else:
+                        _, slot = self._index.popitem(last=False)  # evict least recently used
+                    self._keys[slot] = np.frombuffer(key, dtype=np.uint8)
+                self._vecs[slot] = np.asarray(v, dtype=np.float16)
+                self._used[slot] = now
+                self._index[key] = slot
+                self._index.move_to_end(key)
+
+    def snapshot(self) -> dict:
+        lookups = self.hits + self.misses
+        return {"items": len(self._index), "capacity": self.capacity, "hits": self.hits,
+                "misses": self.misses, "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0}
+
+    def flush(self) -> None:
+        for arr in (self._vecs, self._keys, self._used):
+            if isinstance(arr, np.memmap):
+                arr.flush()
@@ -0,0 +1,366 @@
+"""Local evidence store: paragraphs + MiniLM vectors + BM25 postings on disk.
+
+`build_index` (driven by scripts/build_evidence_index.py) streams a paragraph
+corpus such as a Wikipedia or HoVer-style JSONL dump into a directory of flat
+files; `EvidenceIndex` memory-maps them for serving. Retrieval is hybrid:
+BM25 over an inverted index plus nearest neighbours on the embeddings
+(FAISS or hnswlib if installed, otherwise a chunked NumPy scan), merged with
+the same 0.6/0.4 weighting `score_pages` uses for web pages.
+
+Layout of an index directory:
+    meta.json                      counts, dims, embedder id, ANN kind, BM25 params
+    texts.bin / texts.off          UTF-8 paragraphs, int64 offsets (n + 1)
+    urls.bin / urls.off            source URL per paragraph
+    groups.i32                     article id per paragraph (for ±1 windows)
+    vectors.f16                    [n, dim] L2-normalized embeddings
+    vocab.json                     term -> term id
+    idf.f32 / indptr.i64           per-term IDF, postings offsets (n_terms + 1)
+    post_doc.i32 / post_w.f32      postings: paragraph id, precomputed BM25 weight
+    ann.faiss | ann.hnsw           optional ANN graph over vectors.f16
+"""
+import json
+import os
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+import numpy as np
+
+from recall import hybrid_scores, tokenize
+
+ANN_KINDS = ("auto", "faiss", "hnswlib", "none")
+
+
+def _wiki_url(title: str) -> str:
+    return "https://en.wikipedia.org/wiki/" + title.strip().replace(" ", "_")
+
+
+class _StringWriter:
+    def __init__(self, out_dir: str, name: str):
+        self._blob = open(os.path.join(out_dir, f"{name}.bin"), "wb")
+        self._offsets = open(os.path.join(out_dir, f"{name}.off"), "wb")
+        self._end = 0
+        self._offsets.write(np.int64(0).tobytes())
+
+    def add(self, text: str) -> None:
+        data = text.encode("utf-8")
+        self._blob.write(data)
+        self._end += len(data)
+        self._offsets.write(np.int64(self._end).tobytes())
+
+    def close(self) -> None:
+        self._blob.close()
+        self._offsets.close()
+
+
+def _out_array(path: str, dtype, n: int) -> np.ndarray:
+    """Writable memmap of `n` items at `path` (np.memmap refuses empty files)."""
+    if not n:
+        open(path, "wb").close()
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="w+", shape=(n,))
+
+
+class _StringStore:
+    def __init__(self, index_dir: str, name: str):
+        self._offsets = np.memmap(os.path.join(index_dir, f"{name}.off"), dtype=np.int64, mode="r")
+        path = os.path.join(index_dir, f"{name}.bin")
+        # np.memmap refuses empty files
+        self._blob = np.memmap(path, dtype=np.uint8, mode="r") if os.path.getsize(path) else b""
+
+    def __getitem__(self, i: int) -> str:
+        return bytes(self._blob[self._offsets[i]:self._offsets[i + 1]]).decode("utf-8")
+
+
+def _pick_ann(kind: str) -> str:
+    if kind not in ANN_KINDS:
+        raise ValueError(f"unknown ANN kind {kind!r}; expected one of {ANN_KINDS}")
+    if kind != "auto":
+        return kind
+    for candidate in ("faiss", "hnswlib"):
+        try:
+            __import__(candidate)
+            return candidate
+        except ImportError:
+            continue
+    return "none"
+
+
+def _build_ann(kind: str, vectors: np.ndarray, out_dir: str, chunk: int = 65536) -> None:
+    n, dim = vectors.shape
+    if kind == "faiss":
+        import faiss
+
+        index = faiss.IndexHNSWFlat(dim, 32, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = 200
+        for i in range(0, n, chunk):
+            index.add(np.ascontiguousarray(vectors[i:i + chunk], dtype=np.float32))
+        faiss.write_index(index, os.path.join(out_dir, "ann.faiss"))
+    elif kind == "hnswlib":
+        import hnswlib
+
+        index = hnswlib.Index(space="ip", dim=dim)
+        index.init_index(max_elements=max(1, n), ef_construction=200, M=32)
+        for i in range(0, n, chunk):
+            index.add_items(np.asarray(vectors[i:i + chunk], dtype=np.float32), np.arange(i, min(n, i + chunk)))
+        index.save_index(os.path.join(out_dir, "ann.hnsw"))
+
+
+def build_index(
+    passages: Iterable[Dict[str, str]],
+    out_dir: str,
+    encode: Callable[[List[str]], np.ndarray],
+    embedder_id: str,
+    batch_size: int = 256,
+    ann: str = "auto",
+    k1: float = 1.5,
+    b: float = 0.75,
+    epsilon: float = 0.25,
+    sort_chunk: int = 1 << 22,
+) -> dict:
+    """Write an index for `passages` ({"text", "title"?, "url"?}) to `out_dir`; returns its meta.
+
+    Streams: texts, vectors, article ids and the (term, paragraph, tf)
+    postings of each batch go to disk as they are produced. The postings are
+    then grouped by term with a counting sort over memory-mapped spill files,
+    `sort_chunk` postings at a time. Memory holds one batch, the vocabulary,
+    the article-id map and per-term arrays.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    ann = _pick_ann(ann)
+    texts_w, urls_w = _StringWriter(out_dir, "texts"), _StringWriter(out_dir, "urls")
+    vec_f = open(os.path.join(out_dir, "vectors.f16"), "wb")
+    groups_f = open(os.path.join(out_dir, "groups.i32"), "wb")
+    spill = {name: os.path.join(out_dir, f".{name}.tmp") for name in ("term", "doc", "tf", "len")}
+    spill_f = {name: open(path, "wb") for name, path in spill.items()}
+    vocab: Dict[str, int] = {}
+    group_of: Dict[str, int] = {}
+    dim = 0
+    n = 0
+    n_post = 0
+    batches = 0
+
+    def flush(batch: List[Dict[str, str]]) -> None:
+        nonlocal dim, n, n_post, batches
+        vecs = np.asarray(encode([p["text"] for p in batch]), dtype=np.float32)
+        vecs /= np.clip(np.linalg.norm(vecs, axis=1, keepdims=True), 1e-12, None)
+        dim = vecs.shape[1]
+        vec_f.write(vecs.astype(np.float16).tobytes())
+        terms, docs, lens, groups = [], [], [], []
+        for j, p in enumerate(batch):
+            toks = tokenize(p["text"])
+            terms.extend(vocab.setdefault(t, len(vocab)) for t in toks)
+            docs.extend([n + j] * len(toks))
+            lens.append(len(toks))
+            texts_w.add(p["text"])
+            urls_w.add(p["url"])
+            groups.append(group_of.setdefault(p["group"], len(group_of)))
+        groups_f.write(np.asarray(groups, dtype=np.int32).tobytes())
+        spill_f["len"].write(np.asarray(lens, dtype=np.int32).tobytes())
+        pairs = np.stack([np.asarray(terms, dtype=np.int64), np.asarray(docs, dtype=np.int64)], axis=1)
+        uniq, tf = np.unique(pairs, axis=0, return_counts=True) if len(pairs) else (pairs, np.zeros(0, np.int64))
+        spill_f["term"].write(uniq[:, 0].astype(np.int32).tobytes())
+        spill_f["doc"].write(uniq[:, 1].astype(np.int32).tobytes())
+        spill_f["tf"].write(tf.astype(np.int32).tobytes())
+        n += len(batch)
+        n_post += len(uniq)
+        batches += 1
+        if batches % 40 == 0:
+            print(f"[index] {n} paragraphs")
+
+    batch: List[Dict[str, str]] = []
+    for p in passages:
+        text = " ".join((p.get("text") or "").split())
+        if not text:
+            continue
+        title = (p.get("title") or "").strip()
+        url = (p.get("url") or "").strip() or (_wiki_url(title) if title else "")
+        batch.append({"text": text, "url": url, "group": url or title or str(n + len(batch))})
+        if len(batch) >= batch_size:
+            flush(batch)
+            batch = []
+    if batch:
+        flush(batch)
+    for f in (vec_f, groups_f, *spill_f.values()):
+        f.close()
+    texts_w.close()
+    urls_w.close()
+
+    # Inverted index, grouped by term; BM25 term weights are precomputed per posting.
+    # Spilled postings are in paragraph order, so a stable counting sort by term
+    # keeps each term's postings sorted by paragraph.
+    def spilled(name: str) -> np.ndarray:
+        return np.memmap(spill[name], dtype=np.int32, mode="r") if os.path.getsize(spill[name]) else np.zeros(0, np.int32)
+
+    term_all, doc_all, tf_all, lengths = (spilled(name) for name in ("term", "doc", "tf", "len"))
+    n_terms = max(1, len(vocab))
+    df = np.zeros(n_terms, dtype=np.int64)
+    for lo in range(0, n_post, sort_chunk):
+        df += np.bincount(term_all[lo:lo + sort_chunk], minlength=n_terms)
+    idf = np.log(n - df + 0.5) - np.log(df + 0.5)
+    idf = np.where(idf < 0, epsilon * idf.mean(), idf)
+    avgdl = (float(lengths.mean()) if n else 0.0) or 1.0
+    indptr = np.concatenate(([0], np.cumsum(df))).astype(np.int64)
+
+    post_doc = _out_array(os.path.join(out_dir, "post_doc.i32"), np.int32, n_post)
+    post_w = _out_array(os.path.join(out_dir, "post_w.f32"), np.float32, n_post)
+    cursor = indptr[:-1].copy()
+    for lo in range(0, n_post, sort_chunk):
+        order = np.argsort(term_all[lo:lo + sort_chunk], kind="stable")
+        term = np.asarray(term_all[lo:lo + sort_chunk])[order]
+        doc = np.asarray(doc_all[lo:lo + sort_chunk])[order]
+        tf = np.asarray(tf_all[lo:lo + sort_chunk])[order].astype(np.float64)
+        uniq, first, counts = np.unique(term, return_index=True, return_counts=True)
+        pos = cursor[term] + np.arange(len(term)) - np.repeat(first, counts)
+        post_doc[pos] = doc
+        post_w[pos] = idf[term] * tf * (k1 + 1) / (tf + k1 * (1 - b + b * lengths[doc] / avgdl))
+        cursor[uniq] += counts
+    for arr in (post_doc, post_w):
+        if isinstance(arr, np.memmap):
+            arr.flush()
+    del post_doc, post_w, term_all, doc_all, tf_all, lengths
+    for path in spill.values():
+        os.remove(path)
+
+    indptr.tofile(os.path.join(out_dir, "indptr.i64"))
+    idf.astype(np.float32).tofile(os.path.join(out_dir, "idf.f32"))
+    with open(os.path.join(out_dir, "vocab.json"), "w", encoding="utf-8") as f:
+        json.dump(vocab, f, ensure_ascii=False)
+
+    if n and ann != "none":
+        vectors = np.memmap(os.path.join(out_dir, "vectors.f16"), dtype=np.float16, mode="r", shape=(n, dim))
+        print(f"[index] building {ann} ANN over {n} vectors")
+        _build_ann(ann, vectors, out_dir)
+
+    meta = {"count": n, "dim": dim, "embedder": embedder_id, "ann": ann if n else "none",
+            "terms": len(vocab), "bm25": {"k1": k1, "b": b, "epsilon": epsilon}}
+    with open(os.path.join(out_dir, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+    return meta
+
+
+class EvidenceIndex:
+    def __init__(self, index_dir: str, max_postings: int = 200_000, ef_search: int = 128):
+        with open(os.path.join(index_dir, "meta.json"), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.dir = index_dir
+        self.count = int(self.meta["count"])
+        self.dim = int(self.meta["dim"])
+        # Query terms with longer postings lists ("the", "of") cost the most and
+        # barely move BM25; the embedding side still sees them.
+        self.max_postings = max_postings
+
+        def mm(name, dtype, shape=None):
+            path = os.path.join(index_dir, name)
+            if not os.path.getsize(path):
+                return np.zeros(shape or 0, dtype=dtype)
+            return np.memmap(path, dtype=dtype, mode="r", shape=shape)
+
+        self.texts = _StringStore(index_dir, "texts")
+        self.urls = _StringStore(index_dir, "urls")
+        self.groups = mm("groups.i32", np.int32)
+        self.vectors = mm("vectors.f16", np.float16, (self.count, self.dim))
+        self.post_doc = mm("post_doc.i32", np.int32)
+        self.post_w = mm("post_w.f32", np.float32)
+        self.indptr = mm("indptr.i64", np.int64)
+        with open(os.path.join(index_dir, "vocab.json"), "r", encoding="utf-8") as f:
+            self.vocab: Dict[str, int] = json.load(f)
+
+        self.ann = None
+        self.ann_kind = self.meta.get("ann", "none")
+        if self.ann_kind == "faiss":
+            import faiss
+
+            path = os.path.join(index_dir, "ann.faiss")
+            try:
+                self.ann = faiss.read_index(path, faiss.IO_FLAG_MMAP)
+            except RuntimeError:  # not every index type can be memory-mapped
+                self.ann = faiss.read_index(path)
+            self.ann.hnsw.efSearch = ef_search
+        elif self.ann_kind == "hnswlib":
+            import hnswlib
+
+            self.ann = hnswlib.Index(space="ip", dim=self.dim)
+            self.ann.load_index(os.path.join(index_dir, "ann.hnsw"), max_elements=self.count)
+            self.ann.set_ef(ef_search)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def bm25(self, query: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """(paragraph ids, BM25 scores) for every paragraph containing a query term."""
+        spans = []
+        for t in query:
+            tid = self.vocab.get(t)
+            if tid is None:
+                continue
+            lo, hi = int(self.indptr[tid]), int(self.indptr[tid + 1])
+            if hi - lo <= self.max_postings:
+                spans.append((lo, hi))
+        if not spans:
+            return np.zeros(0, np.int64), np.zeros(0)
+        docs = np.concatenate([self.post_doc[lo:hi] for lo, hi in spans])
+        weights = np.concatenate([self.post_w[lo:hi] for lo, hi in spans]).astype(np.float64)
+        ids, inv = np.unique(docs, return_inverse=True)
+        return ids.astype(np.int64), np.bincount(inv, weights=weights)
+
+    def nearest(self, query_vec: np.ndarray, k: int, chunk: int = 262144) -> np.ndarray:
+        """Ids of the (approximately) `k` most similar paragraphs."""
+        k = min(k, self.count)
+        if k <= 0:
+            return np.zeros(0, np.int64)
+        q = np.asarray(query_vec, dtype=np.float32).reshape(1, -1)
+        if self.ann_kind == "faiss":
+            _, ids = self.ann.search(q, k)
+            return ids[0][ids[0] >= 0].astype(np.int64)
+        if self.ann_kind == "hnswlib":
+            ids, _ = self.ann.knn_query(q, k=k)
+            return ids[0].astype(np.int64)
+        best_ids, best_sc = np.zeros(0, np.int64), np.zeros(0, np.float32)
+        for i in range(0, self.count, chunk):
+            sc = np.asarray(self.vectors[i:i + chunk], dtype=np.float32) @ q[0]
+            top = np.argpartition(-sc, min(k, len(sc)) - 1)[:k]
+            best_ids = np.concatenate((best_ids, top + i))
+            best_sc = np.concatenate((best_sc, sc[top]))
+            if len(best_ids) > k:
+                keep = np.argpartition(-best_sc, k - 1)[:k]
+                best_ids, best_sc = best_ids[keep], best_sc[keep]
+        return best_ids
+
+    def search(self, query: str, query_vec: np.ndarray, k: int = 20, candidates: int = 100) -> List[dict]:
+        """Hybrid top-`k` paragraphs for `query`: [{"id", "url", "text", "score", "bm25", "cos"}]."""
+        if not self.count:
+            return []
+        bm_ids, bm_sc = self.bm25(tokenize(query))
+        if len(bm_ids) > candidates:
+            keep = np.argpartition(-bm_sc, candidates - 1)[:candidates]
+            lex_ids = bm_ids[keep]
+        else:
+            lex_ids = bm_ids
+        ids = np.union1d(lex_ids, self.nearest(query_vec, candidates))
+
+        q = np.asarray(query_vec, dtype=np.float32)
+        q = q / max(float(np.linalg.norm(q)), 1e-12)
+        cos = np.asarray(self.vectors[ids], dtype=np.float32) @ q
+        bm = np.zeros(len(ids))
+        pos = np.searchsorted(bm_ids, ids)
+        found = (pos < len(bm_ids)) & (bm_ids[np.minimum(pos, len(bm_ids) - 1)] == ids) if len(bm_ids) else pos < 0
+        bm[found] = bm_sc[pos[found]]
+        hybrid = hybrid_scores(bm, cos)
+        top = np.argsort(-hybrid, kind="stable")[:k]
+        return [{"id": int(ids[j]), "url": self.urls[int(ids[j])], "text": self.texts[int(ids[j])],
+                 "score": float(hybrid[j]), "bm25": float(bm[j]), "cos": float(cos[j])} for j in top]
+
+    def neighbours(self, i: int, radius: int = 1) -> Tuple[List[str], int]:
+        """(paragraphs, position of `i` in them): `i` and up to `radius` same-article neighbours per side."""
+        group = self.groups[i]
+        lo = i
+        while lo > max(0, i - radius) and self.groups[lo - 1] == group:
+            lo -= 1
+        hi = i
+        while hi < min(self.count - 1, i + radius) and self.groups[hi + 1] == group:
+            hi += 1
+        return [self.texts[j] for j in range(lo, hi + 1)], i - lo
+
+    def window(self, i: int, radius: int = 1) -> str:
+        """Paragraph `i` with up to `radius` neighbours from the same article on each side."""
+        paras, _ = self.neighbours(i, radius)
+        return " ".join(paras)
@@ -0,0 +1,123 @@
+"""HTML -> paragraph extraction in a process pool, used by `fetch_paragraphs` in app.py.
+
+`trafilatura.extract` is CPU-bound lxml/Python work that holds the GIL, so in a
+thread it still competes with model inference and every other request. Pages
+are handed as raw bytes (trafilatura detects the encoding) to a bounded
+`ProcessPoolExecutor` and come back as the list of paragraphs with at least
+`min_words` words, which is all the pipeline keeps.
+
+Workers start from a forkserver rather than forking the serving process, so
+they never inherit loaded models or torch threads. Each document gets a hard
+deadline inside the worker (SIGALRM); pages larger than `max_html_bytes` are
+never parsed.
+"""
+import asyncio
+import multiprocessing
+import signal
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Optional, Union
+
+Html = Union[str, bytes]
+
+
+class HtmlTooLarge(Exception):
+    pass
+
+
+class ExtractTimeout(Exception):
+    pass
+
+
+def split_paragraphs(text: str, min_words: int) -> List[str]:
+    return [p for p in text.split("\n") if len(p.split()) >= min_words]
+
+
+def _on_alarm(_signum, _frame):
+    raise ExtractTimeout()
+
+
+def extract_paragraphs(html: Html, url: str, min_words: int, timeout_s: float = 0.0) -> List[str]:
+    """Boilerplate-free paragraphs of `html`; runs in a pool worker (or a thread when the pool is off)."""
+    import trafilatura
+
+    # Signals only reach the main thread, which is where pool workers run tasks
+    alarm = timeout_s > 0 and threading.current_thread() is threading.main_thread()
+    if alarm:
+        signal.signal(signal.SIGALRM, _on_alarm)
+        signal.setitimer(signal.ITIMER_REAL, timeout_s)
+    try:
+        text = trafilatura.extract(html, url=url)
+    finally:
+        if alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+    return split_paragraphs(text or "", min_words)
+
+
+class ExtractPool:
+    def __init__(
+        self,
+        workers: int = 2,
+        timeout_s: float = 5.0,
+        max_html_bytes: int = 5 * 1024 * 1024,
+        min_words: int = 8,
+        max_tasks_per_child: int = 200,
+        queue_per_worker: int = 2,
+    ):
+        self.workers = workers  # 0 = extract in a thread, as before the pool existed
+        self.timeout_s = timeout_s
+        self.max_html_bytes = max_html_bytes
+        self.min_words = min_words
+        self.max_tasks_per_child = max_tasks_per_child  # recycle workers; lxml keeps memory it has touched
+        # Bounds pages waiting for a worker, so a burst of large pages is not all held in the queue
+        self._slots = asyncio.Semaphore(max(1, workers) * queue_per_worker)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self.stats = {"extracted": 0, "too_large": 0, "timeouts": 0, "errors": 0, "restarts": 0}
+
+    def executor(self) -> ProcessPoolExecutor:
+        # Created on first use, i.e. after a gunicorn fork, so each serving worker owns its pool
+        if self._executor is None:
+            methods = multiprocessing.get_all_start_methods()
+            ctx = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+            if ctx.get_start_method() == "forkserver":
+                ctx.set_forkserver_preload(["trafilatura"])
+            kwargs = {"max_tasks_per_child": self.max_tasks_per_child} if self.max_tasks_per_child > 0 else {}
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=ctx, **kwargs)
+        return self._executor
+
+    async def extract(self, html: Html, url: str) -> List[str]:
+        """Paragraphs of `html`; raises HtmlTooLarge / ExtractTimeout, or whatever trafilatura raised."""
+        if self.max_html_bytes and len(html) > self.max_html_bytes:
+            self.stats["too_large"] += 1
+            raise HtmlTooLarge(f"{len(html)} bytes")
+        async with self._slots:
+            try:
+                if self.workers <= 0:
+                    paras = await asyncio.to_thread(extract_paragraphs, html, url, self.min_words)
+                else:
+                    fut = asyncio.get_running_loop().run_in_executor(
+                        self.executor(), extract_paragraphs, html, url, self.min_words, self.timeout_s)
+                    # Backstop for a worker stuck in C code, where SIGALRM is only handled on return
+                    paras = await asyncio.wait_for(fut, 2 * self.timeout_s + 1 if self.timeout_s > 0 else None)
+            except (ExtractTimeout, asyncio.TimeoutError):
+                self.stats["timeouts"] += 1
+                raise ExtractTimeout(f"> {self.timeout_s:.1f}s") from None
+            except BrokenProcessPool:
+                # A worker died (OOM, segfault in lxml): start a fresh pool for the next page
+                self.stats["restarts"] += 1
+                self.shutdown()
+                raise
+            except Exception:
+                self.stats["errors"] += 1
+                raise
+        self.stats["extracted"] += 1
+        return paras
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def snapshot(self) -> Dict[str, int]:
+        return {**self.stats, "workers": self.workers, "running": int(self._executor is not None)}
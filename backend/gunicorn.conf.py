@@ -0,0 +1,34 @@
+# Multi-worker serving: gunicorn -c gunicorn.conf.py app:app  (run from backend/)
+#
+# The master imports app.py once with PRELOAD_MODELS=1, so the torch/spaCy weights
+# are loaded a single time and shared copy-on-write by every forked worker.
+# Each worker then gets its share of the cores for intra-op threads and opens its
+# own caches / ONNX sessions (see app.after_fork and app.load_models).
+import gc
+import itertools
+import multiprocessing
+import os
+
+os.environ.setdefault("PRELOAD_MODELS", "1")
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", str(max(1, multiprocessing.cpu_count() // 2))))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "180"))
+graceful_timeout = 30
+
+
+def pre_fork(server, worker):
+    # Stable slot numbers (0..workers-1) so per-worker cache files are reused across restarts
+    used = {getattr(w, "slot", None) for w in server.WORKERS.values()}
+    worker.slot = next(i for i in itertools.count() if i not in used)
+    # Move everything allocated so far (model weights, vocabularies) out of the GC's
+    # reach: collections would otherwise touch those pages and un-share them.
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    import app
+
+    app.after_fork(worker.slot, workers)
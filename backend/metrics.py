@@ -0,0 +1,159 @@
+"""Minimal in-process metrics with Prometheus text exposition.
+
+Counters and histograms are labelled and thread-safe (the micro-batcher
+worker records into them too). `stage_timer` times one pipeline stage into
+the shared stage histogram and, optionally, into a per-request timings dict
+that ends up in the `debug` payload.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+LabelValues = Tuple[str, ...]
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _fmt_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{str(v)}"'.replace("\n", " ") for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + [f"{self.name}{_fmt_labels(self.labelnames, k)} {v:g}" for k, v in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._counts: Dict[LabelValues, List[int]] = {}
+        self._sums: Dict[LabelValues, float] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            counts = self._counts.setdefault(key, [0] * (len(self.buckets) + 1))
+            for i, b in enumerate(self.buckets):
+                if value <= b:
+                    counts[i] += 1
+                    break
+            else:
+                counts[-1] += 1
+            self._sums[key] = self._sums.get(key, 0.0) + value
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted((k, list(c), self._sums[k]) for k, c in self._counts.items())
+        lines = self.header()
+        for key, counts, total in items:
+            cum = 0
+            for b, c in zip(self.buckets + (float("inf"),), counts):
+                cum += c
+                le = 'le="+Inf"' if b == float("inf") else f'le="{b:g}"'
+                lines.append(f"{self.name}_bucket{_fmt_labels(self.labelnames, key, le)} {cum}")
+            lines.append(f"{self.name}_sum{_fmt_labels(self.labelnames, key)} {total:g}")
+            lines.append(f"{self.name}_count{_fmt_labels(self.labelnames, key)} {cum}")
+        return lines
+
+
+class Gauge(_Metric):
+    """Value(s) read from a callback at scrape time (e.g. cache sizes)."""
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, fn: Callable[[], Dict[LabelValues, float]],
+                 labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        self.fn = fn
+
+    def render(self) -> List[str]:
+        try:
+            items = sorted(self.fn().items())
+        except Exception as e:  # a broken collector must not break /metrics
+            return [f"# {self.name} collector error: {e}"]
+        return self.header() + [f"{self.name}{_fmt_labels(self.labelnames, k)} {v:g}" for k, v in items]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def _add(self, metric: _Metric) -> _Metric:
+        self._metrics.setdefault(metric.name, metric)
+        return self._metrics[metric.name]
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._add(Counter(name, help, labelnames))  # type: ignore[return-value]
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._add(Histogram(name, help, labelnames, buckets))  # type: ignore[return-value]
+
+    def gauge(self, name: str, help: str, fn: Callable[[], Dict[LabelValues, float]],
+              labelnames: Sequence[str] = ()) -> Gauge:
+        return self._add(Gauge(name, help, fn, labelnames))  # type: ignore[return-value]
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "llm_checker_stage_seconds", "Wall time spent per pipeline stage", ["stage"])
+
+
+@contextmanager
+def stage_timer(stage: str, timings: Optional[Dict[str, float]] = None) -> Iterator[None]:
+    """Time a block into the stage histogram (and `timings[f"{stage}_s"]` if given)."""
+    t = time.perf_counter()
+    try:
+        yield
+    finally:
+        dt = time.perf_counter() - t
+        STAGE_SECONDS.observe(dt, stage=stage)
+        if timings is not None:
+            key = f"{stage}_s"
+            timings[key] = round(timings.get(key, 0.0) + dt, 4)
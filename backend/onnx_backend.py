@@ -0,0 +1,164 @@
+"""ONNX Runtime backend for the embedder, reranker and NLI models.
+
+`export_model` traces a Hugging Face checkpoint to ONNX (optionally followed by
+dynamic int8 quantization); the `Onnx*` classes run those graphs with the
+original tokenizers and reproduce the outputs app.py gets from torch:
+
+- OnnxEmbedder:   mean pooling + L2 normalization (all-MiniLM-L6-v2)
+- OnnxCrossEncoder: one relevance score per pair, sigmoid-activated like
+  sentence-transformers' CrossEncoder for single-label models
+- OnnxClassifier: raw logits for sequence-pair classification (NLI)
+
+Everything heavy is imported lazily so app.py can import this module even
+when onnxruntime is missing and fall back to torch.
+"""
+import os
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+KINDS = ("embed", "rerank", "nli")
+
+
+def model_dir(root: str, model_id: str, quantize: bool) -> str:
+    name = model_id.rstrip("/").replace("/", "__")
+    return os.path.join(root, f"{name}{'-int8' if quantize else ''}")
+
+
+def export_model(model_id: str, kind: str, out_dir: str, quantize: bool = False, opset: int = 17) -> str:
+    """Export `model_id` to `out_dir/model.onnx` (+ tokenizer files); returns the model path."""
+    import torch
+    from transformers import AutoModel, AutoModelForSequenceClassification, AutoTokenizer
+
+    if kind not in KINDS:
+        raise ValueError(f"unknown model kind {kind!r}; expected one of {KINDS}")
+    os.makedirs(out_dir, exist_ok=True)
+    tok = AutoTokenizer.from_pretrained(model_id)
+    if kind == "embed":
+        model = AutoModel.from_pretrained(model_id)
+        sample = tok(["an example sentence"], return_tensors="pt")
+        output_names = ["last_hidden_state"]
+    else:
+        model = AutoModelForSequenceClassification.from_pretrained(model_id)
+        sample = tok(["a claim"], ["a passage that may support it"], return_tensors="pt")
+        output_names = ["logits"]
+    model.eval()
+
+    input_names = [n for n in ("input_ids", "attention_mask", "token_type_ids") if n in sample]
+    dynamic_axes = {n: {0: "batch", 1: "seq"} for n in input_names}
+    dynamic_axes[output_names[0]] = {0: "batch"} if kind != "embed" else {0: "batch", 1: "seq"}
+
+    fp32_path = os.path.join(out_dir, "model.onnx")
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            tuple(sample[n] for n in input_names),
+            fp32_path,
+            input_names=input_names,
+            output_names=output_names,
+            dynamic_axes=dynamic_axes,
+            opset_version=opset,
+            do_constant_folding=True,
+        )
+    tok.save_pretrained(out_dir)
+
+    if not quantize:
+        return fp32_path
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    int8_path = os.path.join(out_dir, "model.int8.onnx")
+    quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+    os.remove(fp32_path)
+    os.replace(int8_path, fp32_path)
+    return fp32_path
+
+
+def load_or_export(model_id: str, kind: str, root: str, quantize: bool = False) -> str:
+    out_dir = model_dir(root, model_id, quantize)
+    path = os.path.join(out_dir, "model.onnx")
+    if not os.path.exists(path):
+        print(f"[onnx] exporting {model_id} ({kind}, int8={quantize}) -> {out_dir}")
+        export_model(model_id, kind, out_dir, quantize=quantize)
+    return out_dir
+
+
+class _OnnxModel:
+    def __init__(self, path_dir: str, intra_op_threads: int = 0):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        opts = ort.SessionOptions()
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if intra_op_threads > 0:
+            opts.intra_op_num_threads = intra_op_threads
+        self.session = ort.InferenceSession(
+            os.path.join(path_dir, "model.onnx"), opts, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = [i.name for i in self.session.get_inputs()]
+        self.tokenizer = AutoTokenizer.from_pretrained(path_dir)
+
+    def feed(self, enc: Dict[str, Sequence]) -> Dict[str, np.ndarray]:
+        return {n: np.asarray(enc[n], dtype=np.int64) for n in self.input_names}
+
+    def run(self, enc: Dict[str, Sequence]) -> np.ndarray:
+        return self.session.run(None, self.feed(enc))[0]
+
+
+class OnnxEmbedder(_OnnxModel):
+    def __init__(self, path_dir: str, max_length: int = 256, intra_op_threads: int = 0):
+        super().__init__(path_dir, intra_op_threads)
+        self.max_length = max_length
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return int(self.session.get_outputs()[0].shape[-1])
+
+    def encode(self, texts: Sequence[str], batch_size: int = 32, **_kwargs) -> np.ndarray:
+        out: List[np.ndarray] = []
+        for i in range(0, len(texts), batch_size):
+            enc = self.tokenizer(list(texts[i:i + batch_size]), padding=True, truncation=True,
+                                 max_length=self.max_length, return_tensors="np")
+            hidden = self.run(enc)
+            mask = enc["attention_mask"][..., None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            out.append(pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None))
+        return np.concatenate(out) if out else np.zeros((0, self.get_sentence_embedding_dimension()), np.float32)
+
+
+class OnnxCrossEncoder(_OnnxModel):
+    def __init__(self, path_dir: str, max_length: int = 512, intra_op_threads: int = 0):
+        super().__init__(path_dir, intra_op_threads)
+        self.max_length = max_length
+
+    def predict(self, pairs: Sequence[Tuple[str, str]], batch_size: int = 32, **_kwargs) -> np.ndarray:
+        scores: List[np.ndarray] = []
+        for i in range(0, len(pairs), batch_size):
+            chunk = pairs[i:i + batch_size]
+            enc = self.tokenizer([a for a, _ in chunk], [b for _, b in chunk], padding=True,
+                                 truncation=True, max_length=self.max_length, return_tensors="np")
+            logits = self.run(enc)
+            scores.append(1.0 / (1.0 + np.exp(-logits[:, 0])) if logits.shape[1] == 1 else logits)
+        return np.concatenate(scores) if scores else np.zeros((0,), np.float32)
+
+
+class OnnxClassifier(_OnnxModel):
+    """Sequence-pair classifier; `logits` takes already-padded tokenizer output."""
+
+    def logits(self, enc: Dict[str, Sequence]) -> np.ndarray:
+        return self.run(enc)
+
+
+def softmax(x: np.ndarray) -> np.ndarray:
+    e = np.exp(x - x.max(axis=-1, keepdims=True))
+    return e / e.sum(axis=-1, keepdims=True)
+
+
+def load_backend(kind: str, model_id: str, root: str, quantize: bool = False,
+                 intra_op_threads: int = 0) -> Optional[_OnnxModel]:
+    """ONNX model for `kind`, exporting it first if needed; None if ONNX is unavailable."""
+    try:
+        path_dir = load_or_export(model_id, kind, root, quantize=quantize)
+        cls = {"embed": OnnxEmbedder, "rerank": OnnxCrossEncoder, "nli": OnnxClassifier}[kind]
+        return cls(path_dir, intra_op_threads=intra_op_threads)
+    except Exception as e:
+        print(f"[onnx] {kind} ({model_id}) unavailable, falling back to torch: {e}")
+        return None
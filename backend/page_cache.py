@@ -0,0 +1,305 @@
+"""Two-tier cache for extracted page text used by `fetch_paragraphs` in app.py.
+
+Tier 1 is an in-memory LRU; tier 2 is a SQLite file shared across restarts
+(and gunicorn workers), trimmed least-recently-used first (memory hits refresh
+a row's access time in batches).
+Entries are keyed by normalized URL and carry the validators (ETag /
+Last-Modified) needed to revalidate stale pages with a conditional GET.
+Pages that block scraping are cached negatively for a shorter TTL.
+"""
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Dict, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+_TRACKING_PREFIXES = ("utm_", "fbclid", "gclid", "mc_cid", "mc_eid")
+_TOUCH_BATCH = 256        # memory hits buffered before their last_access is written
+_TOUCH_INTERVAL_S = 30.0  # ...or after this long
+
+
+def normalize_url(url: str) -> str:
+    """Canonical cache key: lowercased host, no fragment/default port/tracking params."""
+    try:
+        parts = urlsplit(url.strip())
+    except ValueError:
+        return url
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    port = parts.port
+    if port and not ((scheme == "http" and port == 80) or (scheme == "https" and port == 443)):
+        host = f"{host}:{port}"
+    query = urlencode(sorted(
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not k.lower().startswith(_TRACKING_PREFIXES)
+    ))
+    path = parts.path or "/"
+    return urlunsplit((scheme, host, path, query, ""))
+
+
+def parse_domain_ttls(spec: str) -> Dict[str, float]:
+    """Parse "wikipedia.org=604800,reuters.com=3600" into {domain: seconds}."""
+    out: Dict[str, float] = {}
+    for item in (spec or "").split(","):
+        if "=" not in item:
+            continue
+        dom, ttl = item.split("=", 1)
+        try:
+            out[dom.strip().lower()] = float(ttl)
+        except ValueError:
+            continue
+    return out
+
+
+@dataclass
+class PageEntry:
+    url: str
+    text: Optional[str]
+    etag: Optional[str]
+    last_modified: Optional[str]
+    fetched_at: float
+    expires_at: float
+    negative: bool = False
+
+    @property
+    def fresh(self) -> bool:
+        return time.time() < self.expires_at
+
+    @property
+    def size(self) -> int:
+        return len(self.text.encode("utf-8")) if self.text else 0
+
+
+class PageCache:
+    """Memory tier + SQLite tier. `get(url, disk=False)` never touches SQLite, so
+    callers on an event loop can answer memory hits inline and send everything
+    else (`get`, `put`, `refresh`) to a thread (see `_fetch_paragraphs` in app.py).
+
+    The disk byte total lives in the database (`page_meta`) and is updated in the
+    same transaction as each write, so every process sharing the file enforces
+    one `max_bytes` cap.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        mem_items: int = 512,
+        max_bytes: int = 512 * 1024 * 1024,
+        default_ttl: float = 86400.0,
+        negative_ttl: float = 3600.0,
+        domain_ttls: Optional[Dict[str, float]] = None,
+        evict_chunk: int = 256,
+    ):
+        self.mem_items = mem_items
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.negative_ttl = negative_ttl
+        self.domain_ttls = domain_ttls or {}
+        self.evict_chunk = evict_chunk
+        self._mem: "OrderedDict[str, PageEntry]" = OrderedDict()
+        self._lock = threading.Lock()     # memory tier and stats; never held across SQL
+        self._db_lock = threading.Lock()  # the SQLite connection
+        self.stats = {"mem_hits": 0, "disk_hits": 0, "misses": 0, "stale": 0,
+                      "negative_hits": 0, "revalidated": 0, "stores": 0, "evictions": 0}
+
+        self.path = path
+        self._db: Optional[sqlite3.Connection] = None
+        self._disk_bytes = 0  # last total read from page_meta, for snapshots only
+        self._touched: Dict[str, float] = {}
+        self._touched_at = time.time()
+        self._connect()
+
+    def _connect(self) -> None:
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        with self._transaction() as db:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS pages ("
+                " key TEXT PRIMARY KEY, url TEXT, text TEXT, etag TEXT, last_modified TEXT,"
+                " fetched_at REAL, expires_at REAL, negative INTEGER, size INTEGER, last_access REAL)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS pages_last_access ON pages(last_access)")
+            db.execute("CREATE TABLE IF NOT EXISTS page_meta (id INTEGER PRIMARY KEY CHECK (id = 0), bytes INTEGER)")
+            db.execute("INSERT OR IGNORE INTO page_meta SELECT 0, COALESCE(SUM(size), 0) FROM pages")
+            self._disk_bytes = self._total(db)
+
+    @property
+    def on_disk(self) -> bool:
+        return self._db is not None
+
+    def reopen(self) -> None:
+        """New SQLite connection for a forked child; the parent's must not be reused."""
+        self._db = None
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._touched = {}
+        self._connect()
+
+    def ttl_for(self, url: str) -> float:
+        host = (urlsplit(url).hostname or "").lower()
+        for dom, ttl in self.domain_ttls.items():
+            if host == dom or host.endswith("." + dom):
+                return ttl
+        return self.default_ttl
+
+    def get(self, url: str, disk: bool = True) -> Optional[PageEntry]:
+        """Return the cached entry (fresh or stale) or None; updates hit/miss counters.
+
+        With `disk=False` only the memory tier is consulted, and a miss is not
+        counted (the caller is expected to ask again with the disk tier).
+        """
+        key = normalize_url(url)
+        with self._lock:
+            entry = self._mem.get(key)
+            if entry is not None:
+                self._mem.move_to_end(key)
+                self.stats["mem_hits"] += 1
+                if self._db is not None:
+                    self._touched[key] = time.time()
+            elif not disk:
+                return None
+        if entry is None and self._db is not None:
+            with self._db_lock:
+                row = self._db.execute(
+                    "SELECT url, text, etag, last_modified, fetched_at, expires_at, negative"
+                    " FROM pages WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    self._db.execute("UPDATE pages SET last_access = ? WHERE key = ?", (time.time(), key))
+            if row is not None:
+                entry = PageEntry(row[0], row[1], row[2], row[3], row[4], row[5], bool(row[6]))
+                with self._lock:
+                    self._remember(key, entry)
+                    self.stats["disk_hits"] += 1
+        if self._db is not None and self._touch_due():
+            self._flush_touches()
+        with self._lock:
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            if not entry.fresh:
+                self.stats["stale"] += 1
+            elif entry.negative:
+                self.stats["negative_hits"] += 1
+            return entry
+
+    def put(self, url: str, text: Optional[str], etag: Optional[str] = None,
+            last_modified: Optional[str] = None, negative: bool = False) -> PageEntry:
+        now = time.time()
+        ttl = self.negative_ttl if negative else self.ttl_for(url)
+        entry = PageEntry(url, text, etag, last_modified, now, now + ttl, negative)
+        key = normalize_url(url)
+        with self._lock:
+            self._remember(key, entry)
+            self.stats["stores"] += 1
+        if self._db is not None:
+            with self._transaction() as db:
+                old = db.execute("SELECT size FROM pages WHERE key = ?", (key,)).fetchone()
+                db.execute(
+                    "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (key, url, text, etag, last_modified, now, entry.expires_at,
+                     int(negative), entry.size, now),
+                )
+                db.execute("UPDATE page_meta SET bytes = bytes + ? WHERE id = 0",
+                           (entry.size - (old[0] if old else 0),))
+                self._disk_bytes = self._total(db)
+                over = self._disk_bytes > self.max_bytes
+            if over:
+                self._evict_disk()
+        return entry
+
+    def refresh(self, entry: PageEntry) -> PageEntry:
+        """Extend a stale entry after the origin answered 304 Not Modified."""
+        now = time.time()
+        entry.fetched_at = now
+        entry.expires_at = now + self.ttl_for(entry.url)
+        key = normalize_url(entry.url)
+        with self._lock:
+            self._remember(key, entry)
+            self.stats["revalidated"] += 1
+        if self._db is not None:
+            with self._db_lock:
+                self._db.execute(
+                    "UPDATE pages SET fetched_at = ?, expires_at = ?, last_access = ? WHERE key = ?",
+                    (now, entry.expires_at, now, key),
+                )
+        return entry
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            hits = self.stats["mem_hits"] + self.stats["disk_hits"]
+            lookups = hits + self.stats["misses"]
+            return {**self.stats, "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+                    "mem_items": len(self._mem), "disk_bytes": self._disk_bytes}
+
+    def close(self) -> None:
+        if self._db is not None:
+            self._flush_touches()
+            with self._db_lock:
+                self._db.close()
+                self._db = None
+
+    # ----- internals -----
+    @contextmanager
+    def _transaction(self):
+        with self._db_lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._db
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+
+    @staticmethod
+    def _total(db: sqlite3.Connection) -> int:
+        return int(db.execute("SELECT bytes FROM page_meta WHERE id = 0").fetchone()[0])
+
+    def _remember(self, key: str, entry: PageEntry) -> None:
+        # caller holds self._lock
+        self._mem[key] = entry
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.mem_items:
+            self._mem.popitem(last=False)
+
+    def _touch_due(self) -> bool:
+        return len(self._touched) >= _TOUCH_BATCH or time.time() - self._touched_at >= _TOUCH_INTERVAL_S
+
+    def _flush_touches(self) -> None:
+        with self._lock:
+            touched, self._touched = self._touched, {}
+            self._touched_at = time.time()
+        if touched:
+            with self._db_lock:
+                self._db.executemany("UPDATE pages SET last_access = ? WHERE key = ?",
+                                     [(t, key) for key, t in touched.items()])
+
+    def _evict_disk(self) -> None:
+        # Drop least-recently-used rows, `evict_chunk` at a time, until the shared
+        # total is back under 90% of the cap
+        self._flush_touches()
+        target = int(self.max_bytes * 0.9)
+        while True:
+            with self._transaction() as db:
+                total = self._total(db)
+                if total <= target:
+                    break
+                rows = db.execute("SELECT key, size FROM pages ORDER BY last_access ASC LIMIT ?",
+                                  (self.evict_chunk,)).fetchall()
+                if not rows:
+                    break
+                db.executemany("DELETE FROM pages WHERE key = ?", [(k,) for k, _ in rows])
+                freed = sum(size or 0 for _, size in rows)
+                db.execute("UPDATE page_meta SET bytes = bytes - ? WHERE id = 0", (freed,))
+                self._disk_bytes = total - freed
+            with self._lock:
+                for key, _ in rows:
+                    self._mem.pop(key, None)
+                self.stats["evictions"] += len(rows)
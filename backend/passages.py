@@ -0,0 +1,110 @@
+"""Pages as indexed paragraphs, and NLI windows packed to the tokenizer's budget.
+
+A `Page` is built once per page text (`fetch_paragraphs` in app.py keeps one
+per URL while its cached text is unchanged) and carries what the retrieval
+stages need by paragraph id: the paragraph texts, their character offsets in
+the page text stored in the page cache (paragraphs joined with newlines), and
+token counts under the NLI tokenizer. Counts are filled lazily and memoized on
+the page, so a page shared by several sub-claims is tokenized once; copies
+with a search snippet appended (`with_extra`) count into the original.
+
+`pack_window` replaces "join ±1 neighbours, cut at 450 words": it starts from
+the reranked paragraph and adds whole neighbours, nearest first, only while
+claim + window fit in the NLI model's max length, so the tokenizer never
+silently cuts evidence off the end of a window.
+"""
+from array import array
+from typing import Callable, List, Optional, Sequence, Tuple
+
+# texts -> token counts (no special tokens)
+TokenCounter = Callable[[List[str]], List[int]]
+# (text, max_tokens) -> char offset where the first `max_tokens` tokens end
+TokenCutter = Callable[[str, int], int]
+
+PAIR_SPECIAL_TOKENS = 3  # [CLS] claim [SEP] passage [SEP]
+
+
+class Page:
+    __slots__ = ("url", "paras", "starts", "ntok", "base")
+
+    def __init__(self, url: str, paras: Sequence[str]):
+        self.url = url
+        self.base: Optional[Page] = None  # set by with_extra: the page whose paragraphs come first
+        self.paras = list(paras)
+        self.starts = array("q")
+        pos = 0
+        for p in self.paras:
+            self.starts.append(pos)
+            pos += len(p) + 1  # "\n" separator in the cached page text
+        self.ntok = array("i", [-1]) * len(self.paras)
+
+    def __len__(self) -> int:
+        return len(self.paras)
+
+    def __repr__(self) -> str:
+        return f"Page({self.url!r}, {len(self.paras)} paragraphs)"
+
+    @property
+    def text(self) -> str:
+        return "\n".join(self.paras)
+
+    def span(self, lo: int, hi: int, passage: Optional[str] = None) -> Tuple[int, int]:
+        """Character span of paragraphs lo..hi (inclusive) in `text`.
+
+        Pass the window's `passage` to get the span it actually covers when
+        pack_window cut it short.
+        """
+        end = self.starts[hi] + len(self.paras[hi])
+        if passage is not None:
+            end = min(end, self.starts[lo] + len(passage))
+        return self.starts[lo], end
+
+    def with_extra(self, paras: Sequence[str]) -> "Page":
+        """Copy with `paras` appended (e.g. the search snippet); token counts are shared with this page."""
+        base = self.base or self
+        page = Page(self.url, self.paras + list(paras))
+        page.base = base
+        return page
+
+    def token_counts(self, ids: Sequence[int], count: TokenCounter) -> None:
+        """Fill in the token counts of paragraphs `ids` not counted yet (one tokenizer call)."""
+        base = self.base
+        if base is not None:
+            nb = len(base)
+            self.ntok[:nb] = base.ntok
+        todo = [i for i in dict.fromkeys(ids) if self.ntok[i] < 0]
+        if todo:
+            for i, n in zip(todo, count([self.paras[i] for i in todo])):
+                self.ntok[i] = n
+            if base is not None:
+                base.ntok[:] = self.ntok[:nb]
+
+
+def pack_window(page: Page, i: int, budget: int, radius: int, count: TokenCounter,
+                cut: Optional[TokenCutter] = None) -> Tuple[int, int, str]:
+    """(lo, hi, passage): paragraph `i` plus whole neighbours within `radius` that fit in `budget` tokens.
+
+    Neighbours are tried nearest first, before and then after; a side stops
+    growing at the first paragraph that does not fit, so windows stay
+    contiguous. A paragraph that alone exceeds the budget is cut at a token
+    boundary with `cut` (left to the tokenizer's truncation without it).
+    """
+    lo_r, hi_r = max(0, i - radius), min(len(page) - 1, i + radius)
+    page.token_counts(range(lo_r, hi_r + 1), count)
+    if page.ntok[i] > budget:
+        text = page.paras[i]
+        return i, i, text[:cut(text, budget)] if cut is not None else text
+
+    used = page.ntok[i]
+    lo = hi = i
+    grow_lo, grow_hi = True, True
+    for d in range(1, radius + 1):
+        if grow_lo and i - d >= lo_r and used + page.ntok[i - d] <= budget:
+            lo, used = i - d, used + page.ntok[i - d]
+        else:
+            grow_lo = False
+        if grow_hi and i + d <= hi_r and used + page.ntok[i + d] <= budget:
+            hi, used = i + d, used + page.ntok[i + d]
+        else:
+            grow_hi = False
+    return lo, hi, " ".join(page.paras[lo:hi + 1])
@@ -0,0 +1,93 @@
+"""Vectorized first-stage recall over the paragraphs of many pages at once.
+
+`score_pages` in app.py pools every paragraph retrieved for a sub-claim into
+one corpus: BM25 statistics (IDF, average length) are shared, so scores are
+comparable across pages, and the claim is embedded once. Selection uses
+`argpartition` with an optional per-page quota instead of sorting everything.
+"""
+import re
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_RE.findall((text or "").lower())
+
+
+class BM25Corpus:
+    """Okapi BM25 (same formula and IDF floor as rank_bm25.BM25Okapi) as postings arrays."""
+
+    def __init__(self, docs: Sequence[Sequence[str]], k1: float = 1.5, b: float = 0.75,
+                 epsilon: float = 0.25):
+        self.n_docs = len(docs)
+        self.vocab: Dict[str, int] = {}
+        term_ids: List[int] = []
+        for toks in docs:
+            term_ids.extend(self.vocab.setdefault(t, len(self.vocab)) for t in toks)
+        doc_len = np.fromiter((len(toks) for toks in docs), dtype=np.int64, count=self.n_docs)
+        n_terms = max(1, len(self.vocab))
+
+        # (doc, term) -> tf, grouped by term so each term's postings are one slice
+        doc_ids = np.repeat(np.arange(self.n_docs, dtype=np.int64), doc_len)
+        keys, tf = np.unique(np.asarray(term_ids, dtype=np.int64) * self.n_docs + doc_ids,
+                             return_counts=True)
+        self.post_term = keys // max(1, self.n_docs)
+        self.post_doc = keys % max(1, self.n_docs)
+        df = np.bincount(self.post_term, minlength=n_terms)
+        self.indptr = np.concatenate(([0], np.cumsum(df)))
+
+        idf = np.log(self.n_docs - df + 0.5) - np.log(df + 0.5)
+        floor = epsilon * idf.mean() if len(idf) else 0.0
+        self.idf = np.where(idf < 0, floor, idf)
+
+        avgdl = doc_len.mean() if self.n_docs else 0.0
+        dl = doc_len[self.post_doc].astype(np.float64)
+        norm = k1 * (1 - b + b * dl / avgdl) if avgdl > 0 else np.full_like(dl, k1)
+        self.post_weight = tf * (k1 + 1) / (tf + norm)
+
+    def scores(self, query: Sequence[str]) -> np.ndarray:
+        """BM25 score of every document for `query` tokens (repeated tokens count again)."""
+        out = np.zeros(self.n_docs, dtype=np.float64)
+        terms = [self.vocab[t] for t in query if t in self.vocab]
+        if not terms:
+            return out
+        spans = [np.arange(self.indptr[t], self.indptr[t + 1]) for t in terms]
+        idx = np.concatenate(spans)
+        weights = np.repeat(self.idf[terms], [len(s) for s in spans]) * self.post_weight[idx]
+        return np.bincount(self.post_doc[idx], weights=weights, minlength=self.n_docs)
+
+
+def cosine_scores(query_vec: np.ndarray, doc_vecs: np.ndarray) -> np.ndarray:
+    q = np.asarray(query_vec, dtype=np.float32)
+    d = np.asarray(doc_vecs, dtype=np.float32)
+    if not len(d):
+        return np.zeros(0, dtype=np.float32)
+    denom = np.linalg.norm(d, axis=1) * max(float(np.linalg.norm(q)), 1e-12)
+    return (d @ q) / np.clip(denom, 1e-12, None)
+
+
+def hybrid_scores(bm25: np.ndarray, cos: np.ndarray, bm25_weight: float = 0.6) -> np.ndarray:
+    """`bm25_weight` * max-normalized BM25 + the rest * cosine."""
+    top = float(bm25.max()) if len(bm25) else 0.0
+    return bm25_weight * (bm25 / (top if top > 0 else 1.0)) + (1 - bm25_weight) * cos
+
+
+def select_top(scores: np.ndarray, groups: np.ndarray, k: int, per_group: Optional[int] = None) -> np.ndarray:
+    """Indices of the `k` best scores, at most `per_group` from any one group; best first."""
+    scores = np.asarray(scores, dtype=np.float64)
+    n = len(scores)
+    if n == 0 or k <= 0:
+        return np.zeros(0, dtype=np.int64)
+    eligible = np.arange(n)
+    if per_group is not None and per_group > 0:
+        order = np.lexsort((-scores, groups))  # by group, best first within a group
+        g = np.asarray(groups)[order]
+        starts = np.flatnonzero(np.r_[True, g[1:] != g[:-1]])
+        rank = np.arange(n) - np.repeat(starts, np.diff(np.r_[starts, n]))
+        eligible = order[rank < per_group]
+    if len(eligible) > k:
+        eligible = eligible[np.argpartition(-scores[eligible], k - 1)[:k]]
+    return eligible[np.argsort(-scores[eligible], kind="stable")]
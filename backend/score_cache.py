@@ -0,0 +1,231 @@
+"""Memoized (claim, passage) model outputs: reranker scores and NLI labels.
+
+Entries are keyed by a hash of the model id plus the whitespace-normalized
+claim and passage, and held in an LRU bounded by an estimate of their memory
+footprint. With a `path`, entries are also written through to SQLite so they
+survive restarts; rows written under a different model id for a stage are
+dropped on open, so changing `MODEL_ID` or `RERANKER_ID` invalidates them.
+The table is capped at `max_disk_rows` (counted in the database, so one cap
+holds for every gunicorn worker sharing the file) and evicts
+least-recently-used rows; hits served from memory refresh their row's access
+time in batches.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+_ENTRY_OVERHEAD = 104  # OrderedDict node + tuple key wrapper, roughly
+_TOUCH_BATCH = 512       # memory hits buffered before their last_access is written
+_TOUCH_INTERVAL_S = 30.0  # ...or after this long
+
+
+def _sizeof(value: Any) -> int:
+    if isinstance(value, (tuple, list)):
+        return sys.getsizeof(value) + sum(_sizeof(v) for v in value)
+    return sys.getsizeof(value)
+
+
+def pair_key(model_id: str, claim: str, passage: str) -> bytes:
+    h = hashlib.blake2b(digest_size=16)
+    for part in (model_id, " ".join(claim.split()), " ".join(passage.split())):
+        h.update(part.encode("utf-8"))
+        h.update(b"\x1f")
+    return h.digest()
+
+
+class ScoreCache:
+    def __init__(self, model_ids: Dict[str, str], max_bytes: int = 64 * 1024 * 1024,
+                 path: Optional[str] = None, max_disk_rows: int = 1_000_000, evict_chunk: int = 10_000):
+        self.model_ids = dict(model_ids)
+        self.max_bytes = max_bytes
+        self.max_disk_rows = max_disk_rows  # 0 = unbounded
+        self.evict_chunk = evict_chunk
+        self.nbytes = 0
+        self._mem: "OrderedDict[Tuple[str, bytes], Any]" = OrderedDict()
+        self._lock = threading.Lock()     # memory tier and stats; never held across SQL
+        self._db_lock = threading.Lock()  # the SQLite connection
+        self.stats = {stage: {"hits": 0, "misses": 0} for stage in self.model_ids}
+        self.evictions = 0
+
+        self._db: Optional[sqlite3.Connection] = None
+        self._disk_rows = 0  # last count read from score_meta, for snapshots only
+        self._touched: Dict[Tuple[str, bytes], float] = {}
+        self._touched_at = time.time()
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            with self._transaction() as db:
+                db.execute(
+                    "CREATE TABLE IF NOT EXISTS scores ("
+                    " stage TEXT, key BLOB, model_id TEXT, value TEXT, last_access REAL,"
+                    " PRIMARY KEY (stage, key))"
+                )
+                db.execute("CREATE INDEX IF NOT EXISTS scores_last_access ON scores(last_access)")
+                # Row count shared by every process using the file (gunicorn workers)
+                db.execute("CREATE TABLE IF NOT EXISTS score_meta (id INTEGER PRIMARY KEY CHECK (id = 0), rows INTEGER)")
+                for stage, model_id in self.model_ids.items():
+                    db.execute("DELETE FROM scores WHERE stage = ? AND model_id != ?", (stage, model_id))
+                placeholders = ",".join("?" * len(self.model_ids))
+                db.execute(f"DELETE FROM scores WHERE stage NOT IN ({placeholders})", list(self.model_ids))
+                db.execute("INSERT OR REPLACE INTO score_meta SELECT 0, COUNT(*) FROM scores")
+                self._disk_rows = self._rows(db)
+            if self.max_disk_rows and self._disk_rows > self.max_disk_rows:
+                self._evict_disk()
+
+    @property
+    def on_disk(self) -> bool:
+        return self._db is not None
+
+    def get_many(self, stage: str, pairs: Sequence[Tuple[str, str]]) -> List[Optional[Any]]:
+        """Cached results for `pairs` under `stage`, None where not cached.
+
+        Reads SQLite when the disk tier is on; call it from a thread then (see
+        `cached_scores` in app.py).
+        """
+        model_id = self.model_ids[stage]
+        mkeys = [(stage, pair_key(model_id, claim, passage)) for claim, passage in pairs]
+        out: List[Optional[Any]] = []
+        with self._lock:
+            for mkey in mkeys:
+                val = self._mem.get(mkey)
+                if val is not None:
+                    self._mem.move_to_end(mkey)
+                    if self._db is not None:
+                        self._touched[mkey] = time.time()
+                out.append(val)
+        missing = [i for i, val in enumerate(out) if val is None]
+        if missing and self._db is not None:
+            with self._db_lock:
+                rows = [self._db.execute("SELECT value FROM scores WHERE stage = ? AND key = ?", mkeys[i]).fetchone()
+                        for i in missing]
+            with self._lock:
+                for i, row in zip(missing, rows):
+                    if row is not None:
+                        out[i] = self._decode(json.loads(row[0]))
+                        self._remember(mkeys[i], out[i])
+                        self._touched[mkeys[i]] = time.time()
+        with self._lock:
+            hits = sum(val is not None for val in out)
+            self.stats[stage]["hits"] += hits
+            self.stats[stage]["misses"] += len(out) - hits
+            due = len(self._touched) >= _TOUCH_BATCH or time.time() - self._touched_at >= _TOUCH_INTERVAL_S
+        if due:
+            self._flush_touches()
+        return out
+
+    def put_many(self, stage: str, pairs: Sequence[Tuple[str, str]], values: Sequence[Any]) -> None:
+        """Store results (None values are skipped); writes SQLite when the disk tier is on."""
+        model_id = self.model_ids[stage]
+        rows = []
+        with self._lock:
+            for (claim, passage), val in zip(pairs, values):
+                if val is None:
+                    continue
+                mkey = (stage, pair_key(model_id, claim, passage))
+                self._remember(mkey, val)
+                rows.append((stage, mkey[1], model_id, json.dumps(val), time.time()))
+        if self._db is None or not rows:
+            return
+        with self._transaction() as db:
+            # Same key, same model id: a row already there holds the same value
+            before = db.total_changes
+            db.executemany("INSERT OR IGNORE INTO scores VALUES (?, ?, ?, ?, ?)", rows)
+            inserted = db.total_changes - before
+            db.execute("UPDATE score_meta SET rows = rows + ? WHERE id = 0", (inserted,))
+            self._disk_rows = self._rows(db)
+        if inserted < len(rows):
+            with self._lock:
+                self._touched.update(((stage, r[1]), r[4]) for r in rows)
+        if self.max_disk_rows and self._disk_rows > self.max_disk_rows:
+            self._evict_disk()
+
+    def hit_ratios(self) -> Dict[str, float]:
+        out = {}
+        for stage, st in self.stats.items():
+            n = st["hits"] + st["misses"]
+            out[stage] = round(st["hits"] / n, 4) if n else 0.0
+        return out
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {"items": len(self._mem), "bytes": self.nbytes, "max_bytes": self.max_bytes,
+                    "disk_rows": self._disk_rows, "max_disk_rows": self.max_disk_rows,
+                    "evictions": self.evictions,
+                    "stages": {s: dict(st) for s, st in self.stats.items()},
+                    "hit_ratio": self.hit_ratios()}
+
+    def close(self) -> None:
+        if self._db is not None:
+            self._flush_touches()
+            with self._db_lock:
+                self._db.close()
+                self._db = None
+
+    # ----- internals -----
+    @contextmanager
+    def _transaction(self):
+        with self._db_lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._db
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+
+    @staticmethod
+    def _rows(db: sqlite3.Connection) -> int:
+        return int(db.execute("SELECT rows FROM score_meta WHERE id = 0").fetchone()[0])
+
+    @staticmethod
+    def _decode(val: Any) -> Any:
+        return tuple(val) if isinstance(val, list) else val
+
+    def _remember(self, mkey: Tuple[str, bytes], val: Any) -> None:
+        # caller holds self._lock
+        old = self._mem.pop(mkey, None)
+        if old is not None:
+            self.nbytes -= _ENTRY_OVERHEAD + _sizeof(mkey) + _sizeof(old)
+        self._mem[mkey] = val
+        self.nbytes += _ENTRY_OVERHEAD + _sizeof(mkey) + _sizeof(val)
+        while self.nbytes > self.max_bytes and self._mem:
+            k, v = self._mem.popitem(last=False)
+            self.nbytes -= _ENTRY_OVERHEAD + _sizeof(k) + _sizeof(v)
+
+    def _flush_touches(self) -> None:
+        with self._lock:
+            touched, self._touched = self._touched, {}
+            self._touched_at = time.time()
+        if touched and self._db is not None:
+            with self._db_lock:
+                self._db.executemany("UPDATE scores SET last_access = ? WHERE stage = ? AND key = ?",
+                                     [(t, stage, key) for (stage, key), t in touched.items()])
+
+    def _evict_disk(self) -> None:
+        # Drop least-recently-used rows, `evict_chunk` at a time, until the shared
+        # count is back under 90% of the cap
+        self._flush_touches()
+        target = int(self.max_disk_rows * 0.9)
+        while True:
+            with self._transaction() as db:
+                rows = self._rows(db)
+                if rows <= target:
+                    break
+                db.execute("DELETE FROM scores WHERE rowid IN"
+                           " (SELECT rowid FROM scores ORDER BY last_access ASC LIMIT ?)",
+                           (min(self.evict_chunk, rows - target),))
+                dropped = db.execute("SELECT changes()").fetchone()[0]
+                db.execute("UPDATE score_meta SET rows = rows - ? WHERE id = 0", (dropped,))
+                self._disk_rows = rows - dropped
+            with self._lock:
+                self.evictions += dropped
+            if not dropped:
+                break
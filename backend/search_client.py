@@ -0,0 +1,203 @@
+"""Long-lived SearXNG client used by `searx()` in app.py.
+
+One pooled httpx client (keep-alive, HTTP/2 when `h2` is installed) serves
+every query. Results are cached by (query, language, engines) with a TTL and
+identical queries in flight share one request. Outgoing requests pass a
+token bucket and a concurrency cap sized to SearXNG's
+`outgoing.max_connections` (searxng/searxng/settings.yml), and failures are
+retried with jittered exponential backoff.
+"""
+import asyncio
+import random
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+SearchKey = Tuple[str, str, str]
+
+
+def search_key(query: str, language: str = "en", engines: str = "") -> SearchKey:
+    return " ".join(query.split()).lower(), language, engines
+
+
+class TokenBucket:
+    """`rate` requests per second on average, bursts of up to `burst`."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class SearchClient:
+    def __init__(
+        self,
+        url: str,
+        timeout: float = 15.0,
+        max_connections: int = 10,
+        rate_per_s: float = 10.0,
+        retries: int = 2,
+        backoff_s: float = 0.5,
+        cache_ttl_s: float = 3600.0,
+        empty_ttl_s: float = 300.0,
+        cache_items: int = 10_000,
+        max_results: int = 10,
+        on_result: Optional[Callable[[str], None]] = None,
+    ):
+        self.url = url
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.retries = retries
+        self.backoff_s = backoff_s
+        self.cache_ttl_s = cache_ttl_s
+        self.empty_ttl_s = empty_ttl_s
+        self.cache_items = cache_items
+        self.max_results = max_results
+        self.on_result = on_result  # outcome hook for metrics: ok / error / cache_hit / coalesced
+        self.bucket = TokenBucket(rate_per_s, max_connections)
+        self._sem = asyncio.Semaphore(max_connections)
+        self._client: Optional[httpx.AsyncClient] = None
+        self._cache: "OrderedDict[SearchKey, Tuple[float, List[Dict[str, Any]]]]" = OrderedDict()
+        self._inflight: Dict[SearchKey, asyncio.Future] = {}
+        self._waiters: Dict[SearchKey, int] = {}
+        self.stats = {"requests": 0, "retries": 0, "errors": 0, "cache_hits": 0, "coalesced": 0}
+
+    def client(self) -> httpx.AsyncClient:
+        # Created lazily inside the running loop (and after a gunicorn fork)
+        if self._client is None:
+            try:
+                import h2  # noqa: F401
+                http2 = True
+            except ImportError:
+                http2 = False
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                http2=http2,
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_connections),
+            )
+        return self._client
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def search(self, query: str, language: str = "en", engines: str = "") -> List[Dict[str, Any]]:
+        """SearXNG results for `query`; [] on failure (failures are not cached)."""
+        key = search_key(query, language, engines)
+        cached = self._cache.get(key)
+        if cached is not None:
+            expires_at, results = cached
+            if time.time() < expires_at:
+                self._cache.move_to_end(key)
+                self.stats["cache_hits"] += 1
+                self._event("cache_hit")
+                return list(results)
+            del self._cache[key]
+
+        fut = self._inflight.get(key)
+        if fut is not None:
+            self.stats["coalesced"] += 1
+            self._event("coalesced")
+        else:
+            fut = asyncio.ensure_future(self._fetch(query, language, engines))
+            self._inflight[key] = fut
+            fut.add_done_callback(lambda f: self._forget(key, f))
+        return list(await self._wait(key, fut))
+
+    async def _wait(self, key: SearchKey, fut: asyncio.Future) -> List[Dict[str, Any]]:
+        # shield: one caller going away must not cancel a query others wait on, but
+        # once the last one is gone the request, its retries and its rate-limit and
+        # connection slots are given up (as in ClaimCache._wait)
+        self._waiters[key] = self._waiters.get(key, 0) + 1
+        try:
+            return await asyncio.shield(fut)
+        except asyncio.CancelledError:
+            left = self._waiters.get(key, 1) - 1
+            self._waiters[key] = left
+            if left <= 0 and not fut.done():
+                fut.cancel()
+                self._forget(key, fut)  # later callers start a fresh request
+            raise
+
+    def _forget(self, key: SearchKey, fut: asyncio.Future) -> None:
+        if self._inflight.get(key) is fut:
+            del self._inflight[key]
+            self._waiters.pop(key, None)
+
+    async def _fetch(self, query: str, language: str, engines: str) -> List[Dict[str, Any]]:
+        params = {"q": query, "format": "json", "language": language}
+        if engines:
+            params["engines"] = engines
+        for attempt in range(self.retries + 1):
+            if attempt:
+                self.stats["retries"] += 1
+                # Full jitter: concurrent retries do not hit SearXNG in lockstep
+                await asyncio.sleep(random.uniform(0, self.backoff_s * (2 ** (attempt - 1))))
+            await self.bucket.acquire()
+            try:
+                async with self._sem:
+                    self.stats["requests"] += 1
+                    r = await self.client().get(self.url, params=params)
+                if r.status_code in RETRY_STATUS and attempt < self.retries:
+                    print(f"[searx] '{query}' -> HTTP {r.status_code}, retrying")
+                    continue
+                r.raise_for_status()
+                results = r.json().get("results", [])[:self.max_results]
+            except (httpx.TransportError, ValueError) as e:
+                if attempt < self.retries:
+                    print(f"[searx] query='{query}' error={e}, retrying")
+                    continue
+                return self._failed(query, e)
+            except httpx.HTTPStatusError as e:
+                return self._failed(query, e)
+            print(f"[searx] '{query}' -> {len(results)} results")
+            self._event("ok")
+            self._store(search_key(query, language, engines), results)
+            return results
+        return []
+
+    def _failed(self, query: str, err: Exception) -> List[Dict[str, Any]]:
+        print(f"[searx] query='{query}' error={err}")
+        self.stats["errors"] += 1
+        self._event("error")
+        return []
+
+    def _store(self, key: SearchKey, results: List[Dict[str, Any]]) -> None:
+        ttl = self.cache_ttl_s if results else self.empty_ttl_s
+        if ttl <= 0:
+            return
+        self._cache[key] = (time.time() + ttl, results)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_items:
+            self._cache.popitem(last=False)
+
+    def _event(self, status: str) -> None:
+        if self.on_result is not None:
+            self.on_result(status)
+
+    def snapshot(self) -> Dict[str, float]:
+        lookups = self.stats["cache_hits"] + self.stats["coalesced"] + self.stats["requests"] - self.stats["retries"]
+        saved = self.stats["cache_hits"] + self.stats["coalesced"]
+        return {**self.stats, "items": len(self._cache), "inflight": len(self._inflight),
+                "hit_ratio": round(saved / lookups, 4) if lookups else 0.0}
@@ -0,0 +1,110 @@
+"""Benchmark fixtures: SearXNG results, page HTML and LLM outputs replayed by bench/servers.py.
+
+A fixture file is one JSON object:
+    {"documents": [llm_output, ...],
+     "searches": {query_key: [{"url", "title", "content", "engine"}, ...]},
+     "pages": {page_id: {"url": original_url, "html": ...}}}
+
+Fixtures are either recorded from a live SearXNG (servers.py --record-upstream)
+or synthesized here from prepare_hover.py pairs, so the whole pipeline can run
+offline and repeatably.
+
+    python bench/fixtures.py --pairs data/processed/hover/reranker_dev.jsonl --out bench/fixture.json
+"""
+import argparse
+import hashlib
+import html
+import json
+import random
+from collections import OrderedDict
+from typing import Any, Dict, List
+
+# Synthetic pages are spread over these domains (trusted and untrusted, see TRUST_BONUS_DOMAINS)
+DOMAINS = ("en.wikipedia.org", "www.britannica.com", "www.reuters.com", "news.example.com",
+           "blog.example.org", "facts.example.net")
+
+
+def query_key(query: str) -> str:
+    return " ".join((query or "").split()).lower()
+
+
+def page_id(url: str) -> str:
+    return hashlib.blake2b(url.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def load(path: str) -> Dict[str, Any]:
+    with open(path, "r", encoding="utf-8") as f:
+        fx = json.load(f)
+    for k in ("documents", "searches", "pages"):
+        fx.setdefault(k, [] if k == "documents" else {})
+    return fx
+
+
+def save(fx: Dict[str, Any], path: str) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(fx, f, ensure_ascii=False)
+
+
+def render_page(title: str, paragraphs: List[str]) -> str:
+    body = "\n".join(f"<p>{html.escape(p)}</p>" for p in paragraphs)
+    return (f"<!doctype html><html><head><title>{html.escape(title)}</title></head>"
+            f"<body><nav>Home | About | Contact</nav><article><h1>{html.escape(title)}</h1>\n{body}\n"
+            f"</article><footer>Copyright notice</footer></body></html>")
+
+
+def synthesize(pairs_path: str, n_docs: int = 200, claims_per_doc: int = 3, filler: int = 4,
+               seed: int = 13) -> Dict[str, Any]:
+    """Documents from HoVer claims; one page per distinct evidence passage, padded with
+    `filler` unrelated paragraphs so recall and rerank have something to discard."""
+    rng = random.Random(seed)
+    evidence: "OrderedDict[str, List[str]]" = OrderedDict()
+    with open(pairs_path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            obj = json.loads(line)
+            claim, passage = obj.get("text1"), obj.get("text2")
+            if not isinstance(claim, str) or not isinstance(passage, str):
+                continue
+            passages = evidence.setdefault(claim.strip(), [])
+            passage = passage.strip()
+            if int(obj.get("label", 0)) == 1 and passage not in passages:
+                passages.append(passage)
+
+    claims = [c for c, ps in evidence.items() if ps]
+    pool = [p for c in claims for p in evidence[c]]
+    if not claims:
+        raise SystemExit(f"No positive pairs in {pairs_path}")
+
+    pages: Dict[str, Dict[str, str]] = {}
+    for i, passage in enumerate(dict.fromkeys(pool)):
+        url = f"https://{DOMAINS[i % len(DOMAINS)]}/article/{i}"
+        paras = rng.sample(pool, min(filler, len(pool))) + [passage]
+        rng.shuffle(paras)
+        pages[page_id(url)] = {"url": url, "html": render_page(passage[:60], paras)}
+
+    documents = []
+    for _ in range(n_docs):
+        picked = rng.sample(claims, min(claims_per_doc, len(claims)))
+        documents.append(" ".join(c.rstrip(".") + "." for c in picked))
+    return {"documents": documents, "searches": {}, "pages": pages}
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Synthesize a benchmark fixture from prepare_hover.py pairs")
+    ap.add_argument("--pairs", required=True, help="prepare_hover.py output (text1/text2/label JSONL)")
+    ap.add_argument("--out", required=True, help="Fixture JSON to write")
+    ap.add_argument("--docs", type=int, default=200, help="LLM outputs to generate")
+    ap.add_argument("--claims-per-doc", type=int, default=3)
+    ap.add_argument("--filler", type=int, default=4, help="Unrelated paragraphs per page")
+    ap.add_argument("--seed", type=int, default=13)
+    args = ap.parse_args()
+
+    fx = synthesize(args.pairs, args.docs, args.claims_per_doc, args.filler, args.seed)
+    save(fx, args.out)
+    print(f"Wrote {len(fx['documents'])} documents, {len(fx['pages'])} pages -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
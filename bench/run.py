@@ -0,0 +1,239 @@
+"""End-to-end load benchmark for /check against the offline fixture servers.
+
+Starts bench/servers.py in-process, optionally spawns the backend pointed at
+them (with persistent caches off, so runs are comparable), drives /check at a
+fixed concurrency and writes latency percentiles, throughput, per-stage time
+and the backend's peak RSS as JSON.
+
+    python bench/run.py --fixture bench/fixture.json --spawn --concurrency 8 --requests 200 \\
+        --out bench/results/baseline.json
+    python bench/run.py ... --out bench/results/onnx.json --env INFERENCE_BACKEND=onnx \\
+        --compare bench/results/baseline.json
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+import fixtures as fx_mod
+from servers import add_server_args, servers_from_args
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend")
+
+# Persistent caches off: every run starts cold (in-memory caches still warm up during the run)
+COLD_ENV = {"PAGE_CACHE_PATH": "", "EMBED_CACHE_PATH": "", "SCORE_CACHE_PATH": "",
+            "CLAIM_CACHE_TTL_S": "0", "SEARX_CACHE_TTL_S": "0", "SEARX_CACHE_EMPTY_TTL_S": "0"}
+
+
+def percentile(sorted_vals: List[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_vals:
+        return 0.0
+    idx = min(len(sorted_vals) - 1, max(0, math.ceil(q / 100.0 * len(sorted_vals)) - 1))
+    return sorted_vals[idx]
+
+
+def peak_rss_mb(pid: int) -> Optional[float]:
+    """VmHWM (peak resident set) of a live process; Linux only."""
+    try:
+        with open(f"/proc/{pid}/status", "r") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024.0, 1)
+    except OSError:
+        return None
+    return None
+
+
+def spawn_backend(port: int, searx_url: str, route_url: str, extra_env: Dict[str, str],
+                  cold: bool) -> subprocess.Popen:
+    env = dict(os.environ, SEARX_URL=searx_url, FETCH_ROUTE_URL=route_url, **(COLD_ENV if cold else {}),
+               **extra_env)
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--host", "127.0.0.1", "--port", str(port)],
+        cwd=os.path.abspath(BACKEND_DIR), env=env,
+    )
+
+
+async def wait_ready(target: str, timeout: float, proc: Optional[subprocess.Popen]) -> None:
+    deadline = time.time() + timeout
+    async with httpx.AsyncClient(timeout=5) as client:
+        while time.time() < deadline:
+            if proc is not None and proc.poll() is not None:
+                raise SystemExit(f"Backend exited with code {proc.returncode}")
+            try:
+                if (await client.get(f"{target}/readyz")).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(1.0)
+    raise SystemExit(f"Backend at {target} not ready after {timeout:.0f}s")
+
+
+async def drive(target: str, docs: List[str], n_requests: int, concurrency: int, timeout: float,
+                debug: bool) -> List[Dict[str, Any]]:
+    """POST /check `n_requests` times (cycling through `docs`) with `concurrency` in flight."""
+    results: List[Dict[str, Any]] = []
+    queue: "asyncio.Queue[int]" = asyncio.Queue()
+    for i in range(n_requests):
+        queue.put_nowait(i)
+
+    async def worker(client: httpx.AsyncClient) -> None:
+        while True:
+            try:
+                i = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            t = time.perf_counter()
+            rec: Dict[str, Any] = {"doc": i % len(docs)}
+            try:
+                r = await client.post(f"{target}/check", json={"llm_output": docs[i % len(docs)], "debug": debug})
+                rec["status"] = r.status_code
+                if r.status_code == 200:
+                    body = r.json()
+                    rec["claims"] = len(body.get("claims", []))
+                    rec["stages"] = body.get("stages", {})
+            except httpx.HTTPError as e:
+                rec["status"] = 0
+                rec["error"] = str(e)
+            rec["latency_s"] = time.perf_counter() - t
+            results.append(rec)
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(timeout=timeout, limits=limits) as client:
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+    return results
+
+
+def summarize(results: List[Dict[str, Any]], wall_s: float) -> Dict[str, Any]:
+    ok = [r for r in results if r.get("status") == 200]
+    lat = sorted(r["latency_s"] for r in ok)
+    stages: Dict[str, float] = defaultdict(float)
+    for r in ok:
+        for k, v in (r.get("stages") or {}).items():
+            stages[k] += v
+    return {
+        "requests": len(results),
+        "ok": len(ok),
+        "errors": len(results) - len(ok),
+        "wall_s": round(wall_s, 3),
+        "throughput_rps": round(len(ok) / wall_s, 3) if wall_s else 0.0,
+        "sub_claims_total": sum(r.get("claims", 0) for r in ok),
+        "latency_s": {
+            "mean": round(sum(lat) / len(lat), 4) if lat else 0.0,
+            "p50": round(percentile(lat, 50), 4),
+            "p95": round(percentile(lat, 95), 4),
+            "p99": round(percentile(lat, 99), 4),
+            "max": round(lat[-1], 4) if lat else 0.0,
+        },
+        # Mean seconds per request spent in each stage (summed over its concurrent sub-claims)
+        "stages_per_request_s": {k: round(v / len(ok), 4) for k, v in sorted(stages.items())} if ok else {},
+    }
+
+
+def compare(current: Dict[str, Any], baseline_path: str) -> None:
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        base = json.load(f)["summary"]
+    cur = current["summary"]
+    rows = [("p50", base["latency_s"]["p50"], cur["latency_s"]["p50"]),
+            ("p95", base["latency_s"]["p95"], cur["latency_s"]["p95"]),
+            ("p99", base["latency_s"]["p99"], cur["latency_s"]["p99"]),
+            ("throughput_rps", base["throughput_rps"], cur["throughput_rps"])]
+    print(f"{'metric':<16}{'baseline':>12}{'current':>12}{'change':>10}")
+    for name, b, c in rows:
+        change = f"{(c - b) / b * 100:+.1f}%" if b else "n/a"
+        print(f"{name:<16}{b:>12.4f}{c:>12.4f}{change:>10}")
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    servers = servers_from_args(args).start()
+    docs = fx_mod.load(args.fixture)["documents"]
+    if args.docs:
+        with open(args.docs, "r", encoding="utf-8") as f:
+            docs = [json.loads(ln).get(args.text_key, "") for ln in f if ln.strip()]
+    docs = [d for d in docs if d]
+    if not docs:
+        raise SystemExit("No documents to send (fixture has none and --docs not given)")
+
+    extra_env = dict(kv.split("=", 1) for kv in args.env)
+    proc = (spawn_backend(args.port, servers.search_url, servers.route_url, extra_env, not args.warm_caches)
+            if args.spawn else None)
+    target = f"http://127.0.0.1:{args.port}" if args.spawn else args.target.rstrip("/")
+    try:
+        t_load = time.perf_counter()
+        await wait_ready(target, args.ready_timeout, proc)
+        load_s = time.perf_counter() - t_load
+        if args.warmup:
+            await drive(target, docs, args.warmup, args.concurrency, args.timeout, debug=False)
+        t0 = time.perf_counter()
+        results = await drive(target, docs, args.requests, args.concurrency, args.timeout, debug=True)
+        wall_s = time.perf_counter() - t0
+        pid = proc.pid if proc is not None else args.pid
+        rss = peak_rss_mb(pid) if pid else None
+    finally:
+        if proc is not None:
+            proc.terminate()
+            try:
+                proc.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+        servers.stop()
+
+    return {
+        "config": {"concurrency": args.concurrency, "requests": args.requests, "warmup": args.warmup,
+                   "documents": len(docs), "fixture": args.fixture, "env": extra_env,
+                   "cold_caches": bool(args.spawn and not args.warm_caches),
+                   "search_latency_ms": args.search_latency_ms, "page_latency_ms": args.page_latency_ms,
+                   "python": platform.python_version(), "machine": platform.machine(),
+                   "cpus": os.cpu_count(), "started_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())},
+        "model_load_s": round(load_s, 2) if args.spawn else None,
+        "peak_rss_mb": rss,
+        "summary": summarize(results, wall_s),
+        "requests": results if args.per_request else None,
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Benchmark /check against recorded fixtures")
+    add_server_args(ap)
+    ap.add_argument("--target", default="http://127.0.0.1:8000", help="Running backend (ignored with --spawn)")
+    ap.add_argument("--spawn", action="store_true",
+                    help="Start the backend with SEARX_URL and FETCH_ROUTE_URL pointing at the fixture")
+    ap.add_argument("--port", type=int, default=8010, help="Port for --spawn")
+    ap.add_argument("--pid", type=int, help="Backend pid for peak RSS when not using --spawn")
+    ap.add_argument("--env", action="append", default=[], help="KEY=VALUE for the spawned backend (repeatable)")
+    ap.add_argument("--warm-caches", action="store_true", help="Keep the backend's persistent caches on")
+    ap.add_argument("--docs", help="JSONL of LLM outputs to send instead of the fixture's documents")
+    ap.add_argument("--text-key", default="llm_output")
+    ap.add_argument("--concurrency", type=int, default=8)
+    ap.add_argument("--requests", type=int, default=100)
+    ap.add_argument("--warmup", type=int, default=5, help="Untimed requests before measuring")
+    ap.add_argument("--timeout", type=float, default=300.0, help="Per-request timeout (s)")
+    ap.add_argument("--ready-timeout", type=float, default=600.0, help="Wait for /readyz (s)")
+    ap.add_argument("--per-request", action="store_true", help="Include every request in the output")
+    ap.add_argument("--out", help="Write the results JSON here")
+    ap.add_argument("--compare", help="Earlier results JSON to print deltas against")
+    args = ap.parse_args()
+
+    report = asyncio.run(run(args))
+    print(json.dumps({k: report[k] for k in ("summary", "peak_rss_mb", "model_load_s")}, indent=2))
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {args.out}")
+    if args.compare:
+        compare(report, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+"""Offline stand-ins for SearXNG and the web, replaying a bench/fixtures.py fixture.
+
+- Search server: `GET /search?q=...&format=json` answers with the recorded hits
+  for that query, or (for queries the fixture never saw) ranks the fixture's
+  pages by word overlap with the query.
+- Page server: `GET /fetch?url=<original url>` serves the recorded HTML. Hits
+  keep their real URLs, so domain trust, distinct-source counting and per-host
+  fetch limits see the same hostnames as in production; the backend routes its
+  downloads here with FETCH_ROUTE_URL (see `RouteTransport` in app.py).
+
+With --record-upstream, unseen queries go to a live SearXNG and the hits'
+pages are downloaded into the fixture, which is written back on exit.
+
+    python bench/servers.py --fixture bench/fixture.json
+    SEARX_URL=http://127.0.0.1:8901/search FETCH_ROUTE_URL=http://127.0.0.1:8902 \\
+        python -m uvicorn app:app --port 8000
+"""
+import argparse
+import json
+import re
+import threading
+import time
+import urllib.parse
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+import fixtures as fx_mod
+
+_TAG_RE = re.compile(r"<[^>]+>")
+_WORD_RE = re.compile(r"\w+")
+
+
+def _words(text: str) -> set:
+    return set(_WORD_RE.findall(text.lower()))
+
+
+class FixtureStore:
+    def __init__(self, path: str, record_upstream: Optional[str] = None):
+        self.path = path
+        self.fx = fx_mod.load(path)
+        self.record_upstream = record_upstream
+        self.dirty = False
+        self._lock = threading.Lock()
+        self._index: List[tuple] = []
+        for pid in self.fx["pages"]:
+            self._index_page(pid)
+
+    def _index_page(self, pid: str) -> None:
+        text = _TAG_RE.sub("\n", self.fx["pages"][pid]["html"])
+        paras = [" ".join(p.split()) for p in text.split("\n") if len(p.split()) >= 5]
+        self._index.append((pid, _words(text), paras))
+
+    def page(self, url: str) -> Optional[str]:
+        entry = self.fx["pages"].get(fx_mod.page_id(url))
+        return entry["html"] if entry else None
+
+    def search(self, query: str) -> List[Dict[str, Any]]:
+        key = fx_mod.query_key(query)
+        hits = self.fx["searches"].get(key)
+        if hits is None and self.record_upstream:
+            hits = self._record(query, key)
+        if hits is None:
+            hits = self._overlap_search(query)
+        return hits
+
+    def _overlap_search(self, query: str, k: int = 10) -> List[Dict[str, Any]]:
+        q = _words(query.replace("site:wikipedia.org", ""))
+        scored = sorted(((len(q & words), pid, paras) for pid, words, paras in self._index if q & words),
+                        key=lambda x: (-x[0], x[1]))[:k]
+        hits = []
+        for _, pid, paras in scored:
+            best = max(paras, key=lambda p: len(q & _words(p)), default="")
+            hits.append({"url": self.fx["pages"][pid]["url"], "title": best[:60],
+                         "content": best[:240], "engine": "fixture"})
+        return hits
+
+    def _record(self, query: str, key: str) -> List[Dict[str, Any]]:
+        params = urllib.parse.urlencode({"q": query, "format": "json", "language": "en"})
+        try:
+            with urllib.request.urlopen(f"{self.record_upstream}?{params}", timeout=20) as r:
+                results = json.loads(r.read().decode("utf-8")).get("results", [])[:10]
+        except Exception as e:
+            print(f"[record] search '{query}' failed: {e}")
+            return []
+        hits = [{k: res.get(k) for k in ("url", "title", "content", "engine")} for res in results if res.get("url")]
+        for h in hits:
+            pid = fx_mod.page_id(h["url"])
+            if pid in self.fx["pages"]:
+                continue
+            try:
+                req = urllib.request.Request(h["url"], headers={"User-Agent": "Mozilla/5.0 (compatible; llm-checker-bench)"})
+                with urllib.request.urlopen(req, timeout=10) as r:
+                    body = r.read().decode("utf-8", errors="replace")
+            except Exception as e:
+                print(f"[record] page {h['url']} failed: {e}")
+                continue  # replayed as a blocked page (403)
+            with self._lock:
+                self.fx["pages"][pid] = {"url": h["url"], "html": body}
+                self._index_page(pid)
+        with self._lock:
+            self.fx["searches"][key] = hits
+            self.dirty = True
+        return hits
+
+    def save(self) -> None:
+        with self._lock:
+            if self.dirty:
+                fx_mod.save(self.fx, self.path)
+                self.dirty = False
+                print(f"[record] saved {len(self.fx['searches'])} searches, {len(self.fx['pages'])} pages")
+
+
+def _handler(store: FixtureStore, kind: str, latency_s: float):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *_args):  # keep the driver's output readable
+            pass
+
+        def _send(self, status: int, body: str, ctype: str) -> None:
+            data = body.encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", ctype)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if latency_s:
+                time.sleep(latency_s)
+            parts = urllib.parse.urlsplit(self.path)
+            if kind == "search" and parts.path == "/search":
+                q = urllib.parse.parse_qs(parts.query).get("q", [""])[0]
+                self._send(200, json.dumps({"query": q, "results": store.search(q)}), "application/json")
+            elif kind == "pages" and parts.path == "/fetch":
+                page = store.page(urllib.parse.parse_qs(parts.query).get("url", [""])[0])
+                if page is None:
+                    self._send(403, "blocked", "text/plain")
+                else:
+                    self._send(200, page, "text/html; charset=utf-8")
+            else:
+                self._send(404, "not found", "text/plain")
+
+    return Handler
+
+
+class FixtureServers:
+    """Search server on 127.0.0.1:search_port, page server on 127.0.0.1:page_port."""
+
+    def __init__(self, fixture: str, search_port: int = 8901, page_port: int = 8902,
+                 record_upstream: Optional[str] = None, search_latency_ms: float = 0.0,
+                 page_latency_ms: float = 0.0):
+        self.store = FixtureStore(fixture, record_upstream)
+        self._servers = [
+            ThreadingHTTPServer(("127.0.0.1", search_port), _handler(self.store, "search", search_latency_ms / 1000.0)),
+            ThreadingHTTPServer(("127.0.0.1", page_port), _handler(self.store, "pages", page_latency_ms / 1000.0)),
+        ]
+        for srv in self._servers:
+            srv.daemon_threads = True
+        self.search_url = f"http://127.0.0.1:{search_port}/search"
+        self.route_url = f"http://127.0.0.1:{page_port}"  # FETCH_ROUTE_URL for the backend
+
+    def start(self) -> "FixtureServers":
+        for srv in self._servers:
+            threading.Thread(target=srv.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        for srv in self._servers:
+            srv.shutdown()
+            srv.server_close()
+        self.store.save()
+
+
+def add_server_args(ap: argparse.ArgumentParser) -> None:
+    ap.add_argument("--fixture", required=True, help="Fixture JSON (bench/fixtures.py)")
+    ap.add_argument("--search-port", type=int, default=8901)
+    ap.add_argument("--page-port", type=int, default=8902)
+    ap.add_argument("--search-latency-ms", type=float, default=0.0, help="Simulated search latency")
+    ap.add_argument("--page-latency-ms", type=float, default=0.0, help="Simulated page download latency")
+    ap.add_argument("--record-upstream", help="Live SearXNG /search URL to record unseen queries from")
+
+
+def servers_from_args(args: argparse.Namespace) -> FixtureServers:
+    return FixtureServers(args.fixture, args.search_port, args.page_port, args.record_upstream,
+                          args.search_latency_ms, args.page_latency_ms)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Serve a benchmark fixture as SearXNG + web stand-ins")
+    add_server_args(ap)
+    args = ap.parse_args()
+    servers = servers_from_args(args).start()
+    print(f"SEARX_URL={servers.search_url} FETCH_ROUTE_URL={servers.route_url}  (Ctrl-C to stop)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servers.stop()
+
+
+if __name__ == "__main__":
+    main()
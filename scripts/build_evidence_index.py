@@ -0,0 +1,81 @@
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from typing import Any, Dict, Iterable, Set
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend")
+sys.path.insert(0, os.path.abspath(BACKEND_DIR))
+
+from evidence_index import ANN_KINDS, build_index  # noqa: E402
+
+# Same id as EMBEDDER_ID in backend/app.py; the backend refuses an index built with another embedder
+EMBEDDER_ID = "sentence-transformers/all-MiniLM-L6-v2"
+
+
+def iter_passages(path: str, text_key: str, title_key: str, url_key: str, min_words: int,
+                  split: bool, dedup: bool, limit: int) -> Iterable[Dict[str, Any]]:
+    """Paragraph records from a JSONL dump; `split` breaks article text on newlines."""
+    seen: Set[bytes] = set()
+    emitted = 0
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            rec = json.loads(line)
+            text = rec.get(text_key)
+            if not isinstance(text, str):
+                continue
+            paras = text.split("\n") if split else [text]
+            for para in paras:
+                if len(para.split()) < min_words:
+                    continue
+                if dedup:
+                    h = hashlib.blake2b(" ".join(para.split()).encode("utf-8"), digest_size=12).digest()
+                    if h in seen:
+                        continue
+                    seen.add(h)
+                yield {"text": para, "title": rec.get(title_key) or "", "url": rec.get(url_key) or ""}
+                emitted += 1
+                if limit and emitted >= limit:
+                    return
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Build the local evidence index served by the backend")
+    ap.add_argument("--in", dest="in_path", required=True, help="JSONL corpus, one article or paragraph per line")
+    ap.add_argument("--out", dest="out_dir", required=True, help="Index directory (EVIDENCE_INDEX_DIR)")
+    ap.add_argument("--text-key", default="text", help="Field holding the paragraph/article text")
+    ap.add_argument("--title-key", default="title", help="Article title (used for Wikipedia URLs)")
+    ap.add_argument("--url-key", default="url", help="Source URL, if the dump has one")
+    ap.add_argument("--split-paragraphs", action="store_true", help="Split article text on newlines")
+    ap.add_argument("--min-words", type=int, default=8, help="Skip shorter paragraphs (PARA_MIN_WORDS)")
+    ap.add_argument("--dedup", action="store_true", help="Drop repeated paragraphs (e.g. prepare_hover.py text2)")
+    ap.add_argument("--limit", type=int, default=0, help="Stop after this many paragraphs (0 = all)")
+    ap.add_argument("--batch-size", type=int, default=256, help="Paragraphs embedded per batch")
+    ap.add_argument("--ann", default="auto", choices=ANN_KINDS, help="ANN library (auto = faiss, hnswlib, none)")
+    ap.add_argument("--embedder", default=EMBEDDER_ID, help="Sentence-transformers model id")
+    args = ap.parse_args()
+
+    from sentence_transformers import SentenceTransformer
+
+    model = SentenceTransformer(args.embedder)
+    t0 = time.time()
+    meta = build_index(
+        iter_passages(args.in_path, args.text_key, args.title_key, args.url_key, args.min_words,
+                      args.split_paragraphs, args.dedup, args.limit),
+        args.out_dir,
+        encode=lambda texts: model.encode(texts, batch_size=args.batch_size, convert_to_numpy=True),
+        embedder_id=args.embedder,
+        batch_size=args.batch_size,
+        ann=args.ann,
+    )
+    print(f"Indexed {meta['count']} paragraphs ({meta['terms']} terms, ann={meta['ann']}) "
+          f"in {time.time() - t0:.1f}s -> {args.out_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from typing import Any, Dict, Iterable, Set, Tuple
+
+# The pipeline lives in backend/app.py, which is run from inside backend/
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend")
+sys.path.insert(0, os.path.abspath(BACKEND_DIR))
+
+
+def done_ids(out_path: str, retry_errors: bool = False) -> Set[str]:
+    """Ids already present in an existing output file (the resume checkpoint).
+
+    Records that came back with an error count as done unless `retry_errors`;
+    then their lines are dropped from `out_path` so the retried result is the
+    only one left for that id.
+    """
+    seen: Set[str] = set()
+    if not os.path.exists(out_path):
+        return seen
+    keep = []
+    with open(out_path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                obj = json.loads(line)
+            except ValueError:
+                continue  # partially written last line from an interrupted run
+            if not isinstance(obj, dict) or "id" not in obj:
+                continue
+            if retry_errors and "error" in obj:
+                continue
+            seen.add(str(obj["id"]))
+            keep.append(line)
+    if retry_errors:
+        tmp = out_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.writelines(line + "\n" for line in keep)
+        os.replace(tmp, out_path)
+    return seen
+
+
+def iter_records(in_path: str, skip: Set[str], record_id) -> Iterable[Tuple[Any, Dict[str, Any]]]:
+    # Records are numbered like POST /check/batch numbers them: blank and
+    # non-object lines do not count
+    n = 0
+    with open(in_path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            rec = json.loads(line)
+            if not isinstance(rec, dict):
+                continue
+            rid = record_id(rec, n)
+            n += 1
+            if str(rid) in skip:
+                continue
+            yield rid, rec
+
+
+async def run(args: argparse.Namespace) -> Tuple[int, int]:
+    import app as pipeline  # heavy: loads the models
+
+    skip = done_ids(args.out_path, args.retry_errors) if args.resume else set()
+    if skip:
+        print(f"Resuming: {len(skip)} records already in {args.out_path}")
+
+    written = errors = 0
+    await pipeline.app.router.startup()
+    try:
+        if not await pipeline.wait_until_ready():
+            raise SystemExit(f"Models failed to load: {pipeline.model_status}")
+        with open(args.out_path, "a" if args.resume else "w", encoding="utf-8") as out_f:
+            records = iter_records(args.in_path, skip, pipeline.record_id)
+            async for out in pipeline.check_records(
+                records,
+                want_debug=args.debug,
+                use_cache=not args.no_cache,
+                concurrency=args.concurrency,
+                text_key=args.text_key,
+                budget_overrides={k: v for k, v in (("deadline_s", args.deadline_s), ("max_urls", args.max_urls),
+                                                    ("max_nli_pairs", args.max_nli_pairs)) if v is not None},
+            ):
+                out_f.write(json.dumps(out, ensure_ascii=False) + "\n")
+                out_f.flush()  # every line is a checkpoint for --resume
+                written += 1
+                errors += "error" in out
+                if written % 100 == 0:
+                    print(f"  {written} records checked")
+    finally:
+        await pipeline.app.router.shutdown()
+    return written, errors
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Fact-check a JSONL file of LLM outputs offline")
+    ap.add_argument("--in", dest="in_path", required=True, help="Input .jsonl with one record per line")
+    ap.add_argument("--out", dest="out_path", required=True, help="Output .jsonl of /check results")
+    ap.add_argument("--text-key", default="llm_output", help="Record field holding the LLM output")
+    ap.add_argument("--concurrency", type=int, default=16, help="Documents checked concurrently")
+    ap.add_argument("--resume", action="store_true", help="Skip ids already in --out and append to it")
+    ap.add_argument("--retry-errors", action="store_true",
+                    help="With --resume, check again the ids whose earlier result was an error")
+    ap.add_argument("--debug", action="store_true", help="Include per-sub-claim debug info")
+    ap.add_argument("--no-cache", action="store_true", help="Do not reuse cached claim verdicts")
+    ap.add_argument("--deadline-s", type=float, help="Per-document deadline (default: none)")
+    ap.add_argument("--max-urls", type=int, help="Pages downloaded per document (default: no limit)")
+    ap.add_argument("--max-nli-pairs", type=int, help="NLI pairs per document (default: no limit)")
+    args = ap.parse_args()
+
+    t0 = time.time()
+    written, errors = asyncio.run(run(args))
+    print(f"Checked records={written} errors={errors} in {time.time() - t0:.1f}s -> {args.out_path}")
+
+
+if __name__ == "__main__":
+    main()
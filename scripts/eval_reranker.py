@@ -0,0 +1,292 @@
+import argparse
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend")
+# hover_loader is imported directly: a `datasets` package on the path would shadow Hugging Face datasets
+sys.path.insert(0, os.path.join(os.path.abspath(BACKEND_DIR), "datasets"))
+sys.path.insert(0, os.path.abspath(BACKEND_DIR))
+
+from hover_loader import PairsFile  # noqa: E402
+
+# Same default as RERANKER_ID in backend/app.py
+RERANKER_ID = os.getenv("RERANKER_ID", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+LOCAL_RERANKER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "models", "reranker")
+# Two-layer MS MARCO cross-encoder; a reasonable first student
+STUDENT_ID = "cross-encoder/ms-marco-TinyBERT-L-2-v2"
+
+
+def default_models() -> List[str]:
+    return [RERANKER_ID] + ([os.path.normpath(LOCAL_RERANKER)] if os.path.isdir(LOCAL_RERANKER) else [])
+
+
+def load_reranker(spec: str, max_length: int):
+    """CPU reranker with a CrossEncoder-style `predict`; ONNX dirs (scripts/export_onnx.py) use onnxruntime."""
+    if os.path.isfile(os.path.join(spec, "model.onnx")):
+        from onnx_backend import OnnxCrossEncoder
+
+        return OnnxCrossEncoder(spec, max_length=max_length)
+    from sentence_transformers import CrossEncoder
+
+    return CrossEncoder(spec, device="cpu", max_length=max_length)
+
+
+# ---------------- quality ----------------
+
+def group_by_claim(text1: Sequence[str]) -> List[np.ndarray]:
+    groups: Dict[str, List[int]] = defaultdict(list)
+    for i, claim in enumerate(text1):
+        groups[claim].append(i)
+    return [np.asarray(rows) for rows in groups.values()]
+
+
+def ranking_metrics(scores: np.ndarray, labels: np.ndarray, groups: List[np.ndarray], k: int,
+                    threshold: float) -> Dict[str, float]:
+    """MRR and nDCG@k over claims with both a positive and a negative passage; pair accuracy at `threshold`."""
+    rr: List[float] = []
+    ndcg: List[float] = []
+    for rows in groups:
+        rel = labels[rows]
+        if rel.min() == rel.max():
+            continue
+        order = np.lexsort((rel, -scores[rows]))  # ties rank negatives first (no credit for file order)
+        ranked = rel[order]
+        rr.append(1.0 / (1 + int(np.argmax(ranked > 0))))
+        discounts = 1.0 / np.log2(np.arange(2, min(k, len(rows)) + 2))
+        ideal = float(discounts[:int(rel.sum())].sum())
+        ndcg.append(float((ranked[:k] * discounts).sum()) / ideal)
+    return {
+        "queries": len(rr),
+        "mrr": round(float(np.mean(rr)), 4) if rr else 0.0,
+        f"ndcg@{k}": round(float(np.mean(ndcg)), 4) if ndcg else 0.0,
+        "accuracy": round(float(np.mean((scores >= threshold) == (labels > 0))), 4) if len(labels) else 0.0,
+    }
+
+
+# ---------------- speed ----------------
+
+def speed_profile(model, pairs: List[Tuple[str, str]], batch_sizes: Sequence[int], repeats: int) -> Dict[str, Any]:
+    """Pairs/sec and per-call latency when `pairs` are scored in calls of each batch size."""
+    model.predict(pairs[:max(batch_sizes)], batch_size=max(batch_sizes))  # warm-up
+    out: Dict[str, Any] = {}
+    for bs in batch_sizes:
+        latencies: List[float] = []
+        t0 = time.perf_counter()
+        for _ in range(repeats):
+            for i in range(0, len(pairs), bs):
+                t = time.perf_counter()
+                model.predict(pairs[i:i + bs], batch_size=bs)
+                latencies.append(time.perf_counter() - t)
+        total = time.perf_counter() - t0
+        lat = np.asarray(latencies) * 1000.0
+        out[str(bs)] = {
+            "pairs_per_s": round(repeats * len(pairs) / total, 1),
+            "latency_ms_mean": round(float(lat.mean()), 2),
+            "latency_ms_p50": round(float(np.percentile(lat, 50)), 2),
+            "latency_ms_p95": round(float(np.percentile(lat, 95)), 2),
+        }
+    return out
+
+
+def evaluate(spec: str, pairs: PairsFile, args: argparse.Namespace) -> Dict[str, Any]:
+    t_load = time.perf_counter()
+    model = load_reranker(spec, args.max_length)
+    load_s = time.perf_counter() - t_load
+
+    cols = pairs.columns()
+    inputs, labels = cols.crossencoder_inputs()
+    t_score = time.perf_counter()
+    scores = np.asarray(model.predict(inputs, batch_size=args.score_batch_size), dtype=np.float64).reshape(-1)
+    score_s = time.perf_counter() - t_score
+
+    report: Dict[str, Any] = {"model": spec, "pairs": len(inputs), "load_s": round(load_s, 2),
+                              "score_s": round(score_s, 2)}
+    report.update(ranking_metrics(scores, labels, group_by_claim(cols.text1), args.k, args.threshold))
+    if args.speed_pairs:
+        report["speed"] = speed_profile(model, inputs[:args.speed_pairs], args.batch_sizes, args.repeats)
+    return report
+
+
+def print_table(reports: List[Dict[str, Any]], k: int, ref_bs: int) -> None:
+    print(f"{'model':<48}{'MRR':>8}{f'nDCG@{k}':>9}{'acc':>8}{f'pairs/s@{ref_bs}':>14}{'p95 ms':>9}")
+    for r in reports:
+        sp = r.get("speed", {}).get(str(ref_bs), {})
+        print(f"{r['model'][-48:]:<48}{r['mrr']:>8.4f}{r[f'ndcg@{k}']:>9.4f}{r['accuracy']:>8.4f}"
+              f"{sp.get('pairs_per_s', 0.0):>14.1f}{sp.get('latency_ms_p95', 0.0):>9.2f}")
+
+
+def pick_fastest(reports: List[Dict[str, Any]], min_mrr: float, ref_bs: int) -> Optional[Dict[str, Any]]:
+    ok = [r for r in reports if r["mrr"] >= min_mrr and str(ref_bs) in r.get("speed", {})]
+    return max(ok, key=lambda r: r["speed"][str(ref_bs)]["pairs_per_s"], default=None)
+
+
+def run_eval(args: argparse.Namespace) -> None:
+    import torch
+
+    torch.set_num_threads(args.threads or torch.get_num_threads())
+    pairs = PairsFile(args.pairs)
+    if args.limit:
+        pairs = pairs.select(slice(0, args.limit))
+    reports = []
+    for spec in args.model or default_models():
+        print(f"Evaluating {spec} on {len(pairs)} pairs")
+        reports.append(evaluate(spec, pairs, args))
+    print_table(reports, args.k, args.ref_batch_size)
+
+    result: Dict[str, Any] = {"pairs_file": args.pairs, "threads": torch.get_num_threads(), "reports": reports}
+    if args.min_mrr is not None:
+        best = pick_fastest(reports, args.min_mrr, args.ref_batch_size)
+        result["recommended"] = best["model"] if best else None
+        print(f"Fastest with MRR >= {args.min_mrr}: {best['model'] if best else 'none'}")
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+        print(f"Wrote {args.out}")
+
+
+# ---------------- distillation ----------------
+
+def teacher_logits(model_id: str, pairs: PairsFile, batch_size: int, max_length: int) -> np.ndarray:
+    """Raw (pre-sigmoid) teacher scores for every row of `pairs`."""
+    import torch
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+    tok = AutoTokenizer.from_pretrained(model_id)
+    model = AutoModelForSequenceClassification.from_pretrained(model_id).eval()
+    out = np.empty(len(pairs), dtype=np.float32)
+    lo = 0
+    for batch in pairs.iter_batches(batch_size):
+        enc = tok(batch.text1.tolist(), batch.text2.tolist(), padding=True, truncation=True,
+                  max_length=max_length, return_tensors="pt")
+        with torch.no_grad():
+            out[lo:lo + len(batch.labels)] = model(**enc).logits[:, 0].numpy()
+        lo += len(batch.labels)
+        print(f"\r[teacher] {lo}/{len(pairs)}", end="", flush=True)
+    print()
+    return out
+
+
+def run_distill(args: argparse.Namespace) -> None:
+    """Train `--student` to match the teacher's logits (MSE), optionally mixed with the gold labels (BCE)."""
+    import torch
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer, get_linear_schedule_with_warmup
+
+    torch.set_num_threads(args.threads or torch.get_num_threads())
+    torch.manual_seed(args.seed)
+    train = PairsFile(args.pairs)
+    if args.limit:
+        train = train.select(slice(0, args.limit))
+
+    if args.teacher_scores and os.path.exists(args.teacher_scores):
+        targets = np.load(args.teacher_scores)
+        if len(targets) != len(train):
+            raise SystemExit(f"{args.teacher_scores} has {len(targets)} scores for {len(train)} pairs")
+    else:
+        print(f"Scoring {len(train)} pairs with teacher {args.teacher}")
+        targets = teacher_logits(args.teacher, train, args.score_batch_size, args.max_length)
+        if args.teacher_scores:
+            np.save(args.teacher_scores, targets)
+
+    tok = AutoTokenizer.from_pretrained(args.student)
+    student = AutoModelForSequenceClassification.from_pretrained(args.student, num_labels=1,
+                                                                 ignore_mismatched_sizes=True)
+    student.train()
+    steps = args.epochs * -(-len(train) // args.train_batch_size)
+    opt = torch.optim.AdamW(student.parameters(), lr=args.lr, weight_decay=0.01)
+    sched = get_linear_schedule_with_warmup(opt, int(steps * args.warmup), steps)
+    mse, bce = torch.nn.MSELoss(), torch.nn.BCEWithLogitsLoss()
+    labels_all = train.labels
+
+    step = 0
+    for epoch in range(args.epochs):
+        order = np.random.default_rng(args.seed + epoch).permutation(len(train))
+        for lo in range(0, len(order), args.train_batch_size):
+            rows = order[lo:lo + args.train_batch_size]
+            batch = train.columns(rows)
+            enc = tok(batch.text1.tolist(), batch.text2.tolist(), padding=True, truncation=True,
+                      max_length=args.max_length, return_tensors="pt")
+            logits = student(**enc).logits[:, 0]
+            loss = mse(logits, torch.from_numpy(targets[rows]))
+            if args.label_weight:
+                loss = (1 - args.label_weight) * loss + args.label_weight * bce(
+                    logits, torch.from_numpy(labels_all[rows]))
+            loss.backward()
+            torch.nn.utils.clip_grad_norm_(student.parameters(), 1.0)
+            opt.step()
+            sched.step()
+            opt.zero_grad()
+            step += 1
+            if step % 50 == 0 or step == steps:
+                print(f"[distill] epoch {epoch + 1} step {step}/{steps} loss={loss.item():.4f}")
+
+    os.makedirs(args.out_dir, exist_ok=True)
+    student.save_pretrained(args.out_dir)
+    tok.save_pretrained(args.out_dir)
+    print(f"Saved student to {args.out_dir}")
+
+    if args.eval_pairs:
+        args.pairs, args.limit, args.out = args.eval_pairs, args.eval_limit, args.report
+        args.model = [args.teacher, args.out_dir]
+        run_eval(args)
+
+
+def add_eval_args(ap: argparse.ArgumentParser) -> None:
+    ap.add_argument("--k", type=int, default=10, help="nDCG cutoff")
+    ap.add_argument("--threshold", type=float, default=0.5, help="Score counted as 'relevant' for accuracy")
+    ap.add_argument("--batch-sizes", type=lambda s: [int(x) for x in s.split(",")], default=[1, 8, 32, 64],
+                    help="Comma-separated batch sizes for the speed profile")
+    ap.add_argument("--ref-batch-size", type=int, default=32, help="Batch size compared in the table (BATCH_MAX_SIZE)")
+    ap.add_argument("--speed-pairs", type=int, default=512, help="Pairs per speed run (0 = skip speed)")
+    ap.add_argument("--repeats", type=int, default=1, help="Passes over the speed pairs per batch size")
+    ap.add_argument("--min-mrr", type=float, help="Quality bar: report the fastest model meeting it")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="CPU evaluation and distillation of cross-encoder rerankers")
+    ap.add_argument("--threads", type=int, default=0, help="torch threads (0 = torch default)")
+    ap.add_argument("--max-length", type=int, default=512, help="Tokenizer truncation length")
+    ap.add_argument("--score-batch-size", type=int, default=64, help="Batch size for full-set scoring")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    ev = sub.add_parser("eval", help="Ranking quality and throughput of one or more rerankers")
+    ev.add_argument("--pairs", required=True, help="prepare_hover.py JSONL (text1/text2/label)")
+    ev.add_argument("--model", action="append",
+                    help="Hub id, local dir or ONNX export dir (repeatable; default: RERANKER_ID and models/reranker)")
+    ev.add_argument("--limit", type=int, default=0, help="Use the first N pairs (0 = all)")
+    ev.add_argument("--out", help="Write the report JSON here")
+    add_eval_args(ev)
+
+    ds = sub.add_parser("distill", help="Train a small student from a teacher reranker's scores")
+    ds.add_argument("--pairs", required=True, help="Training pairs (prepare_hover.py JSONL)")
+    ds.add_argument("--teacher", default=RERANKER_ID, help="Teacher model id or dir")
+    ds.add_argument("--student", default=STUDENT_ID, help="Student initialization (hub id or dir)")
+    ds.add_argument("--out-dir", default=os.path.normpath(LOCAL_RERANKER + "-student"), help="Where to save the student")
+    ds.add_argument("--teacher-scores", help="Cache teacher logits in this .npy (reused when present)")
+    ds.add_argument("--limit", type=int, default=0, help="Train on the first N pairs (0 = all)")
+    ds.add_argument("--epochs", type=int, default=1)
+    ds.add_argument("--train-batch-size", type=int, default=32)
+    ds.add_argument("--lr", type=float, default=7e-5)
+    ds.add_argument("--warmup", type=float, default=0.1, help="Warm-up fraction of steps")
+    ds.add_argument("--label-weight", type=float, default=0.0, help="Weight of the gold-label BCE term (0-1)")
+    ds.add_argument("--seed", type=int, default=42)
+    ds.add_argument("--eval-pairs", help="Dev pairs: compare teacher and student after training")
+    ds.add_argument("--eval-limit", type=int, default=0)
+    ds.add_argument("--report", help="Write the post-training comparison JSON here")
+    add_eval_args(ds)
+    args = ap.parse_args()
+
+    if args.cmd == "eval":
+        run_eval(args)
+    else:
+        run_distill(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+import argparse
+import json
+import os
+import sys
+import time
+from typing import List, Tuple
+
+import numpy as np
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend")
+sys.path.insert(0, os.path.abspath(BACKEND_DIR))
+
+from onnx_backend import (  # noqa: E402
+    OnnxClassifier,
+    OnnxCrossEncoder,
+    OnnxEmbedder,
+    export_model,
+    model_dir,
+    softmax,
+)
+
+# Same ids (and RERANKER_ID override) as backend/app.py
+MODELS = {
+    "embed": "sentence-transformers/all-MiniLM-L6-v2",
+    "rerank": os.getenv("RERANKER_ID", "cross-encoder/ms-marco-MiniLM-L-6-v2"),
+    "nli": "MoritzLaurer/deberta-v3-base-mnli-fever-anli",
+}
+
+SAMPLE_PAIRS: List[Tuple[str, str]] = [
+    ("The Eiffel Tower is in Paris", "The Eiffel Tower is a wrought-iron lattice tower in Paris, France."),
+    ("The Eiffel Tower is in Rome", "The Eiffel Tower is a wrought-iron lattice tower in Paris, France."),
+    ("Water boils at 100 degrees Celsius at sea level",
+     "At standard atmospheric pressure, the boiling point of water is 100 °C."),
+    ("Albert Einstein was born in 1879", "Einstein was born in Ulm in the Kingdom of Württemberg on 14 March 1879."),
+    ("Albert Einstein was born in 1905", "In 1905, his annus mirabilis, Einstein published four groundbreaking papers."),
+    ("The Amazon is the longest river", "The Nile is generally regarded as the longest river in the world."),
+]
+
+
+def load_pairs(path: str, limit: int) -> List[Tuple[str, str]]:
+    """(text1, text2) pairs from a prepare_hover.py JSONL file."""
+    out: List[Tuple[str, str]] = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            obj = json.loads(line)
+            if isinstance(obj.get("text1"), str) and isinstance(obj.get("text2"), str):
+                out.append((obj["text1"], obj["text2"]))
+            if len(out) >= limit:
+                break
+    return out
+
+
+def timed(fn, *args):
+    """(fn(*args), seconds) after one untimed warm-up call, so only inference is measured."""
+    fn(*args)
+    t = time.perf_counter()
+    out = fn(*args)
+    return out, time.perf_counter() - t
+
+
+def check_parity(kind: str, model_id: str, path_dir: str, pairs: List[Tuple[str, str]]) -> dict:
+    """Compare ONNX outputs with the torch models app.py would otherwise use.
+
+    Both models are loaded before timing; `torch_s` / `onnx_s` cover one warm
+    forward pass over `pairs` each.
+    """
+    import torch
+
+    if kind == "embed":
+        from sentence_transformers import SentenceTransformer
+
+        texts = [t for pair in pairs for t in pair]
+        ref_model, onnx_model = SentenceTransformer(model_id), OnnxEmbedder(path_dir)
+        ref, t_ref = timed(lambda x: ref_model.encode(x, convert_to_numpy=True), texts)
+        got, t_got = timed(onnx_model.encode, texts)
+        cos = (ref * got).sum(axis=1) / (np.linalg.norm(ref, axis=1) * np.linalg.norm(got, axis=1))
+        return {"min_cosine": float(cos.min()), "mean_cosine": float(cos.mean()),
+                "torch_s": round(t_ref, 3), "onnx_s": round(t_got, 3)}
+
+    if kind == "rerank":
+        from sentence_transformers import CrossEncoder
+
+        ref_model, onnx_model = CrossEncoder(model_id), OnnxCrossEncoder(path_dir)
+        ref, t_ref = timed(lambda x: np.asarray(ref_model.predict(x)), pairs)
+        got, t_got = timed(onnx_model.predict, pairs)
+        # Ranking is what the pipeline uses: compare order as well as values
+        rank_agree = float(np.mean(np.argsort(-ref) == np.argsort(-got)))
+        return {"max_abs_diff": float(np.abs(ref - got).max()), "rank_agreement": rank_agree,
+                "torch_s": round(t_ref, 3), "onnx_s": round(t_got, 3)}
+
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+    tok = AutoTokenizer.from_pretrained(model_id)
+    model = AutoModelForSequenceClassification.from_pretrained(model_id).eval()
+    onnx_model = OnnxClassifier(path_dir)
+    enc = tok([a for a, _ in pairs], [b for _, b in pairs], padding=True, truncation=True,
+              max_length=512, return_tensors="np")
+
+    def torch_probs(e):
+        with torch.no_grad():
+            logits = model(**{k: torch.from_numpy(v) for k, v in e.items()}).logits
+        return torch.softmax(logits, dim=-1).numpy()
+
+    ref, t_ref = timed(torch_probs, enc)
+    got, t_got = timed(lambda e: softmax(onnx_model.logits(e)), enc)
+    return {"max_abs_diff": float(np.abs(ref - got).max()),
+            "label_agreement": float(np.mean(ref.argmax(-1) == got.argmax(-1))),
+            "torch_s": round(t_ref, 3), "onnx_s": round(t_got, 3)}
+
+
+def passes(kind: str, report: dict, tol: float) -> bool:
+    if kind == "embed":
+        return report["min_cosine"] >= 1.0 - tol
+    if kind == "rerank":
+        return report["rank_agreement"] >= 1.0 - tol * 10
+    return report["label_agreement"] >= 1.0 - tol * 10
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Export the backend models to ONNX and check parity with torch")
+    ap.add_argument("--out-dir", default=os.path.join(os.path.abspath(BACKEND_DIR), ".cache", "onnx"),
+                    help="Root directory (same as ONNX_DIR in the backend)")
+    ap.add_argument("--models", default="embed,rerank,nli", help="Comma-separated subset of embed,rerank,nli")
+    ap.add_argument("--quantize", action="store_true", help="Apply dynamic int8 quantization")
+    ap.add_argument("--skip-export", action="store_true", help="Only run the parity check")
+    ap.add_argument("--pairs", help="Optional prepare_hover.py JSONL to use as parity inputs")
+    ap.add_argument("--limit", type=int, default=64, help="Max pairs read from --pairs")
+    ap.add_argument("--tol", type=float, default=0.01, help="Parity tolerance")
+    args = ap.parse_args()
+
+    pairs = load_pairs(args.pairs, args.limit) if args.pairs else SAMPLE_PAIRS
+    failed = []
+    for kind in [k.strip() for k in args.models.split(",") if k.strip()]:
+        model_id = MODELS[kind]
+        path_dir = model_dir(args.out_dir, model_id, args.quantize)
+        if not args.skip_export:
+            print(f"Exporting {kind}: {model_id} -> {path_dir}")
+            export_model(model_id, kind, path_dir, quantize=args.quantize)
+        report = check_parity(kind, model_id, path_dir, pairs)
+        ok = passes(kind, report, args.tol)
+        print(f"{kind}: {'OK' if ok else 'FAIL'} {json.dumps(report)}")
+        if not ok:
+            failed.append(kind)
+    if failed:
+        raise SystemExit(f"Parity check failed for: {', '.join(failed)}")
+
+
+if __name__ == "__main__":
+    main()
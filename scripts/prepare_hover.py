@@ -1,7 +1,14 @@
 import argparse
+import hashlib
 import json
+import mmap
+import multiprocessing
+import os
 import random
-from typing import Any, Dict, Iterable, List, Tuple
+import shutil
+import tempfile
+from array import array
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
 
 try:
     # Optional: only needed when using --hf-dataset
@@ -10,15 +17,6 @@ except Exception:  # pragma: no cover
     load_dataset = None  # lazy import guard
 
 
-def iter_jsonl(path: str) -> Iterable[Dict[str, Any]]:
-    with open(path, "r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            yield json.loads(line)
-
-
 def extract_texts(item_val: Any) -> List[str]:
     """Extract list of passage texts from a field that may be:
     - list[str]
@@ -53,6 +51,197 @@ def extract_texts(item_val: Any) -> List[str]:
     return []
 
 
+class EvidencePool:
+    """De-duplicated evidence passages in one on-disk blob, addressed by integer id.
+
+    Only a 16-byte digest per distinct passage and an offsets array stay in
+    memory; passage text is read back through mmap when it is sampled.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._blob = open(path, "wb")
+        self._offsets = array("q", [0])
+        self._ids: Dict[bytes, int] = {}
+        self._mm: Optional[mmap.mmap] = None
+
+    @staticmethod
+    def _key(text: str) -> bytes:
+        return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+    def add(self, text: str) -> int:
+        key = self._key(text)
+        pid = self._ids.get(key)
+        if pid is None:
+            pid = self._ids[key] = len(self._offsets) - 1
+            data = text.encode("utf-8")
+            self._blob.write(data)
+            self._offsets.append(self._offsets[-1] + len(data))
+        return pid
+
+    def id_of(self, text: str) -> Optional[int]:
+        return self._ids.get(self._key(text))
+
+    def finish(self) -> None:
+        """Stop adding; open the blob for reading."""
+        self._blob.close()
+        if self._offsets[-1]:
+            with open(self.path, "rb") as f:
+                self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def text(self, pid: int) -> str:
+        return self._mm[self._offsets[pid]:self._offsets[pid + 1]].decode("utf-8")
+
+    def close(self) -> None:
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+
+
+def sample_negatives(n: int, exclude: Sequence[int], k: int, rng: random.Random) -> List[int]:
+    """`k` distinct ids from range(n) not in `exclude`, by rejection sampling (no pool copy)."""
+    seen = set(exclude)
+    k = min(k, n - len(seen))
+    picked: List[int] = []
+    tries = 0
+    while len(picked) < k and tries < 20 * k + 100:
+        tries += 1
+        i = rng.randrange(n)
+        if i not in seen:
+            seen.add(i)
+            picked.append(i)
+    if len(picked) < k:  # tiny pools that are mostly excluded
+        picked.extend([i for i in range(n) if i not in seen][:k - len(picked)])
+    return picked
+
+
+def local_item(obj: Dict[str, Any], claim_key: str, pos_key: str, neg_key: str
+               ) -> Optional[Tuple[str, List[str], List[str]]]:
+    """(claim, positives, negatives) from one local JSONL record, or None without a claim."""
+    claim = obj.get(claim_key)
+    if not isinstance(claim, str) or not claim.strip():
+        for alt in ("query", "question", "claim_text"):
+            if isinstance(obj.get(alt), str) and obj[alt].strip():
+                claim = obj[alt]
+                break
+    if not isinstance(claim, str) or not claim.strip():
+        return None
+
+    pos = extract_texts(obj.get(pos_key))
+    neg = extract_texts(obj.get(neg_key))
+
+    if not pos:
+        pos = extract_texts(obj.get("positives")) or extract_texts(obj.get("evidence"))
+    if not neg:
+        neg = extract_texts(obj.get("negatives")) or extract_texts(obj.get("distractors"))
+    return claim.strip(), pos, neg
+
+
+def iter_local(in_path: str, keys: Tuple[str, str, str], start: int = 0, stop: Optional[int] = None,
+               offset: int = 0) -> Iterator[Tuple[int, Optional[Tuple[str, List[str], List[str]]]]]:
+    """(record index, item) for non-empty lines [start, stop); `offset` is the byte offset of `start`."""
+    with open(in_path, "rb") as f:
+        f.seek(offset)
+        idx = start
+        for raw in f:
+            if stop is not None and idx >= stop:
+                return
+            line = raw.strip()
+            if not line:
+                continue
+            yield idx, local_item(json.loads(line), *keys)
+            idx += 1
+
+
+def iter_hf(ds: Any, claim_key: str, evidence_key: str, start: int = 0, stop: Optional[int] = None,
+            batch_size: int = 1000) -> Iterator[Tuple[int, Optional[Tuple[str, List[str], List[str]]]]]:
+    """(row index, item) for HF rows [start, stop), read `batch_size` rows (columnar) at a time."""
+    stop = len(ds) if stop is None else stop
+    for lo in range(start, stop, batch_size):
+        batch = ds[lo:min(stop, lo + batch_size)]
+        claims = batch.get(claim_key) or []
+        evidence = batch.get(evidence_key) or [None] * len(claims)
+        for j, (claim, ev) in enumerate(zip(claims, evidence)):
+            if not isinstance(claim, str) or not claim.strip():
+                yield lo + j, None
+            else:
+                yield lo + j, (claim.strip(), extract_texts(ev), [])
+
+
+def write_pairs(out_f, items: Iterable[Tuple[int, Optional[Tuple[str, List[str], List[str]]]]],
+                pool: EvidencePool, neg_per_pos: int, seed: int) -> Tuple[int, int, int]:
+    """Write positives, given negatives and (when an item has none) sampled negatives.
+
+    Each item samples with its own RNG seeded from (seed, index), so output does
+    not depend on how the input was sharded.
+    """
+    total_items = pos_pairs = neg_pairs = 0
+    for idx, item in items:
+        if item is None:
+            continue
+        claim, pos, neg = item
+        total_items += 1
+        for passage in pos:
+            out_f.write(json.dumps({"text1": claim, "text2": passage, "label": 1}, ensure_ascii=False) + "\n")
+            pos_pairs += 1
+        for passage in neg:
+            out_f.write(json.dumps({"text1": claim, "text2": passage, "label": 0}, ensure_ascii=False) + "\n")
+            neg_pairs += 1
+        if neg or neg_per_pos <= 0 or not len(pool):
+            continue
+        pos_ids = [i for i in (pool.id_of(p) for p in pos) if i is not None]
+        rng = random.Random(f"{seed}:{idx}")
+        for pid in sample_negatives(len(pool), pos_ids, neg_per_pos * max(1, len(pos)), rng):
+            out_f.write(json.dumps({"text1": claim, "text2": pool.text(pid), "label": 0}, ensure_ascii=False) + "\n")
+            neg_pairs += 1
+    return total_items, pos_pairs, neg_pairs
+
+
+# Shared with forked shard workers (set before the pool is created)
+_SHARD_STATE: Dict[str, Any] = {}
+
+
+def _write_range(out_f, start: int, stop: int, offset: int) -> Tuple[int, int, int]:
+    st = _SHARD_STATE
+    if st["source"] == "local":
+        items = iter_local(st["in_path"], st["keys"], start, stop, offset)
+    else:
+        items = iter_hf(st["ds"], st["claim_key"], st["evidence_key"], start, stop, st["batch_size"])
+    return write_pairs(out_f, items, st["pool"], st["neg_per_pos"], st["seed"])
+
+
+def _run_shard(task: Tuple[int, int, int, str]) -> Tuple[int, int, int]:
+    start, stop, offset, part_path = task
+    with open(part_path, "w", encoding="utf-8") as out_f:
+        return _write_range(out_f, start, stop, offset)
+
+
+def run_sharded(n_records: int, offsets: Optional[array], out_path: str, workers: int) -> Tuple[int, int, int]:
+    """Write pairs for records [0, n_records) with `workers` forked processes; parts are
+    concatenated in order, so the output matches a single-process run."""
+    if workers <= 1 or n_records < 2 or "fork" not in multiprocessing.get_all_start_methods():
+        with open(out_path, "w", encoding="utf-8") as out_f:
+            return _write_range(out_f, 0, n_records, 0)
+    per = -(-n_records // workers)
+    tmp_dir = tempfile.mkdtemp(prefix="prepare_hover_", dir=os.path.dirname(os.path.abspath(out_path)))
+    try:
+        tasks = [(lo, min(n_records, lo + per), offsets[lo] if offsets is not None else 0,
+                  os.path.join(tmp_dir, f"part-{w:04d}.jsonl"))
+                 for w, lo in enumerate(range(0, n_records, per))]
+        with multiprocessing.get_context("fork").Pool(len(tasks)) as procs:
+            counts = procs.map(_run_shard, tasks)
+        with open(out_path, "wb") as out_f:
+            for task in tasks:
+                with open(task[3], "rb") as part:
+                    shutil.copyfileobj(part, out_f)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    return tuple(sum(c[i] for c in counts) for i in range(3))  # type: ignore[return-value]
+
+
 def convert(
     in_path: str,
     out_path: str,
@@ -61,72 +250,41 @@ def convert(
     neg_key: str = "negative_passages",
     neg_per_pos: int = 0,
     seed: int = 42,
+    workers: int = 1,
 ) -> Tuple[int, int, int]:
     """Convert local JSONL into pairwise reranker format.
 
     If negatives are missing and `neg_per_pos>0`, sample negatives from other items' evidence.
+    Streams the input twice: once to build the evidence pool, once to write pairs.
     """
-    # First pass: collect claims and positives (and existing negatives)
-    items: List[Tuple[str, List[str], List[str]]] = []  # (claim, pos, neg)
-    all_evidence: List[str] = []
-
-    for obj in iter_jsonl(in_path):
-        claim = obj.get(claim_key)
-        if not isinstance(claim, str) or not claim.strip():
-            for alt in ("query", "question", "claim_text"):
-                if isinstance(obj.get(alt), str) and obj[alt].strip():
-                    claim = obj[alt]
-                    break
-        if not isinstance(claim, str) or not claim.strip():
-            continue
-        claim = claim.strip()
-
-        pos = extract_texts(obj.get(pos_key))
-        neg = extract_texts(obj.get(neg_key))
-
-        if not pos:
-            pos = extract_texts(obj.get("positives")) or extract_texts(obj.get("evidence"))
-        if not neg:
-            neg = extract_texts(obj.get("negatives")) or extract_texts(obj.get("distractors"))
-
-        items.append((claim, pos, neg))
-        all_evidence.extend(pos)
-
-    # Second pass: write out with optional negative sampling
-    random.seed(seed)
-    total_items = len(items)
-    pos_pairs = 0
-    neg_pairs = 0
-
-    with open(out_path, "w", encoding="utf-8") as out_f:
-        for claim, pos, neg in items:
-            # positives
-            for passage in pos:
-                rec = {"text1": claim, "text2": passage, "label": 1}
-                out_f.write(json.dumps(rec, ensure_ascii=False) + "\n")
-                pos_pairs += 1
-
-            wrote_any_neg = False
-            # existing negatives
-            for passage in neg:
-                rec = {"text1": claim, "text2": passage, "label": 0}
-                out_f.write(json.dumps(rec, ensure_ascii=False) + "\n")
-                neg_pairs += 1
-                wrote_any_neg = True
-
-            # sample negatives if requested and none provided (or even if provided? keep conservative)
-            if not wrote_any_neg and neg_per_pos > 0 and all_evidence:
-                pos_set = set(pos)
-                candidates = [t for t in all_evidence if t not in pos_set]
-                need = neg_per_pos * max(1, len(pos))
-                if candidates:
-                    k = min(need, len(candidates))
-                    for neg_psg in random.sample(candidates, k):
-                        rec = {"text1": claim, "text2": neg_psg, "label": 0}
-                        out_f.write(json.dumps(rec, ensure_ascii=False) + "\n")
-                        neg_pairs += 1
-
-    return total_items, pos_pairs, neg_pairs
+    keys = (claim_key, pos_key, neg_key)
+    pool = EvidencePool(out_path + ".pool")
+    offsets = array("q")
+    n_records = 0
+    try:
+        # First pass: distinct positives (the negative pool) and record offsets for sharding
+        with open(in_path, "rb") as f:
+            pos = f.tell()
+            for raw in iter(f.readline, b""):
+                line = raw.strip()
+                if line:
+                    offsets.append(pos)
+                    n_records += 1
+                    item = local_item(json.loads(line), *keys)
+                    if item is not None:
+                        for passage in item[1]:
+                            pool.add(passage)
+                pos = f.tell()
+        pool.finish()
+
+        # Second pass: write out with optional negative sampling
+        _SHARD_STATE.update(source="local", in_path=in_path, keys=keys, pool=pool,
+                            neg_per_pos=neg_per_pos, seed=seed)
+        return run_sharded(n_records, offsets, out_path, workers)
+    finally:
+        _SHARD_STATE.clear()
+        pool.close()
+        os.remove(pool.path)
 
 
 def convert_hf(
@@ -137,11 +295,14 @@ def convert_hf(
     evidence_key: str = "evidence",
     neg_per_pos: int = 1,
     seed: int = 42,
+    workers: int = 1,
+    batch_size: int = 1000,
 ) -> Tuple[int, int, int]:
     """Convert a Hugging Face dataset (e.g., Dzeniks/hover) into pairwise reranker format.
 
     Assumes each item has `claim_key` and `evidence_key` (strings or list of strings).
-    Negatives are sampled from evidence of other items.
+    Negatives are sampled from evidence of other items. Rows are read `batch_size`
+    at a time from the memory-mapped Arrow table, never all at once.
     """
     if load_dataset is None:
         raise RuntimeError(
@@ -149,74 +310,21 @@ def convert_hf(
         )
 
     ds = load_dataset(dataset_name, split=split)
-
-    # Collect all evidence strings for negative sampling
-    all_evidence: List[str] = []
-    pos_by_idx: List[List[str]] = []
-    claims: List[str] = []
-
-    def to_str_list(val: Any) -> List[str]:
-        if val is None:
-            return []
-        if isinstance(val, str):
-            s = val.strip()
-            return [s] if s else []
-        if isinstance(val, list):
-            out: List[str] = []
-            for v in val:
-                if isinstance(v, str):
-                    t = v.strip()
-                    if t:
-                        out.append(t)
-                elif isinstance(v, dict):
-                    for k in ("text", "passage", "evidence", "snippet"):
-                        if k in v and isinstance(v[k], str) and v[k].strip():
-                            out.append(v[k].strip())
-                            break
-            return out
-        if isinstance(val, dict):
-            for k in ("text", "passage", "evidence", "snippet"):
-                if k in val and isinstance(val[k], str) and val[k].strip():
-                    return [val[k].strip()]
-        return []
-
-    for item in ds:  # type: ignore
-        claim = item.get(claim_key)
-        if not isinstance(claim, str) or not claim.strip():
-            continue
-        claims.append(claim.strip())
-        ev = to_str_list(item.get(evidence_key))
-        pos_by_idx.append(ev)
-        all_evidence.extend(ev)
-
-    random.seed(seed)
-    total_items = len(claims)
-    pos_pairs = 0
-    neg_pairs = 0
-
-    with open(out_path, "w", encoding="utf-8") as out_f:
-        for i in range(total_items):
-            claim = claims[i]
-            positives = pos_by_idx[i]
-            # Write positives
-            for psg in positives:
-                rec = {"text1": claim, "text2": psg, "label": 1}
-                out_f.write(json.dumps(rec, ensure_ascii=False) + "\n")
-                pos_pairs += 1
-
-            # Sample negatives from global pool excluding current positives
-            if neg_per_pos > 0 and all_evidence:
-                pos_set = set(positives)
-                candidates = [t for t in all_evidence if t not in pos_set]
-                need = neg_per_pos * max(1, len(positives))
-                if candidates:
-                    sample_n = min(need, len(candidates))
-                    for neg in random.sample(candidates, sample_n):
-                        rec = {"text1": claim, "text2": neg, "label": 0}
-                        out_f.write(json.dumps(rec, ensure_ascii=False) + "\n")
-                        neg_pairs += 1
-
-    return total_items, pos_pairs, neg_pairs
+    pool = EvidencePool(out_path + ".pool")
+    try:
+        for _, item in iter_hf(ds, claim_key, evidence_key, batch_size=batch_size):
+            if item is not None:
+                for passage in item[1]:
+                    pool.add(passage)
+        pool.finish()
+
+        _SHARD_STATE.update(source="hf", ds=ds, claim_key=claim_key, evidence_key=evidence_key,
+                            batch_size=batch_size, pool=pool, neg_per_pos=neg_per_pos, seed=seed)
+        return run_sharded(len(ds), None, out_path, workers)
+    finally:
+        _SHARD_STATE.clear()
+        pool.close()
+        os.remove(pool.path)
 
 
 def main():
@@ -238,6 +346,8 @@ def main():
     ap.add_argument("--hf-evidence-key", default="evidence", help="HF field for positive evidence")
     ap.add_argument("--neg-per-pos", type=int, default=1, help="Negatives to sample per positive")
     ap.add_argument("--seed", type=int, default=42, help="Random seed for negative sampling")
+    ap.add_argument("--workers", type=int, default=1, help="Processes writing pairs (same output as 1)")
+    ap.add_argument("--hf-batch-size", type=int, default=1000, help="HF rows read per chunk")
     args = ap.parse_args()
 
     if args.hf_dataset:
@@ -249,6 +359,8 @@ def main():
             evidence_key=args.hf_evidence_key,
             neg_per_pos=args.neg_per_pos,
             seed=args.seed,
+            workers=args.workers,
+            batch_size=args.hf_batch_size,
         )
     else:
         total, pos_n, neg_n = convert(
@@ -259,6 +371,7 @@ def main():
             neg_key=args.neg_key,
             neg_per_pos=args.neg_per_pos,
             seed=args.seed,
+            workers=args.workers,
         )
     print(f"Processed items={total} positives={pos_n} negatives={neg_n} -> {args.out_path}")
 